@@ -0,0 +1,21 @@
+import sys
+from config.db import SessionLocal, Base, engine
+from crud.archive import archive_fiscal_year as archive, fiscal_year_label, ARCHIVE_DATABASE_URL
+import models.archive_model  # registers the archived_periods table
+
+def archive_fiscal_year(year: int):
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        moved = archive(db, year)
+        for table, count in moved.items():
+            print(f"{table}: {count} rows moved to {ARCHIVE_DATABASE_URL}")
+        print(f"Archived through FY {fiscal_year_label(year)}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2 or not sys.argv[1].isdigit():
+        sys.exit("usage: python archive_fiscal_year.py <starting year of the fiscal year, e.g. 2023>")
+    archive_fiscal_year(int(sys.argv[1]))
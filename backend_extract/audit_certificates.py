@@ -0,0 +1,23 @@
+import sys
+from config.db import SessionLocal, Base, engine, sync_schema
+from crud.certificates import audit_all, get_conflicts
+import models.certificate_model  # registers the certificate registry tables
+
+def audit_certificates():
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+
+    db = SessionLocal()
+    try:
+        summary = audit_all(db)
+        for c in get_conflicts(db):
+            print(f"{c.certificate_no}: {c.source} #{c.source_id} conflicts with {c.conflicting_source} #{c.conflicting_id}")
+        print(f"{summary['events']} certificate events, {summary['certificates']} stones, "
+              f"{summary['conflicts']} unresolved conflicts")
+        return summary
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    summary = audit_certificates()
+    sys.exit(1 if summary["conflicts"] else 0)
@@ -0,0 +1,15 @@
+from config.db import Base, engine, sync_schema
+from crud.dimensions import migrate
+import models.dimension_model  # registers the dimensions table
+
+def backfill_dimensions():
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+    migrated = migrate(engine)
+    for table, columns in migrated.items():
+        print(f"{table}: {', '.join(columns)} moved to dimension ids")
+    if not migrated:
+        print("Every ledger already stores dimension ids")
+
+if __name__ == "__main__":
+    backfill_dimensions()
@@ -0,0 +1,19 @@
+from config.db import SessionLocal, Base, engine, sync_schema
+from crud.memo import backfill_status
+from models.db_models import MemoGive, MemoTake
+import models.memo_event_model  # registers the memo events table
+
+def backfill_memo_status():
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+
+    db = SessionLocal()
+    try:
+        for model in (MemoGive, MemoTake):
+            count = backfill_status(db, model)
+            print(f"{model.__tablename__}: {count} memos marked open")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    backfill_memo_status()
@@ -0,0 +1,92 @@
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import date, timedelta
+
+# Measures what CompressionMiddleware costs and saves on a /sales/ list payload:
+#     python backend_extract/benchmark_compression.py --rows 12000
+# The payload is generated with a fixed seed in the shape and JSON encoding of
+# GET /sales/, then compressed --repeat times at every gzip level (and brotli
+# quality, when brotli is installed); sizes and median times are reported.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(APP_DIR)
+
+CUSTOMERS = [f"CUSTOMER {number:03d}" for number in range(150)]
+ITEMS = ["DIA", "CVD", "HPHT", "RUBY", "EMERALD"]
+SHAPES = ["RD", "PR", "OV", "EM", "PE", "CU", "MQ", "HT"]
+COLORS = list("DEFGHIJ")
+CLARITIES = ["IF", "VVS1", "VVS2", "VS1", "VS2", "SI1", "SI2"]
+EXECUTIVES = ["ANIL", "MEERA", "RAVI", "SONAL"]
+BRANCHES = ["MUM", "SURAT", "DEL", None]
+
+
+def sales_payload(rows: int, seed: int) -> bytes:
+    rng = random.Random(seed)
+    start = date(2024, 4, 1)
+    sales = []
+    for number in range(1, rows + 1):
+        pcs = rng.randint(1, 40)
+        rate = round(rng.lognormvariate(6, 1), 2)
+        sales.append({
+            "date": (start + timedelta(days=rng.randrange(365))).isoformat(),
+            "customer": rng.choice(CUSTOMERS),
+            "iteam": rng.choice(ITEMS),
+            "shape": rng.choice(SHAPES),
+            "size": f"{rng.uniform(0.01, 3):.2f}",
+            "col": rng.choice(COLORS),
+            "clr": rng.choice(CLARITIES),
+            "pcs": pcs,
+            "lab_no": str(rng.randrange(10 ** 9, 10 ** 10)) if rng.random() < 0.3 else None,
+            "rate": rate,
+            "total": round(rate * pcs, 2),
+            "term": rng.choice(["CASH", "30 DAYS", "60 DAYS", None]),
+            "currency": rng.choice(["INR", "INR", "INR", "USD"]),
+            "pay_mode": rng.choice(["CASH", "RTGS", "CHEQUE", None]),
+            "sales_executive": rng.choice(EXECUTIVES),
+            "remark": None,
+            "branch": rng.choice(BRANCHES),
+            "id": number,
+            "version": 1,
+        })
+    # Encoded the way fastapi.responses.JSONResponse renders it
+    return json.dumps(sales, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+def benchmark(rows: int, repeat: int, seed: int):
+    sys.path[:0] = [APP_DIR, ROOT]
+    from utils.compression import CompressionMiddleware, brotli
+
+    body = sales_payload(rows, seed)
+    settings = [("gzip", level, {"gzip_level": level}) for level in (1, 3, 6, 9)]
+    if brotli is not None:
+        settings += [("br", quality, {"brotli_quality": quality}) for quality in (1, 4, 6, 9)]
+
+    results = []
+    for encoding, level, options in settings:
+        middleware = CompressionMiddleware(None, **options)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            compressed = middleware._compress(body, encoding)
+            timings.append((time.perf_counter() - started) * 1000)
+        results.append((encoding, level, len(compressed), statistics.median(timings)))
+    return body, results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Size and CPU cost of compressing a /sales/ payload")
+    parser.add_argument("--rows", type=int, default=12000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    body, results = benchmark(args.rows, args.repeat, args.seed)
+    print(f"{args.rows} sales rows, {len(body) / 1e6:.1f} MB of JSON, median of {args.repeat} runs")
+    print(f"{'encoding':>8} {'level':>6} {'bytes':>10} {'% of JSON':>10} {'ms':>8}")
+    for encoding, level, size, ms in results:
+        print(f"{encoding:>8} {level:>6} {size:>10} {size / len(body) * 100:>9.1f}% {ms:>8.1f}")
@@ -0,0 +1,134 @@
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from datetime import date, timedelta
+
+# Measures /certified-stock/search on a synthetic certified-stock table:
+#     python backend_extract/benchmark_stone_search.py --stones 500000
+# The table is generated with a fixed seed in a scratch database, the index is
+# loaded as the warm-up does it, and every query below is run --repeat times,
+# both against the index alone and through search_stones() (which also reads
+# the page's rows from the database).
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(APP_DIR)
+
+SHAPES = ["ROUND", "PRINCESS", "OVAL", "EMERALD", "PEAR", "CUSHION", "MARQUISE", "HEART", "RADIANT", "ASSCHER"]
+SIZES = [f"{low / 100:.2f}-{(low + 9) / 100:.2f}" for low in range(30, 300, 10)]
+COLORS = list("DEFGHIJKLM")
+CLARITIES = ["FL", "IF", "VVS1", "VVS2", "VS1", "VS2", "SI1", "SI2", "I1", "I2"]
+LABS = ["GIA", "IGI", "HRD", "GCAL", None]
+
+# name -> (filters, ranges, sort, descending, offset)
+QUERIES = {
+    "no filters": ({}, {}, "id", False, 0),
+    "one facet": ({"shape": ["ROUND"]}, {}, "id", False, 0),
+    "multi-value facets": ({"shape": ["ROUND", "OVAL"], "color": ["D", "E", "F"], "clarity": ["VVS1", "VVS2"]},
+                           {}, "date", True, 0),
+    "rate range": ({}, {"rate": (1500, 4000)}, "rate", False, 0),
+    "range + facets": ({"shape": ["PEAR"], "lab": ["GIA"]}, {"rate": (800, 2500), "total": (None, 5000)},
+                       "total", True, 0),
+    "deep page": ({"color": ["G"]}, {}, "rate", True, 5000),
+}
+
+
+def _generate(engine, stones: int, seed: int, batch_size: int = 20000):
+    from models.db_models import CertifiedStock
+    from models.dimension_model import Dimension
+
+    rng = random.Random(seed)
+    ids = {}
+    with engine.begin() as connection:
+        for kind, values in (("shape", SHAPES), ("size", SIZES), ("color", COLORS), ("clarity", CLARITIES)):
+            for value in values:
+                ids[kind, value] = connection.execute(
+                    Dimension.__table__.insert().values(kind=kind, value=value)
+                ).inserted_primary_key[0]
+
+        start = date.today() - timedelta(days=5 * 365)
+        batch = []
+        for _ in range(stones):
+            rate = round(rng.lognormvariate(7, 0.8), 2)
+            carats = rng.uniform(0.3, 3)
+            batch.append({
+                "date": start + timedelta(days=rng.randrange(5 * 365)),
+                "certi_no": str(rng.randrange(10 ** 9, 10 ** 10)),
+                "lab": rng.choice(LABS),
+                "shape_id": ids["shape", rng.choice(SHAPES)],
+                "size_id": ids["size", rng.choice(SIZES)],
+                "color_id": ids["color", rng.choice(COLORS)],
+                "clarity_id": ids["clarity", rng.choice(CLARITIES)],
+                "rate": rate,
+                "total": round(rate * carats, 2),
+            })
+            if len(batch) == batch_size:
+                connection.execute(CertifiedStock.__table__.insert(), batch)
+                batch = []
+        if batch:
+            connection.execute(CertifiedStock.__table__.insert(), batch)
+
+
+def _timed(function, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return result, timings
+
+
+def _p99(timings):
+    return timings[max(0, int(len(timings) * 0.99) - 1)]
+
+
+def benchmark(stones: int, repeat: int, seed: int, limit: int):
+    # config/db.py opens ./test.db, so everything happens in a scratch directory
+    os.chdir(tempfile.mkdtemp(prefix="stone-search-benchmark-"))
+    sys.path[:0] = [APP_DIR, ROOT]
+    from config.db import Base, SessionLocal, engine
+    from crud.stone_search import search_stones, stone_index
+
+    Base.metadata.create_all(bind=engine)
+    started = time.perf_counter()
+    _generate(engine, stones, seed)
+    print(f"Generated {stones} stones in {time.perf_counter() - started:.1f}s (seed {seed})")
+
+    db = SessionLocal()
+    try:
+        started = time.perf_counter()
+        stone_index.load(db)
+        print(f"Loaded the index in {time.perf_counter() - started:.1f}s")
+
+        results = []
+        for name, (filters, ranges, sort, descending, offset) in QUERIES.items():
+            (total, _, _), index_ms = _timed(
+                lambda: stone_index.search(filters, ranges, sort, descending, offset, limit), repeat
+            )
+            _, full_ms = _timed(
+                lambda: search_stones(db, filters, ranges, sort, descending, offset, limit), repeat
+            )
+            results.append((name, total, index_ms, full_ms))
+        return results
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Latency of the certified-stock search index")
+    parser.add_argument("--stones", type=int, default=500000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--limit", type=int, default=50)
+    args = parser.parse_args()
+
+    results = benchmark(args.stones, args.repeat, args.seed, args.limit)
+    print(f"{args.stones} stones, page of {args.limit}, {args.repeat} runs per query")
+    print(f"{'query':<20} {'matches':>8} {'index p50':>10} {'index p99':>10} {'search p50':>11} {'search p99':>11}")
+    for name, total, index_ms, full_ms in results:
+        print(f"{name:<20} {total:>8} {statistics.median(index_ms):>10.1f} {_p99(index_ms):>10.1f} "
+              f"{statistics.median(full_ms):>11.1f} {_p99(full_ms):>11.1f}")
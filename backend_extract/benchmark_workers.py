@@ -0,0 +1,116 @@
+import argparse
+import http.client
+import os
+import statistics
+import subprocess
+import sys
+import threading
+import time
+
+# Measures how request throughput scales with the number of serve.py workers:
+#     python backend_extract/benchmark_workers.py --workers 1 2 4 8 16 --path /reports/summary
+# Each worker count gets a fresh server; clients hold keep-alive connections
+# and report requests/second and latency percentiles.
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(APP_DIR)
+
+
+def _wait_until_up(port: int, timeout: float = 60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection("127.0.0.1", port, timeout=2)
+            connection.request("GET", "/")
+            connection.getresponse().read()
+            return
+        except OSError:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server on port {port} did not start")
+
+
+def _load(port: int, path: str, seconds: float, clients: int):
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + seconds
+
+    def client():
+        connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+        mine, failed = [], 0
+        while time.monotonic() < stop_at:
+            started = time.perf_counter()
+            try:
+                connection.request("GET", path)
+                response = connection.getresponse()
+                response.read()
+                if response.status != 200:
+                    failed += 1
+            except OSError:
+                failed += 1
+                connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+                continue
+            mine.append(time.perf_counter() - started)
+        with lock:
+            latencies.extend(mine)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=client) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors[0]
+
+
+def benchmark(worker_counts, path: str, seconds: float, clients: int, port: int):
+    results = []
+    for workers in worker_counts:
+        env = {
+            **os.environ,
+            # The benchmark measures the server, not the limiter
+            "RATE_LIMIT_LIST": "100000000/1",
+            "RATE_LIMIT_REPORT": "100000000/1",
+            "REPORT_CONCURRENCY": "1000",
+            "REPORT_QUEUE": "1000",
+            "JOB_WORKERS": "0",
+            # The app's modules import each other by top-level name (config.db, crud.*)
+            "PYTHONPATH": os.pathsep.join(filter(None, [APP_DIR, ROOT, os.environ.get("PYTHONPATH")])),
+        }
+        server = subprocess.Popen(
+            [sys.executable, "-m", "backend_extract.serve", "--workers", str(workers), "--port", str(port)],
+            env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+        )
+        try:
+            _wait_until_up(port)
+            _load(port, path, 2, clients)  # warm-up
+            latencies, errors = _load(port, path, seconds, clients)
+        finally:
+            server.terminate()
+            server.wait(30)
+        latencies.sort()
+        results.append({
+            "workers": workers,
+            "rps": len(latencies) / seconds,
+            "p50_ms": statistics.median(latencies) * 1000 if latencies else None,
+            "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000 if latencies else None,
+            "errors": errors,
+        })
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Throughput by number of API workers")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    parser.add_argument("--path", default="/sales/")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--port", type=int, default=8099)
+    args = parser.parse_args()
+
+    results = benchmark(args.workers, args.path, args.seconds, args.clients, args.port)
+    base = results[0]["rps"] or 1
+    print(f"GET {args.path}, {args.clients} clients, {args.seconds:g}s per run, {os.cpu_count()} CPUs")
+    print(f"{'workers':>8} {'req/s':>10} {'speedup':>8} {'p50 ms':>8} {'p99 ms':>8} {'errors':>7}")
+    for row in results:
+        print(f"{row['workers']:>8} {row['rps']:>10.1f} {row['rps'] / base:>7.2f}x "
+              f"{row['p50_ms'] or 0:>8.1f} {row['p99_ms'] or 0:>8.1f} {row['errors']:>7}")
@@ -0,0 +1,177 @@
+import itertools
+import logging
+import os
+import threading
+import time
+from contextvars import ContextVar
+from datetime import datetime
+
+from fastapi import Request
+from sqlalchemy import Column, DateTime, Integer, Table, create_engine, event, select, update
+from sqlalchemy.orm import Session
+
+from config.db import Base, SessionLocal, engine, DB_POOL_SIZE, DB_MAX_OVERFLOW
+
+logger = logging.getLogger(__name__)
+
+# Comma-separated replica URLs; unset keeps every read on the primary
+REPLICA_URLS = [url.strip() for url in os.getenv("DATABASE_REPLICA_URLS", "").split(",") if url.strip()]
+# A replica further behind the primary than this is skipped until it catches up
+REPLICA_MAX_LAG_SECONDS = float(os.getenv("REPLICA_MAX_LAG_SECONDS", "5"))
+# After a client writes, its reads stay on the primary this long (read-your-writes)
+REPLICA_STICKY_SECONDS = float(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+# Where the client carries the time of its last write (see utils/read_your_writes.py)
+STICKY_COOKIE = "last_write"
+STICKY_HEADER = "X-Last-Write"
+REPLICA_CHECK_SECONDS = float(os.getenv("REPLICA_CHECK_SECONDS", "2"))
+
+# One row the primary stamps every REPLICA_CHECK_SECONDS; how old the stamp
+# a replica returns is its replication lag, for any backend
+replica_heartbeat = Table(
+    "replica_heartbeat",
+    Base.metadata,
+    Column("id", Integer, primary_key=True),
+    Column("beat_at", DateTime, nullable=False),
+)
+
+
+def _engine_for(url: str):
+    connect_args = {"check_same_thread": False} if url.startswith("sqlite") else {}
+    return create_engine(url, connect_args=connect_args, pool_pre_ping=True,
+                         pool_size=DB_POOL_SIZE, max_overflow=DB_MAX_OVERFLOW)
+
+
+class ReplicaRouter:
+    """
+    Picks the database for read-only requests.
+
+    Replicas take turns while their heartbeat lag is within
+    REPLICA_MAX_LAG_SECONDS; a lagging or unreachable replica is skipped and
+    with none left reads go to the primary. Clients that committed a write
+    in the last REPLICA_STICKY_SECONDS read from the primary so they see it.
+    The client carries its write time (STICKY_COOKIE or STICKY_HEADER), so
+    this holds whichever process serves the next read.
+    """
+
+    def __init__(self, urls=REPLICA_URLS, max_lag: float = REPLICA_MAX_LAG_SECONDS,
+                 sticky_seconds: float = REPLICA_STICKY_SECONDS, check_seconds: float = REPLICA_CHECK_SECONDS):
+        self.replicas = [_engine_for(url) for url in urls]
+        self.max_lag = max_lag
+        self.sticky_seconds = sticky_seconds
+        self.check_seconds = check_seconds
+        self.lag = {replica: None for replica in self.replicas}  # seconds, None = unknown/unreachable
+        self._turns = itertools.cycle(self.replicas)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def healthy(self):
+        return [
+            replica for replica in self.replicas
+            if self.lag[replica] is not None and self.lag[replica] <= self.max_lag
+        ]
+
+    def is_sticky(self, last_write) -> bool:
+        """Whether a write at `last_write` (epoch seconds) is recent enough to keep reads on the primary."""
+        if last_write is None:
+            return False
+        # Stamps from other servers may run slightly ahead of this clock, never more than the window
+        return abs(time.time() - last_write) < self.sticky_seconds
+
+    def choose(self, last_write=None):
+        """Engine to read from: a healthy replica, or the primary."""
+        if not self.replicas or self.is_sticky(last_write):
+            return engine
+        healthy = set(self.healthy())
+        with self._lock:
+            for _ in range(len(self.replicas)):
+                replica = next(self._turns)
+                if replica in healthy:
+                    return replica
+        return engine
+
+    def check(self):
+        """Stamp the primary's heartbeat, then measure how far behind each replica is."""
+        now = datetime.utcnow()
+        with engine.begin() as connection:
+            if connection.execute(update(replica_heartbeat).where(replica_heartbeat.c.id == 1)
+                                  .values(beat_at=now)).rowcount == 0:
+                connection.execute(replica_heartbeat.insert().values(id=1, beat_at=now))
+        for replica in self.replicas:
+            try:
+                with replica.connect() as connection:
+                    beat_at = connection.execute(select(replica_heartbeat.c.beat_at)).scalar()
+                self.lag[replica] = (now - beat_at).total_seconds() if beat_at else None
+            except Exception:
+                logger.warning("Replica %s is unreachable", replica.url, exc_info=True)
+                self.lag[replica] = None
+
+    def start(self):
+        if self._thread is None and self.replicas:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="replica-monitor", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(10)
+            self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            try:
+                self.check()
+            except Exception:
+                logger.exception("Replica lag check failed")
+            self._stop.wait(self.check_seconds)
+
+
+router = ReplicaRouter()
+
+
+# Set per request by utils/read_your_writes.py; a committed write stamps its time here
+request_writes = ContextVar("request_writes", default=None)
+
+
+def last_write_of(request: Request):
+    """Time of the client's last write, as it sent it back; None when absent or garbled."""
+    value = request.headers.get(STICKY_HEADER) or request.cookies.get(STICKY_COOKIE)
+    try:
+        return float(value) if value else None
+    except ValueError:
+        return None
+
+
+def get_read_db(request: Request):
+    """Like get_db, for handlers that only read: the session may be bound to a replica."""
+    bind = router.choose(last_write_of(request))
+    db = SessionLocal(bind=bind)
+    db.info["replica"] = bind is not engine
+    try:
+        yield db
+    finally:
+        db.close()
+
+
+@event.listens_for(Session, "before_flush")
+def _refuse_replica_writes(session, flush_context, instances):
+    if session.info.get("replica"):
+        raise RuntimeError("Session is bound to a read replica; use get_db for handlers that write")
+
+
+@event.listens_for(Session, "after_flush")
+def _note_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(Session, "after_commit")
+def _stick_to_primary(session):
+    writes = request_writes.get()
+    if session.info.pop("wrote", False) and writes is not None:
+        writes["at"] = time.time()
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_write(session):
+    session.info.pop("wrote", None)
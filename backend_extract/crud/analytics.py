@@ -0,0 +1,428 @@
+import json
+import logging
+import os
+import re
+import shutil
+import threading
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import Integer, func, select
+from sqlalchemy.orm import Session
+
+from config.db import SessionLocal, engine
+from crud import fx, jobs
+from crud.dimensions import DIMENSION_COLUMNS, id_column
+from models.db_models import Sales, Purchase, Expense, LooseStock, CertifiedStock, MemoGive, MemoTake
+from models.dimension_model import Dimension
+from models.job_model import Job
+
+logger = logging.getLogger(__name__)
+
+# pyarrow is imported on first snapshot use; live queries do not need it
+pa = pq = None
+
+# table -> (model, groupable columns, aggregatable columns). Nothing outside
+# these lists ever reaches the SQL, so the endpoint cannot be used to probe
+# arbitrary columns or tables.
+TABLES = {
+    "sales": (
+        Sales,
+        ("customer", "iteam", "shape", "size", "col", "clr", "term", "currency", "pay_mode",
+         "sales_executive", "branch"),
+        ("pcs", "rate", "total"),
+    ),
+    "purchase": (
+        Purchase,
+        ("vendor", "iteam", "shape", "size", "col", "clr", "term", "currency", "pay_mode",
+         "purchase_executive"),
+        ("pcs", "rate", "total"),
+    ),
+    "expenses": (
+        Expense,
+        ("party", "iteam", "term", "currency", "pay_mode"),
+        ("pcs", "rate", "total"),
+    ),
+    "loose_stock": (
+        LooseStock,
+        ("branch", "iteam", "shape", "size"),
+        ("total",),
+    ),
+    "certified_stock": (
+        CertifiedStock,
+        ("lab", "shape", "size", "color", "clarity", "currency", "pay_mode"),
+        ("rate", "total"),
+    ),
+    "memo_give": (
+        MemoGive,
+        ("client_name", "item", "purity", "status"),
+        ("gross_wt", "net_wt", "rate", "amount", "outstanding_amount"),
+    ),
+    "memo_take": (
+        MemoTake,
+        ("client_name", "item", "purity", "status"),
+        ("gross_wt", "net_wt", "rate", "amount", "outstanding_amount"),
+    ),
+}
+
+# Calendar buckets of the `date` column that can be grouped on like a column
+TIME_GRAINS = ("day", "month", "year")
+
+# Money columns of tables with a `currency` column are summed in fx.BASE_CURRENCY
+MONEY_COLUMNS = ("rate", "total")
+
+AGGREGATES = {"sum": func.sum, "avg": func.avg, "min": func.min, "max": func.max, "count": func.count}
+_METRIC = re.compile(r"^(sum|avg|min|max|count)\((\w*)\)$")
+
+MAX_ROWS = 10000
+
+SNAPSHOT_DIR = os.getenv("ANALYTICS_SNAPSHOT_DIR", "./analytics_snapshot")
+# A refresh job is queued once the snapshot is older than this; 0 leaves refreshing to
+# refresh_analytics_snapshot.py or POST /jobs/
+SNAPSHOT_REFRESH_SECONDS = int(os.getenv("ANALYTICS_SNAPSHOT_REFRESH_SECONDS", "900"))
+
+
+def _split(spec: str):
+    return [part.strip() for part in (spec or "").split(",") if part.strip()]
+
+
+def _time_bucket(column, grain: str, dialect: str):
+    if dialect == "postgresql":
+        return func.to_char(column, {"day": "YYYY-MM-DD", "month": "YYYY-MM", "year": "YYYY"}[grain])
+    return func.strftime({"day": "%Y-%m-%d", "month": "%Y-%m", "year": "%Y"}[grain], column)
+
+
+def _converts(model, column: str) -> bool:
+    return hasattr(model, "currency") and column in MONEY_COLUMNS
+
+
+def parse(table: str, group_by: str = None, metrics: str = "count()", order_by: str = None):
+    """
+    Check one analytics request against the allowlists.
+
+    `group_by` and `metrics` are comma-separated lists such as
+    "sales_executive,month" and "sum(total),count()". Returns the group
+    names and {label: (function, column or None)}; unknown tables,
+    columns, functions and sort keys raise ValueError.
+    """
+    if table not in TABLES:
+        raise ValueError(f"Unknown table '{table}'")
+    _, dimensions, measures = TABLES[table]
+
+    groups = _split(group_by)
+    for name in groups:
+        if name not in TIME_GRAINS and name not in dimensions:
+            raise ValueError(f"Cannot group {table} by '{name}'")
+
+    metrics_by_label = {}
+    for spec in _split(metrics) or ["count()"]:
+        match = _METRIC.match(spec.replace(" ", ""))
+        if not match:
+            raise ValueError(f"Invalid metric '{spec}'")
+        function, column = match.groups()
+        if not column:
+            if function != "count":
+                raise ValueError(f"{function}() needs a column")
+            metrics_by_label["count"] = (function, None)
+            continue
+        if column not in measures:
+            raise ValueError(f"Cannot aggregate {table}.{column}")
+        metrics_by_label[f"{function}_{column}"] = (function, column)
+
+    if order_by and order_by.lstrip("-") not in set(groups) | set(metrics_by_label):
+        raise ValueError(f"Cannot order by '{order_by.lstrip('-')}'; use a group or metric name")
+    return groups, metrics_by_label
+
+
+def build_query(table: str, group_by: str = None, metrics: str = "count()", date_from=None, date_to=None,
+                order_by: str = None, limit: int = 1000, dialect: str = "sqlite"):
+    """Compile one analytics request (see parse()) into a single GROUP BY select."""
+    names, metrics_by_label = parse(table, group_by, metrics, order_by)
+    model = TABLES[table][0]
+    encoded = DIMENSION_COLUMNS.get(table, {})
+
+    groups, keys = [], []
+    for name in names:
+        if name in TIME_GRAINS:
+            groups.append(_time_bucket(model.date, name, dialect).label(name))
+            keys.append(groups[-1])
+        else:
+            groups.append(getattr(model, name).label(name))
+            # Dictionary-encoded columns group on their integer id; the text is looked up once per group
+            keys.append(id_column(getattr(model, name)) if name in encoded else groups[-1])
+
+    aggregates = []
+    for label, (function, column) in metrics_by_label.items():
+        if column is None:
+            aggregates.append(func.count().label(label))
+            continue
+        expression = getattr(model, column)
+        if _converts(model, column) and function != "count":
+            expression = fx.in_base(model, expression)
+        aggregates.append(AGGREGATES[function](expression).label(label))
+
+    query = select(*groups, *aggregates).select_from(model)
+    if date_from:
+        query = query.where(model.date >= date_from)
+    if date_to:
+        query = query.where(model.date <= date_to)
+    if keys:
+        query = query.group_by(*keys)
+
+    labels = {column.name: column for column in groups + aggregates}
+    if order_by:
+        key = labels[order_by.lstrip("-")]
+        query = query.order_by(key.desc() if order_by.startswith("-") else key)
+    elif groups:
+        query = query.order_by(*groups)
+    return query.limit(min(limit, MAX_ROWS))
+
+
+def _import_pyarrow():
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("The analytics snapshot needs pyarrow (pip install pyarrow)")
+        pa, pq = pyarrow, pyarrow.parquet
+
+
+# pyarrow's name for each aggregate function
+_ARROW_AGGREGATES = {"sum": "sum", "avg": "mean", "min": "min", "max": "max", "count": "count"}
+
+
+class Snapshot:
+    """
+    Columnar copy of the analytic tables: one Parquet file per table.
+
+    Each file holds only what the allowlists can touch, with dimension
+    strings decoded, calendar buckets precomputed and money columns also
+    converted to the base currency (`<column>_base`), so queries group
+    and aggregate in pyarrow without opening the OLTP database. A refresh
+    writes a new version directory and then swaps current.json with an
+    atomic rename, so readers always see a complete snapshot; the
+    previous version is kept for readers still on it.
+    """
+
+    def __init__(self, directory: str = SNAPSHOT_DIR, refresh_seconds: int = SNAPSHOT_REFRESH_SECONDS):
+        self.directory = directory
+        self.refresh_seconds = refresh_seconds
+        self._lock = threading.Lock()
+        self._manifest = None
+        self._mtime = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def path(self):
+        return os.path.join(self.directory, "current.json")
+
+    def manifest(self):
+        """The current version's manifest, or None when no snapshot has been taken yet."""
+        with self._lock:
+            if not os.path.exists(self.path):
+                return None
+            mtime = os.path.getmtime(self.path)
+            if mtime != self._mtime:
+                with open(self.path) as f:
+                    self._manifest, self._mtime = json.load(f), mtime
+            return self._manifest
+
+    def taken_at(self):
+        manifest = self.manifest()
+        return datetime.fromisoformat(manifest["taken_at"]) if manifest else None
+
+    def age_seconds(self):
+        taken_at = self.taken_at()
+        return round((datetime.now() - taken_at).total_seconds()) if taken_at else None
+
+    def _columns(self, table: str):
+        """(name, SQL expression, arrow type) of every column written for `table`."""
+        model, dimensions, measures = TABLES[table]
+        encoded = DIMENSION_COLUMNS.get(table, {})
+        columns = [("date", model.date, pa.date32())]
+        for name in dimensions:
+            # Encoded columns are read as ids and decoded from one dimensions lookup
+            expression = id_column(getattr(model, name)) if name in encoded else getattr(model, name)
+            columns.append((name, expression, pa.string()))
+        for name in measures:
+            column = getattr(model, name)
+            kind = pa.int64() if isinstance(column.type, Integer) else pa.float64()
+            columns.append((name, column, kind))
+            if _converts(model, name):
+                columns.append((f"{name}_base", fx.in_base(model, column), pa.float64()))
+        return columns
+
+    def _write_table(self, connection, table: str, path: str, labels: dict, batch_size: int):
+        model = TABLES[table][0]
+        columns = self._columns(table)
+        encoded = DIMENSION_COLUMNS.get(table, {})
+        schema = pa.schema(
+            [(name, kind) for name, _, kind in columns] + [(grain, pa.string()) for grain in TIME_GRAINS]
+        )
+        query = select(*[expression.label(name) for name, expression, _ in columns]).order_by(model.date)
+        count = 0
+        with pq.ParquetWriter(path, schema, compression="zstd") as writer:
+            result = connection.execution_options(yield_per=batch_size).execute(query)
+            for rows in result.partitions():
+                data = {}
+                for name, _, _ in columns:
+                    values = [row._mapping[name] for row in rows]
+                    if name in encoded:
+                        values = [labels.get(value) for value in values]
+                    data[name] = [float(value) if isinstance(value, Decimal) else value for value in values]
+                for grain, fmt in zip(TIME_GRAINS, ("%Y-%m-%d", "%Y-%m", "%Y")):
+                    data[grain] = [day.strftime(fmt) for day in data["date"]]
+                writer.write_table(pa.Table.from_pydict(data, schema=schema))
+                count += len(rows)
+        return count
+
+    def refresh(self, source=None, batch_size: int = 50000):
+        """Write every analytic table from `source` into a new snapshot version; returns rows per table."""
+        _import_pyarrow()
+        # Resolved here: the module-level engine, not a keyword default bound at import
+        source = source if source is not None else engine
+        version = datetime.now().strftime("%Y%m%dT%H%M%S%f")
+        version_dir = os.path.join(self.directory, version)
+        os.makedirs(version_dir)
+        taken_at = datetime.now()
+        counts = {}
+        try:
+            with source.connect() as connection:
+                labels = dict(connection.execute(select(Dimension.id, Dimension.value)).all())
+                for table in TABLES:
+                    path = os.path.join(version_dir, f"{table}.parquet")
+                    counts[table] = self._write_table(connection, table, path, labels, batch_size)
+        except Exception:
+            shutil.rmtree(version_dir, ignore_errors=True)
+            raise
+
+        previous = self.manifest()
+        manifest = {"version": version, "taken_at": taken_at.isoformat(timespec="seconds"), "rows": counts}
+        with open(self.path + ".tmp", "w") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(self.path + ".tmp", self.path)
+        keep = {version, previous["version"] if previous else None}
+        for entry in os.listdir(self.directory):
+            if entry not in keep and os.path.isdir(os.path.join(self.directory, entry)):
+                shutil.rmtree(os.path.join(self.directory, entry), ignore_errors=True)
+        return counts
+
+    def query(self, table: str, group_by: str = None, metrics: str = "count()", date_from=None, date_to=None,
+              order_by: str = None, limit: int = 1000):
+        """Answer one analytics request (see parse()) from the snapshot; None when there is none yet."""
+        names, metrics_by_label = parse(table, group_by, metrics, order_by)
+        manifest = self.manifest()
+        if manifest is None:
+            return None
+        _import_pyarrow()
+        model = TABLES[table][0]
+
+        aggregations, sources = [], {}
+        for label, (function, column) in metrics_by_label.items():
+            if column is None:
+                aggregations.append(([], "count_all"))
+                sources[label] = "count_all"
+                continue
+            if _converts(model, column) and function != "count":
+                column = f"{column}_base"
+            aggregations.append((column, _ARROW_AGGREGATES[function]))
+            sources[label] = f"{column}_{_ARROW_AGGREGATES[function]}"
+
+        filters = []
+        if date_from:
+            filters.append(("date", ">=", date_from))
+        if date_to:
+            filters.append(("date", "<=", date_to))
+        needed = set(names) | {column for column, _ in aggregations if column}
+        data = pq.read_table(
+            os.path.join(self.directory, manifest["version"], f"{table}.parquet"),
+            columns=sorted(needed), filters=filters or None,
+        )
+        grouped = data.group_by(names).aggregate(aggregations)
+        result = pa.table({name: grouped[name] for name in names}
+                          | {label: grouped[source] for label, source in sources.items()})
+
+        # Nulls sort first ascending and last descending, as in the live (SQLite) query
+        if order_by:
+            key = order_by.lstrip("-")
+            sort = [(key, "descending", "at_end")] if order_by.startswith("-") else [(key, "ascending", "at_start")]
+        else:
+            sort = [(name, "ascending", "at_start") for name in names]
+        if sort:
+            result = result.sort_by(sort)
+        return result.slice(0, min(limit, MAX_ROWS)).to_pylist()
+
+    def schedule(self, db: Session):
+        """Queue a refresh job when the snapshot is older than refresh_seconds and none is queued or running."""
+        age = self.age_seconds()
+        if age is not None and age < self.refresh_seconds:
+            return None
+        pending = (
+            db.query(Job.id)
+            .filter(Job.kind == "refresh_analytics_snapshot", Job.status.in_((jobs.JOB_QUEUED, jobs.JOB_RUNNING)))
+            .first()
+        )
+        if pending is not None:
+            return None
+        return jobs.enqueue(db, "refresh_analytics_snapshot")
+
+    def start(self):
+        if self._thread is None and self.refresh_seconds > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._schedule, name="analytics-snapshot", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _schedule(self):
+        # Checked at start-up too, so a stale (or missing) snapshot is refreshed straight away
+        while True:
+            db = SessionLocal()
+            try:
+                self.schedule(db)
+            except Exception:
+                logger.exception("Scheduling the analytics snapshot refresh failed")
+            finally:
+                db.close()
+            if self._stop.wait(min(60, self.refresh_seconds)):
+                return
+
+
+snapshot = Snapshot()
+
+
+def run(db: Session, table: str, group_by: str = None, metrics: str = "count()", date_from=None,
+        date_to=None, order_by: str = None, limit: int = 1000, source: str = "auto"):
+    """
+    Run an analytics query on the snapshot ("snapshot"), the live database
+    ("live"), or the snapshot when one exists ("auto").
+    """
+    rows = None
+    if source in ("auto", "snapshot"):
+        rows = snapshot.query(table, group_by, metrics, date_from, date_to, order_by, limit)
+        if rows is None and source == "snapshot":
+            raise LookupError("No analytics snapshot has been taken yet")
+    from_snapshot = rows is not None
+    if not from_snapshot:
+        query = build_query(table, group_by, metrics, date_from, date_to, order_by, limit,
+                            db.get_bind().dialect.name)
+        rows = [
+            {key: float(value) if isinstance(value, Decimal) else value for key, value in row.items()}
+            for row in db.execute(query).mappings().all()
+        ]
+
+    return {
+        "table": table,
+        "source": "snapshot" if from_snapshot else "live",
+        "snapshot_at": snapshot.taken_at() if from_snapshot else None,
+        "snapshot_age_seconds": snapshot.age_seconds() if from_snapshot else None,
+        "base_currency": fx.BASE_CURRENCY,
+        "rows": rows,
+    }
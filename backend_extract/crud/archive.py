@@ -0,0 +1,188 @@
+import os
+from datetime import date, timedelta
+
+from sqlalchemy import create_engine, func, select
+from sqlalchemy.orm import Session, sessionmaker
+
+from config.db import Base, sync_schema
+from models.db_models import Sales, Purchase
+from models.archive_model import ArchivedPeriod
+from models.dimension_model import Dimension
+
+# Closed fiscal years of these ledgers move to cold storage
+ARCHIVED_TABLES = {"sales": Sales, "purchase": Purchase}
+
+ARCHIVE_DATABASE_URL = os.getenv("ARCHIVE_DATABASE_URL", "sqlite:///./archive.db")
+
+# Indian fiscal years run April to March
+FISCAL_YEAR_START_MONTH = int(os.getenv("FISCAL_YEAR_START_MONTH", "4"))
+
+_archive = {"engine": None, "session": None}
+
+
+def fiscal_year_of(day: date) -> int:
+    return day.year if day.month >= FISCAL_YEAR_START_MONTH else day.year - 1
+
+
+def fiscal_year_bounds(year: int):
+    """First and last day of the fiscal year starting in `year`."""
+    start = date(year, FISCAL_YEAR_START_MONTH, 1)
+    return start, date(year + 1, FISCAL_YEAR_START_MONTH, 1) - timedelta(days=1)
+
+
+def fiscal_year_label(year: int) -> str:
+    return f"{year}-{str(year + 1)[-2:]}"
+
+
+def archive_session() -> Session:
+    if _archive["engine"] is None:
+        connect_args = {"check_same_thread": False} if ARCHIVE_DATABASE_URL.startswith("sqlite") else {}
+        _archive["engine"] = create_engine(ARCHIVE_DATABASE_URL, connect_args=connect_args)
+        # Archived rows keep their dimension ids, so the archive carries its own copy of the dimensions
+        tables = [Dimension.__table__] + [m.__table__ for m in ARCHIVED_TABLES.values()]
+        Base.metadata.create_all(_archive["engine"], tables=tables)
+        # Rows are copied column for column, so an archive created before a column was added needs it too
+        sync_schema(_archive["engine"])
+        _archive["session"] = sessionmaker(autocommit=False, autoflush=False, bind=_archive["engine"])
+    return _archive["session"]()
+
+
+def archived_through(db: Session, model):
+    """Last archived date of a ledger, or None while nothing has been archived."""
+    if model.__tablename__ not in ARCHIVED_TABLES:
+        return None
+    return (
+        db.query(func.max(ArchivedPeriod.date_to))
+        .filter(ArchivedPeriod.table_name == model.__tablename__)
+        .scalar()
+    )
+
+
+def is_archived(db: Session, model, day: date) -> bool:
+    cutoff = archived_through(db, model)
+    return cutoff is not None and day <= cutoff
+
+
+def _filtered(query, model, date_from, date_to):
+    if date_from:
+        query = query.filter(model.date >= date_from)
+    if date_to:
+        query = query.filter(model.date <= date_to)
+    return query
+
+
+def list_rows(db: Session, model, date_from: date = None, date_to: date = None):
+    """
+    Rows of a ledger in a date range, read from whichever stores hold it.
+
+    A range that ends before the archive cutoff never touches the live
+    table, and one that starts after it never opens the archive; on
+    Postgres the date filter also prunes the live table's partitions.
+    """
+    cutoff = archived_through(db, model)
+    rows = []
+    if cutoff is not None and (date_from is None or date_from <= cutoff):
+        archive_db = archive_session()
+        try:
+            rows.extend(_filtered(archive_db.query(model), model, date_from, date_to).order_by(model.id).all())
+        finally:
+            archive_db.close()
+    if cutoff is None or date_to is None or date_to > cutoff:
+        rows.extend(_filtered(db.query(model), model, date_from, date_to).all())
+    return rows
+
+
+def get_archived_row(db: Session, model, row_id: int):
+    if archived_through(db, model) is None:
+        return None
+    archive_db = archive_session()
+    try:
+        return archive_db.query(model).filter(model.id == row_id).first()
+    finally:
+        archive_db.close()
+
+
+def history(db: Session, model, fetch):
+    """
+    Yield `fetch(session)` from the archive and then from the live
+    database, for jobs that replay a ledger's full history. Archived rows
+    are always dated before live ones, so date order is preserved.
+    """
+    if archived_through(db, model) is not None:
+        archive_db = archive_session()
+        try:
+            yield from fetch(archive_db)
+        finally:
+            archive_db.close()
+    yield from fetch(db)
+
+
+def _copy_dimensions(db: Session, archive_db: Session):
+    """Dimension values are never changed or deleted, so only ids the archive has not seen are copied."""
+    table = Dimension.__table__
+    known = archive_db.query(func.max(Dimension.id)).scalar() or 0
+    rows = [dict(row._mapping) for row in db.execute(select(table).where(table.c.id > known))]
+    if rows:
+        archive_db.execute(table.insert(), rows)
+        archive_db.commit()
+
+
+def archive_fiscal_year(db: Session, year: int, batch_size: int = 5000):
+    """
+    Move every sales and purchase row up to the end of fiscal year `year`
+    into the archive database and record the period as archived.
+
+    Rows are copied and counted before anything is deleted from the live
+    database, and copying first clears the range in the archive, so an
+    interrupted run can simply be repeated.
+    """
+    # Imported here: partitioning needs the fiscal year helpers above
+    from crud import partitioning
+
+    start, end = fiscal_year_bounds(year)
+    if end >= fiscal_year_bounds(fiscal_year_of(date.today()))[0]:
+        raise ValueError(f"FY {fiscal_year_label(year)} is not closed yet")
+
+    archive_db = archive_session()
+    moved = {}
+    try:
+        _copy_dimensions(db, archive_db)
+        for name, model in ARCHIVED_TABLES.items():
+            previous = archived_through(db, model)
+            if previous is not None and end <= previous:
+                raise ValueError(f"FY {fiscal_year_label(year)} of {name} is already archived")
+            first_day = db.query(func.min(model.date)).filter(model.date <= end).scalar() or start
+            # SQLite hands out max(id) + 1, so the newest row must stay live to keep ids unique
+            max_id = db.query(func.max(model.id)).scalar()
+            if db.query(model).filter(model.id == max_id, model.date <= end).first():
+                raise ValueError(f"Archiving {name} through {end} would leave no newer rows")
+
+            stale = archive_db.query(model).filter(model.date <= end)
+            if previous is not None:
+                stale = stale.filter(model.date > previous)
+            stale.delete(synchronize_session=False)
+            # Core inserts: the ORM write hooks (search index, etc.) belong to the live database
+            table = model.__table__
+            count = 0
+            result = db.execute(select(table).where(table.c.date <= end).order_by(table.c.id),
+                                execution_options={"yield_per": batch_size})
+            for rows in result.partitions():
+                archive_db.execute(table.insert(), [dict(row._mapping) for row in rows])
+                count += len(rows)
+            archive_db.commit()
+
+            copied = archive_db.query(func.count(model.id)).filter(model.date <= end)
+            if previous is not None:
+                copied = copied.filter(model.date > previous)
+            if copied.scalar() != count:
+                raise RuntimeError(f"Archive copy of {name} is incomplete")
+
+            partitioning.drop_archived_partitions(db, model, year)
+            db.query(model).filter(model.date <= end).delete(synchronize_session=False)
+            db.add(ArchivedPeriod(table_name=name, fiscal_year=year, date_from=min(first_day, start), date_to=end,
+                                  rows=count))
+            db.commit()
+            moved[name] = count
+    finally:
+        archive_db.close()
+    return moved
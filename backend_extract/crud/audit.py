@@ -0,0 +1,200 @@
+import json
+import logging
+import os
+import queue
+import threading
+from contextvars import ContextVar
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session
+
+from config.db import engine
+from models.audit_model import AuditLog
+
+logger = logging.getLogger(__name__)
+
+AUDITED_TABLES = {
+    "sales", "purchase", "loose_stock", "certified_stock", "stock_transfer", "jewellery_stock",
+}
+
+# "async": entries are queued after commit and inserted by the flusher in batches
+#          (a crash can lose the last AUDIT_FLUSH_SECONDS of entries)
+# "group": like async, but commit waits until the batch holding its entries is
+#          written, so many requests share one audit insert
+# "sync":  entries are inserted inside the request's own transaction
+AUDIT_DURABILITY = os.getenv("AUDIT_DURABILITY", "async").lower()
+AUDIT_QUEUE_SIZE = int(os.getenv("AUDIT_QUEUE_SIZE", "10000"))
+AUDIT_BATCH_SIZE = int(os.getenv("AUDIT_BATCH_SIZE", "500"))
+AUDIT_FLUSH_SECONDS = float(os.getenv("AUDIT_FLUSH_SECONDS", "1"))
+
+# Set per request by utils/audit_actor.py
+current_actor = ContextVar("audit_actor", default=None)
+
+
+def _jsonable(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    return value.isoformat() if hasattr(value, "isoformat") else str(value)
+
+
+def _entry(target, operation: str):
+    state = inspect(target)
+    changes = {}
+    for attr in state.mapper.column_attrs:
+        history = state.attrs[attr.key].history
+        if operation == "insert":
+            value = getattr(target, attr.key)
+            if value is not None:
+                changes[attr.key] = [None, _jsonable(value)]
+        elif operation == "delete":
+            value = history.unchanged[0] if history.unchanged else (history.deleted[0] if history.deleted else None)
+            changes[attr.key] = [_jsonable(value), None]
+        elif history.has_changes():
+            before = history.deleted[0] if history.deleted else None
+            after = history.added[0] if history.added else None
+            if before != after:
+                changes[attr.key] = [_jsonable(before), _jsonable(after)]
+    if not changes:
+        return None
+    return {
+        "table_name": target.__tablename__,
+        "row_id": getattr(target, "id", None),
+        "operation": operation,
+        "changes": json.dumps(changes),
+        "actor": current_actor.get(),
+        "changed_at": datetime.utcnow(),
+    }
+
+
+class AuditFlusher:
+    """
+    Bounded queue of committed audit entries, written in batched inserts by
+    one background thread every `interval` seconds or as soon as a batch
+    fills up (or a "group" commit is waiting).
+    """
+
+    def __init__(self, max_size: int = AUDIT_QUEUE_SIZE, batch_size: int = AUDIT_BATCH_SIZE,
+                 interval: float = AUDIT_FLUSH_SECONDS):
+        self.queue = queue.Queue(maxsize=max_size)
+        self.batch_size = batch_size
+        self.interval = interval
+        self._write_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="audit-flusher", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+        if self._thread is not None:
+            self._thread.join(10)
+            self._thread = None
+        self.flush()
+
+    def submit(self, entries, wait: bool = False):
+        done = threading.Event() if wait else None
+        for number, entry in enumerate(entries):
+            item = (entry, done if number == len(entries) - 1 else None)
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                # Backpressure instead of dropping: the committing request writes a batch itself
+                self.flush()
+                self.queue.put(item)
+        if self._thread is None:
+            # No flusher running (scripts, tests): write through
+            self.flush()
+            return
+        if wait or self.queue.qsize() >= self.batch_size:
+            self._wake.set()
+        if done is not None:
+            done.wait()
+
+    def flush(self):
+        """Write everything queued so far; returns the number of entries written."""
+        written = 0
+        while True:
+            batch, waiters = [], []
+            while len(batch) < self.batch_size:
+                try:
+                    entry, done = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                batch.append(entry)
+                if done is not None:
+                    waiters.append(done)
+            if not batch:
+                return written
+            self._write(batch)
+            written += len(batch)
+            for done in waiters:
+                done.set()
+
+    def _write(self, batch):
+        with self._write_lock:
+            try:
+                with engine.begin() as connection:
+                    connection.execute(AuditLog.__table__.insert(), batch)
+            except Exception:
+                logger.exception("Could not write %d audit entries", len(batch))
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+
+flusher = AuditFlusher()
+
+
+@event.listens_for(Session, "after_flush")
+def _capture(session, flush_context):
+    entries = []
+    for operation, targets in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for target in targets:
+            if getattr(target, "__tablename__", None) in AUDITED_TABLES:
+                entry = _entry(target, operation)
+                if entry is not None:
+                    entries.append(entry)
+    if not entries:
+        return
+    if AUDIT_DURABILITY == "sync":
+        session.connection().execute(AuditLog.__table__.insert(), entries)
+    else:
+        session.info.setdefault("audit_pending", []).extend(entries)
+
+
+@event.listens_for(Session, "after_commit")
+def _submit(session):
+    entries = session.info.pop("audit_pending", None)
+    if entries:
+        flusher.submit(entries, wait=AUDIT_DURABILITY == "group")
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("audit_pending", None)
+
+
+def get_audit_log(db: Session, table_name: str = None, row_id: int = None, actor: str = None, limit: int = 100):
+    # Entries still waiting in the queue are written first so reads see them
+    flusher.flush()
+    query = db.query(AuditLog)
+    if table_name:
+        query = query.filter(AuditLog.table_name == table_name)
+    if row_id is not None:
+        query = query.filter(AuditLog.row_id == row_id)
+    if actor:
+        query = query.filter(AuditLog.actor == actor)
+    return query.order_by(AuditLog.id.desc()).limit(limit).all()
@@ -0,0 +1,335 @@
+import heapq
+import os
+import re
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import and_, event, func, select, update
+from sqlalchemy.orm import Session
+
+from models.db_models import Sales, Purchase, CertifiedStock, MemoGive, MemoTake
+from models.certificate_model import CertificateEvent, Certificate, CertificateConflict
+from crud import archive
+from crud.memo import OUTSTANDING_STATUSES, MEMO_CONVERTED
+
+# Every row that names a certificate is one event in the stone's lifecycle;
+# the state of its latest event (by date) is the stone's state.
+
+# source -> (model, certificate column)
+SOURCES = {
+    "purchase": (Purchase, "lab_no"),
+    "certified_stock": (CertifiedStock, "certi_no"),
+    "memo_give": (MemoGive, "certi_no"),
+    "memo_take": (MemoTake, "certi_no"),
+    "sales": (Sales, "lab_no"),
+}
+# A row of each source conflicts with the stone being in one of these states
+# already: bought while we hold it, sold or given on memo once sold, ...
+CONFLICTING_STATES = {
+    "purchase": ("purchased", "in_stock", "memo_out"),
+    "certified_stock": ("in_stock", "sold"),
+    "memo_give": ("memo_out", "sold"),
+    "memo_take": ("purchased", "in_stock", "memo_in"),
+    "sales": ("sold",),
+}
+# "reject" answers conflicting writes with 409; "flag" lets them through and records the conflict
+CONFLICT_POLICY = os.getenv("CERTIFICATE_CONFLICT_POLICY", "reject").lower()
+
+_events = CertificateEvent.__table__
+_heads = Certificate.__table__
+_conflicts = CertificateConflict.__table__
+
+
+def normalize(number) -> str:
+    return re.sub(r"\s+", "", number or "").upper()
+
+
+def state_of(source: str, row) -> str:
+    # A converted memo is followed by the sale or purchase that records it; a memo
+    # without a status yet (a create request) starts out outstanding
+    status = getattr(row, "status", None)
+    if source == "memo_give":
+        if status in OUTSTANDING_STATUSES or status is None:
+            return "memo_out"
+        return "memo_converted" if status == MEMO_CONVERTED else "in_stock"
+    if source == "memo_take":
+        if status in OUTSTANDING_STATUSES or status is None:
+            return "memo_in"
+        return "memo_converted" if status == MEMO_CONVERTED else "returned"
+    return {"purchase": "purchased", "certified_stock": "in_stock", "sales": "sold"}[source]
+
+
+def _event(source: str, row):
+    number = normalize(getattr(row, SOURCES[source][1]))
+    if not number or row.date is None:
+        return None
+    return {"certificate_no": number, "date": row.date, "state": state_of(source, row)}
+
+
+def _latest_other(connection, number: str, source: str, source_id, on=None):
+    """The stone's latest event (up to `on`, when given) other than the row being written."""
+    query = select(_events).where(_events.c.certificate_no == number)
+    if source_id is not None:
+        query = query.where(~and_(_events.c.source == source, _events.c.source_id == source_id))
+    if on is not None:
+        query = query.where(_events.c.date <= on)
+    return connection.execute(
+        query.order_by(_events.c.date.desc(), _events.c.id.desc()).limit(1)
+    ).mappings().first()
+
+
+def _next_other(connection, number: str, source: str, source_id, on):
+    """The stone's first event after `on` other than the row being written."""
+    query = select(_events).where(_events.c.certificate_no == number, _events.c.date > on)
+    if source_id is not None:
+        query = query.where(~and_(_events.c.source == source, _events.c.source_id == source_id))
+    return connection.execute(query.order_by(_events.c.date, _events.c.id).limit(1)).mappings().first()
+
+
+def find_conflicts(connection, source: str, number, on=None, state: str = None, source_id=None):
+    """
+    The events a row of `source` with this certificate, dated `on` and in
+    `state`, would conflict with. Like audit_all, each event is checked
+    against the one before it in date order: the row against the event it
+    would follow, and the event that would follow the row against the row.
+    Without `on` the row is taken to be the latest event.
+    """
+    number = normalize(number)
+    if not number:
+        return []
+    conflicts = []
+    previous = _latest_other(connection, number, source, source_id, on)
+    if previous is not None and previous["state"] in CONFLICTING_STATES[source]:
+        conflicts.append(previous)
+    if on is not None and state is not None:
+        following = _next_other(connection, number, source, source_id, on)
+        if following is not None and state in CONFLICTING_STATES[following["source"]]:
+            conflicts.append(following)
+    return conflicts
+
+
+def find_conflict(connection, source: str, number, on=None, state: str = None, source_id=None):
+    """The first event find_conflicts reports, if any."""
+    conflicts = find_conflicts(connection, source, number, on, state, source_id)
+    return conflicts[0] if conflicts else None
+
+
+def check(connection, source: str, number, on=None):
+    """The conflict a new row of `source` with this certificate, dated `on`, would raise (see /certificates/check)."""
+    return find_conflict(connection, source, number, on, state_of(source, None))
+
+
+def guard(db: Session, source: str, row, source_id: int = None):
+    """Refuse a write whose certificate conflicts with the stone's history (CONFLICT_POLICY "reject")."""
+    if CONFLICT_POLICY != "reject":
+        return
+    number = getattr(row, SOURCES[source][1])
+    connection = db.connection()
+    if source_id is not None:
+        registered = connection.execute(
+            select(_events.c.certificate_no, _events.c.date)
+            .where(_events.c.source == source, _events.c.source_id == source_id)
+        ).first()
+        # Only a newly named or re-dated certificate is checked; edits to other fields never conflict
+        if registered is not None and tuple(registered) == (normalize(number), row.date):
+            return
+    conflict = find_conflict(connection, source, number, row.date, state_of(source, row), source_id)
+    if conflict is None:
+        return
+    if conflict["date"] > row.date:
+        detail = (f"Certificate {conflict['certificate_no']} is {conflict['state']} later, on {conflict['date']} "
+                  f"({conflict['source']} #{conflict['source_id']})")
+    else:
+        detail = (f"Certificate {conflict['certificate_no']} is already {conflict['state']} "
+                  f"({conflict['source']} #{conflict['source_id']})")
+    raise HTTPException(status_code=409, detail=detail)
+
+
+def refresh_head(connection, number: str):
+    count, first_date, last_date = connection.execute(
+        select(func.count(_events.c.id), func.min(_events.c.date), func.max(_events.c.date))
+        .where(_events.c.certificate_no == number)
+    ).one()
+    if not count:
+        connection.execute(_heads.delete().where(_heads.c.certificate_no == number))
+        return
+    latest = _latest_other(connection, number, None, None)
+    values = {"state": latest["state"], "first_date": first_date, "last_date": last_date, "events": count}
+    if connection.execute(update(_heads).where(_heads.c.certificate_no == number).values(**values)).rowcount == 0:
+        connection.execute(_heads.insert().values(certificate_no=number, **values))
+
+
+def _flag(connection, number: str, source: str, source_id: int, conflicting_source: str, conflicting_id: int):
+    connection.execute(_conflicts.insert().values(
+        certificate_no=number,
+        source=source,
+        source_id=source_id,
+        conflicting_source=conflicting_source,
+        conflicting_id=conflicting_id,
+        detected_at=datetime.utcnow(),
+        resolved=False,
+    ))
+
+
+def write_event(connection, source: str, row):
+    """Register one written row's certificate, flagging it when it conflicts."""
+    old = connection.execute(
+        select(_events).where(_events.c.source == source, _events.c.source_id == row.id)
+    ).mappings().first()
+    new = _event(source, row)
+    if old is not None and new is not None and all(old[column] == new[column] for column in new):
+        return
+    # A newly named or re-dated certificate is checked against its neighbours in date order
+    if new is not None and (old is None or old["certificate_no"] != new["certificate_no"] or old["date"] != new["date"]):
+        number = new["certificate_no"]
+        for conflict in find_conflicts(connection, source, number, new["date"], new["state"], row.id):
+            if conflict["date"] > new["date"]:
+                # The later event now follows this row, and conflicts with it
+                _flag(connection, number, conflict["source"], conflict["source_id"], source, row.id)
+            else:
+                _flag(connection, number, source, row.id, conflict["source"], conflict["source_id"])
+    if old is not None:
+        connection.execute(_events.delete().where(_events.c.id == old["id"]))
+    if new is not None:
+        connection.execute(_events.insert().values(source=source, source_id=row.id, **new))
+    for number in {point["certificate_no"] for point in (old, new) if point is not None}:
+        refresh_head(connection, number)
+
+
+def remove_event(connection, source: str, source_id: int):
+    old = connection.execute(
+        select(_events).where(_events.c.source == source, _events.c.source_id == source_id)
+    ).mappings().first()
+    if old is not None:
+        connection.execute(_events.delete().where(_events.c.id == old["id"]))
+        refresh_head(connection, old["certificate_no"])
+
+
+def _register(source: str, model):
+    # Mapper events run inside the flush, so the registry commits or rolls back with the row
+    @event.listens_for(model, "after_insert")
+    @event.listens_for(model, "after_update")
+    def _after_write(mapper, connection, target):
+        write_event(connection, source, target)
+
+    @event.listens_for(model, "after_delete")
+    def _after_delete(mapper, connection, target):
+        remove_event(connection, source, target.id)
+
+
+for _source, (_model, _) in SOURCES.items():
+    _register(_source, _model)
+
+
+def get_certificate(db: Session, number: str):
+    return db.get(Certificate, normalize(number))
+
+
+def get_history(db: Session, number: str):
+    return (
+        db.query(CertificateEvent)
+        .filter(CertificateEvent.certificate_no == normalize(number))
+        .order_by(CertificateEvent.date, CertificateEvent.id)
+        .all()
+    )
+
+
+def get_conflicts(db: Session, include_resolved: bool = False):
+    query = db.query(CertificateConflict)
+    if not include_resolved:
+        query = query.filter(CertificateConflict.resolved.is_(False))
+    return query.order_by(CertificateConflict.detected_at.desc(), CertificateConflict.id.desc()).all()
+
+
+def resolve_conflict(db: Session, conflict_id: int):
+    conflict = db.get(CertificateConflict, conflict_id)
+    if conflict:
+        conflict.resolved = True
+        db.commit()
+        db.refresh(conflict)
+    return conflict
+
+
+def audit_all(db: Session, batch_size: int = 1000):
+    """
+    Rebuild the registry from every ledger and re-detect conflicts.
+
+    Rows are streamed in date order and written in batches; conflicts and
+    stone states then come from one pass over the registry in certificate
+    order, so memory stays bounded by a batch. Conflicts already marked
+    resolved are not raised again.
+    """
+    connection = db.connection()
+    resolved = {
+        (row.source, row.source_id, row.conflicting_source, row.conflicting_id)
+        for row in connection.execute(select(_conflicts).where(_conflicts.c.resolved.is_(True)))
+    }
+    connection.execute(_conflicts.delete().where(_conflicts.c.resolved.is_(False)))
+    connection.execute(_heads.delete())
+    connection.execute(_events.delete())
+
+    def stream(source, model):
+        column = getattr(model, SOURCES[source][1])
+        ordered = lambda session: (
+            session.query(model).filter(column.isnot(None), column != "")
+            .order_by(model.date, model.id).yield_per(batch_size)
+        )
+        # Archived fiscal years still bought and sold their stones
+        rows = archive.history(db, model, ordered) if model in (Sales, Purchase) else ordered(db)
+        return ((source, row) for row in rows)
+
+    # Inserted in date order, so event ids order same-day events
+    merged = heapq.merge(*(stream(source, model) for source, (model, _) in SOURCES.items()),
+                         key=lambda item: item[1].date)
+    batch, events = [], 0
+    for source, row in merged:
+        values = _event(source, row)
+        if values is None:
+            continue
+        batch.append({"source": source, "source_id": row.id, **values})
+        if len(batch) >= batch_size:
+            connection.execute(_events.insert(), batch)
+            events += len(batch)
+            batch = []
+    if batch:
+        connection.execute(_events.insert(), batch)
+        events += len(batch)
+
+    ordered_events = connection.execute(
+        select(_events).order_by(_events.c.certificate_no, _events.c.date, _events.c.id)
+        .execution_options(yield_per=batch_size)
+    ).mappings()
+    heads, conflicts = [], []
+    previous = head = None
+    for current in ordered_events:
+        if head is None or head["certificate_no"] != current["certificate_no"]:
+            if head is not None:
+                heads.append(head)
+            head = {"certificate_no": current["certificate_no"], "first_date": current["date"], "events": 0}
+            previous = None
+        if previous is not None and previous["state"] in CONFLICTING_STATES[current["source"]]:
+            key = (current["source"], current["source_id"], previous["source"], previous["source_id"])
+            if key not in resolved:
+                conflicts.append(dict(zip(("source", "source_id", "conflicting_source", "conflicting_id"), key),
+                                      certificate_no=current["certificate_no"], detected_at=datetime.utcnow(),
+                                      resolved=False))
+        head.update(state=current["state"], last_date=current["date"], events=head["events"] + 1)
+        previous = current
+        if len(heads) >= batch_size:
+            connection.execute(_heads.insert(), heads)
+            heads = []
+        if len(conflicts) >= batch_size:
+            connection.execute(_conflicts.insert(), conflicts)
+            conflicts = []
+    if head is not None:
+        heads.append(head)
+    if heads:
+        connection.execute(_heads.insert(), heads)
+    if conflicts:
+        connection.execute(_conflicts.insert(), conflicts)
+    db.commit()
+    return {
+        "events": events,
+        "certificates": db.query(func.count(Certificate.certificate_no)).scalar(),
+        "conflicts": db.query(func.count(CertificateConflict.id)).filter(CertificateConflict.resolved.is_(False)).scalar(),
+    }
@@ -0,0 +1,259 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, func, or_
+from sqlalchemy.orm import Session
+
+from config.db import SessionLocal
+from models.change_feed_model import ChangeFeedEvent
+
+logger = logging.getLogger(__name__)
+
+# Tables whose writes are announced on /events
+FEED_TABLES = {
+    "sales", "purchase", "expenses", "loose_stock", "certified_stock", "stock_transfer", "jewellery_stock",
+    "jewellery_items", "memo_give", "memo_take", "memo_events", "igi_issue", "igi_receive", "fx_rates",
+    "branch_stock_balance",
+}
+
+# Events a client may fall behind by before it is disconnected; it then
+# reconnects with Last-Event-ID and is replayed what it missed
+EVENT_CLIENT_BUFFER = int(os.getenv("EVENT_CLIENT_BUFFER", "256"))
+EVENT_REPLAY_SIZE = int(os.getenv("EVENT_REPLAY_SIZE", "1024"))
+EVENT_HEARTBEAT_SECONDS = float(os.getenv("EVENT_HEARTBEAT_SECONDS", "15"))
+# Every write is logged to the change_feed table in the transaction that
+# makes it, and each process polls the log this often to hear about the
+# other processes' writes. Events from the last EVENT_GRACE_SECONDS are read again on every
+# poll, so a transaction that commits after a higher id was seen is not missed.
+EVENT_POLL_SECONDS = float(os.getenv("EVENT_POLL_SECONDS", "1"))
+EVENT_GRACE_SECONDS = int(os.getenv("EVENT_GRACE_SECONDS", "30"))
+EVENT_RETENTION_SECONDS = int(os.getenv("EVENT_RETENTION_SECONDS", "86400"))
+
+_EVICTED = object()
+_RESET = "event: reset\ndata: {}\n\n"
+_feed = ChangeFeedEvent.__table__
+
+
+def _message(sequence: int, change: dict) -> str:
+    data = json.dumps(change, separators=(",", ":"), default=str)
+    return f"id: {sequence}\nevent: change\ndata: {data}\n\n"
+
+
+def _change(row) -> dict:
+    return {"table": row.table_name, "id": row.row_id, "op": row.op, "version": row.version}
+
+
+class _Subscriber:
+    def __init__(self, tables, buffer_size: int):
+        self.tables = tables
+        self.queue = asyncio.Queue(maxsize=buffer_size)
+
+
+class EventHub:
+    """
+    Fan-out of change notifications to Server-Sent Events clients.
+
+    The change_feed table is the channel every process shares: its ids are
+    the SSE event ids, a poller thread per process picks up the writes
+    the other processes logged, and a reconnecting client is replayed from
+    it. A process's own commits are handed out at once rather than at the
+    next poll. Each batch is encoded once and handed to the event loop in
+    a single callback, which copies a reference into every subscriber's
+    bounded queue; a subscriber whose queue is full is evicted instead of
+    slowing the rest.
+    """
+
+    def __init__(self, buffer_size: int = EVENT_CLIENT_BUFFER, replay_size: int = EVENT_REPLAY_SIZE,
+                 poll_seconds: float = EVENT_POLL_SECONDS):
+        self.buffer_size = buffer_size
+        self.replay_size = replay_size
+        self.poll_seconds = poll_seconds
+        self.loop = None
+        self.subscribers = set()
+        self._watermark = None
+        self._delivered = {}  # event id -> when it was handed out, for EVENT_GRACE_SECONDS
+        self._pruned_at = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish(self, events):
+        """Hand out (event id, change) pairs not handed out before (thread-safe)."""
+        now = time.monotonic()
+        with self._lock:
+            messages = []
+            for sequence, change in sorted(events, key=lambda item: item[0]):
+                if sequence in self._delivered:
+                    continue
+                self._delivered[sequence] = now
+                messages.append((change["table"], _message(sequence, change)))
+            loop = self.loop
+        if messages and loop is not None and self.subscribers:
+            loop.call_soon_threadsafe(self._fan_out, messages)
+
+    def _fan_out(self, messages):
+        for subscriber in list(self.subscribers):
+            for table, message in messages:
+                if subscriber.tables and table not in subscriber.tables:
+                    continue
+                try:
+                    subscriber.queue.put_nowait(message)
+                except asyncio.QueueFull:
+                    self._evict(subscriber)
+                    break
+
+    def _evict(self, subscriber):
+        self.subscribers.discard(subscriber)
+        while not subscriber.queue.empty():
+            subscriber.queue.get_nowait()
+        subscriber.queue.put_nowait(_EVICTED)
+
+    # -- the shared log ----------------------------------------------------
+
+    def poll(self, db: Session):
+        """Hand out the events logged since the last poll, by any process; returns how many were read."""
+        if self._watermark is None:
+            # Only what happens from now on is news; older events are for replay
+            self._watermark = db.query(func.max(ChangeFeedEvent.id)).scalar() or 0
+            return 0
+        since = datetime.utcnow() - timedelta(seconds=EVENT_GRACE_SECONDS)
+        rows = (
+            db.query(ChangeFeedEvent)
+            .filter(or_(ChangeFeedEvent.id > self._watermark, ChangeFeedEvent.created_at >= since))
+            .order_by(ChangeFeedEvent.id)
+            .all()
+        )
+        if rows:
+            self.publish([(row.id, _change(row)) for row in rows])
+            self._watermark = max(self._watermark, rows[-1].id)
+        forget_before = time.monotonic() - 2 * EVENT_GRACE_SECONDS
+        with self._lock:
+            for sequence in [sequence for sequence, at in self._delivered.items() if at < forget_before]:
+                del self._delivered[sequence]
+        return len(rows)
+
+    def replay(self, db: Session, tables, last_event_id: int):
+        """Messages a client that last saw `last_event_id` missed; None when more than replay_size."""
+        query = db.query(ChangeFeedEvent).filter(ChangeFeedEvent.id > last_event_id)
+        if tables:
+            query = query.filter(ChangeFeedEvent.table_name.in_(tables))
+        rows = query.order_by(ChangeFeedEvent.id).limit(self.replay_size + 1).all()
+        if len(rows) > self.replay_size:
+            return None
+        return [_message(row.id, _change(row)) for row in rows]
+
+    def prune(self, db: Session, older_than: int = EVENT_RETENTION_SECONDS):
+        cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+        count = db.query(ChangeFeedEvent).filter(ChangeFeedEvent.created_at < cutoff).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        return count
+
+    def start(self):
+        if self._thread is None and self.poll_seconds > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll, name="change-feed", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_seconds):
+            db = SessionLocal()
+            try:
+                self.poll(db)
+                if self._pruned_at is None or time.monotonic() - self._pruned_at > 3600:
+                    self.prune(db)
+                    self._pruned_at = time.monotonic()
+            except Exception:
+                logger.exception("Change feed poll failed")
+            finally:
+                db.close()
+
+    # -- clients -----------------------------------------------------------
+
+    async def stream(self, tables=None, last_event_id: int = None):
+        """Async generator of SSE messages for one client."""
+        self.loop = asyncio.get_running_loop()
+        subscriber = _Subscriber(set(tables or ()), self.buffer_size)
+        self.subscribers.add(subscriber)
+        missed = []
+        if last_event_id is not None:
+            db = SessionLocal()
+            try:
+                missed = await asyncio.to_thread(self.replay, db, subscriber.tables, last_event_id)
+            finally:
+                db.close()
+        try:
+            yield "retry: 3000\n\n"
+            if missed is None:
+                # Too far behind to replay: the client refetches what it shows
+                yield _RESET
+                missed = []
+            replayed = set()
+            for message in missed:
+                replayed.add(message)
+                yield message
+            while True:
+                try:
+                    message = await asyncio.wait_for(subscriber.queue.get(), EVENT_HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if message is _EVICTED:
+                    yield "event: evicted\ndata: {}\n\n"
+                    return
+                if message not in replayed:
+                    yield message
+        finally:
+            self.subscribers.discard(subscriber)
+
+
+hub = EventHub()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    logged = session.info.setdefault("feed_logged", set())
+    rows = []
+    for operation, targets in (("insert", session.new), ("update", session.dirty), ("delete", session.deleted)):
+        for target in targets:
+            table = getattr(target, "__tablename__", None)
+            if table in FEED_TABLES and (operation != "update" or session.is_modified(target)):
+                key = (table, getattr(target, "id", None), operation)
+                # A row flushed several times in one transaction is announced once per operation
+                if key in logged:
+                    continue
+                logged.add(key)
+                rows.append({"table_name": table, "row_id": key[1], "op": operation,
+                             "version": getattr(target, "version", None), "created_at": datetime.utcnow()})
+    if rows:
+        # Logged on the flush's connection, so the events commit or roll back with the rows
+        result = session.connection().execute(_feed.insert().returning(_feed.c.id, sort_by_parameter_order=True), rows)
+        events = [(sequence, {"table": row["table_name"], "id": row["row_id"], "op": row["op"],
+                              "version": row["version"]}) for (sequence,), row in zip(result, rows)]
+        session.info.setdefault("feed_changes", []).extend(events)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session):
+    session.info.pop("feed_logged", None)
+    events = session.info.pop("feed_changes", None)
+    if events:
+        hub.publish(events)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("feed_logged", None)
+    session.info.pop("feed_changes", None)
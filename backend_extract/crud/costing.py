@@ -0,0 +1,319 @@
+import os
+from decimal import Decimal
+
+from sqlalchemy import func, or_
+from sqlalchemy.orm import Session
+
+from models.db_models import Purchase, Sales
+from models.costing_model import CostLayer, CostPosition, SaleCost
+from crud import archive, fx
+
+# Costs and revenue are converted to fx.BASE_CURRENCY when they are recorded;
+# amounts without a known rate are flagged unconverted and left out of margins
+# until the rate is added (see recost_currency).
+
+# "fifo" charges each sale the cost of the oldest remaining layers,
+# "average" charges the running weighted-average cost of the lot
+COSTING_METHOD = os.getenv("COSTING_METHOD", "fifo").lower()
+
+ZERO = Decimal("0")
+
+
+def _norm(value) -> str:
+    return (value or "").strip().upper()
+
+
+def cost_key(iteam, shape, size, lab_no) -> str:
+    """Certified stones are costed individually by lab number, loose goods by item/shape/size lot."""
+    if _norm(lab_no):
+        return f"LAB:{_norm(lab_no)}"
+    return f"LOT:{_norm(iteam)}|{_norm(shape)}|{_norm(size)}"
+
+
+def key_for(row) -> str:
+    return cost_key(row.iteam, row.shape, row.size, row.lab_no)
+
+
+def _qty(row) -> int:
+    return row.pcs if row.pcs and row.pcs > 0 else 1
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value)) if value is not None else ZERO
+
+
+def _position(db: Session, key: str) -> CostPosition:
+    position = db.get(CostPosition, key)
+    if position is None:
+        position = CostPosition(cost_key=key, qty_on_hand=0, value_on_hand=ZERO)
+        db.add(position)
+    return position
+
+
+def record_purchase(db: Session, purchase: Purchase):
+    """Open a cost layer for a newly written purchase."""
+    key = key_for(purchase)
+    qty = _qty(purchase)
+    total = _money(purchase.total) if purchase.total is not None else _money(purchase.rate) * qty
+    converted = fx.convert(db, total, purchase.currency, purchase.date)
+    total = _money(converted)
+    layer = CostLayer(
+        purchase_id=purchase.id,
+        cost_key=key,
+        date=purchase.date,
+        qty_in=qty,
+        qty_remaining=qty,
+        unit_cost=(total / qty).quantize(Decimal("0.01")),
+        unconverted=converted is None,
+    )
+    db.add(layer)
+
+    position = _position(db, key)
+    position.qty_on_hand = (position.qty_on_hand or 0) + qty
+    position.value_on_hand = _money(position.value_on_hand) + total
+    return layer
+
+
+def record_sale(db: Session, sale: Sales):
+    """Consume cost layers for a newly written sale and store its COGS."""
+    key = key_for(sale)
+    qty = _qty(sale)
+    position = _position(db, key)
+
+    # A sale can only be filled from stock bought by its date
+    layers = (
+        db.query(CostLayer)
+        .filter(CostLayer.cost_key == key, CostLayer.qty_remaining > 0, CostLayer.date <= sale.date)
+        .order_by(CostLayer.date, CostLayer.id)
+        .all()
+    )
+    # Units on hand whose layers carry no base-currency value (see record_purchase)
+    unvalued = sum(layer.qty_remaining for layer in layers if layer.unconverted)
+    needed = qty
+    fifo_cost = ZERO
+    unconverted = False
+    for layer in layers:
+        if needed == 0:
+            break
+        take = min(needed, layer.qty_remaining)
+        layer.qty_remaining -= take
+        fifo_cost += _money(layer.unit_cost) * take
+        unconverted = unconverted or layer.unconverted
+        needed -= take
+    matched = qty - needed
+
+    on_hand = position.qty_on_hand or 0
+    valued = on_hand - unvalued
+    if COSTING_METHOD == "average" and valued > 0:
+        # The average is over the units that have a value; past those the sale draws on
+        # unvalued stock, which costs nothing until the rate is added and the lot replayed
+        average = _money(position.value_on_hand) / valued
+        cogs = (average * min(matched, valued)).quantize(Decimal("0.01"))
+        unconverted = unvalued > 0
+    else:
+        cogs = fifo_cost
+    revenue = fx.convert(db, sale.total, sale.currency, sale.date)
+
+    position.qty_on_hand = on_hand - matched
+    position.value_on_hand = _money(position.value_on_hand) - cogs
+
+    sale_cost = SaleCost(
+        sale_id=sale.id,
+        cost_key=key,
+        date=sale.date,
+        qty=qty,
+        unmatched_qty=needed,
+        revenue=_money(revenue),
+        cogs=cogs,
+        unconverted=unconverted or (revenue is None and sale.total is not None),
+    )
+    db.add(sale_cost)
+    return sale_cost
+
+
+def _is_latest(db: Session, key: str, day) -> bool:
+    """No cost layer or sale of the lot is dated after `day`."""
+    later = (
+        db.query(CostLayer.id).filter(CostLayer.cost_key == key, CostLayer.date > day).first()
+        or db.query(SaleCost.sale_id).filter(SaleCost.cost_key == key, SaleCost.date > day).first()
+    )
+    return later is None
+
+
+def post_purchase(db: Session, purchase: Purchase):
+    """
+    Cost a newly written purchase: incrementally when it is the latest row of
+    its lot, otherwise (back-dated, or earlier sales of the lot are still
+    waiting for stock) by replaying the lot.
+    """
+    key = key_for(purchase)
+    unmatched = db.query(SaleCost.sale_id).filter(SaleCost.cost_key == key, SaleCost.unmatched_qty > 0).first()
+    if unmatched is None and _is_latest(db, key, purchase.date):
+        return record_purchase(db, purchase)
+    rebuild_keys(db, [key])
+
+
+def post_sale(db: Session, sale: Sales):
+    """Cost a newly written sale, replaying its lot when the sale is back-dated."""
+    key = key_for(sale)
+    if _is_latest(db, key, sale.date):
+        return record_sale(db, sale)
+    rebuild_keys(db, [key])
+
+
+def _clear_keys(db: Session, keys):
+    # "fetch" drops the deleted rows from the session too, so the replay can add rows with the same keys
+    db.query(SaleCost).filter(SaleCost.cost_key.in_(keys)).delete(synchronize_session="fetch")
+    db.query(CostLayer).filter(CostLayer.cost_key.in_(keys)).delete(synchronize_session="fetch")
+    db.query(CostPosition).filter(CostPosition.cost_key.in_(keys)).delete(synchronize_session="fetch")
+
+
+def _rows_for_key(db: Session, model, key: str):
+    kind, _, value = key.partition(":")
+    query = db.query(model)
+    if kind == "LAB":
+        return query.filter(func.upper(func.trim(model.lab_no)) == value)
+    iteam, shape, size = value.split("|")
+    return query.filter(
+        or_(model.lab_no.is_(None), func.trim(model.lab_no) == ""),
+        func.upper(func.trim(func.coalesce(model.iteam, ""))) == iteam,
+        func.upper(func.trim(func.coalesce(model.shape, ""))) == shape,
+        func.upper(func.trim(func.coalesce(model.size, ""))) == size,
+    )
+
+
+def _replay(db: Session, purchases, sales):
+    # Purchases dated the same day as a sale are stocked before the sale
+    events = [((p.date, 0, p.id), p) for p in purchases] + [((s.date, 1, s.id), s) for s in sales]
+    for _, row in sorted(events, key=lambda event: event[0]):
+        if isinstance(row, Purchase):
+            record_purchase(db, row)
+        else:
+            record_sale(db, row)
+        db.flush()
+
+
+def rebuild_keys(db: Session, keys):
+    """
+    Recost only the lots touched by an edit, a delete or a back-dated insert.
+
+    Inserts in date order are applied incrementally; anything else can
+    reorder FIFO consumption, so the affected lots are replayed.
+    """
+    keys = sorted(set(keys))
+    if not keys:
+        return
+    _clear_keys(db, keys)
+    db.flush()
+    for key in keys:
+        _replay(
+            db,
+            list(archive.history(db, Purchase, lambda session: _rows_for_key(session, Purchase, key))),
+            list(archive.history(db, Sales, lambda session: _rows_for_key(session, Sales, key))),
+        )
+
+
+def recost_currency(db: Session, currency: str, start, end=None):
+    """Replay the lots of the purchases and sales a new or removed rate (see fx.affected_range) converts."""
+    keys = {
+        key_for(row)
+        for model in (Purchase, Sales)
+        for row in fx.rows_in_range(db, model, currency, start, end)
+    }
+    rebuild_keys(db, keys)
+    return len(keys)
+
+
+def rebuild_all(db: Session, batch_size: int = 1000):
+    """Rebuild every cost layer from the raw purchase and sales ledgers (backfills)."""
+    db.query(SaleCost).delete(synchronize_session=False)
+    db.query(CostLayer).delete(synchronize_session=False)
+    db.query(CostPosition).delete(synchronize_session=False)
+    db.flush()
+
+    # Archived fiscal years are replayed first so closing stock keeps their layers
+    purchases = archive.history(
+        db, Purchase, lambda session: session.query(Purchase).order_by(Purchase.date, Purchase.id).yield_per(batch_size)
+    )
+    sales = archive.history(
+        db, Sales, lambda session: session.query(Sales).order_by(Sales.date, Sales.id).yield_per(batch_size)
+    )
+    purchase_iter, sale_iter = iter(purchases), iter(sales)
+    next_purchase, next_sale = next(purchase_iter, None), next(sale_iter, None)
+    count = 0
+    while next_purchase is not None or next_sale is not None:
+        if next_sale is None or (next_purchase is not None and next_purchase.date <= next_sale.date):
+            record_purchase(db, next_purchase)
+            next_purchase = next(purchase_iter, None)
+        else:
+            record_sale(db, next_sale)
+            next_sale = next(sale_iter, None)
+        db.flush()
+        count += 1
+    db.commit()
+    return count
+
+
+def get_sale_cost(db: Session, sale_id: int):
+    return db.get(SaleCost, sale_id)
+
+
+def margin_by(db: Session, field: str, date_from=None, date_to=None):
+    column = {"iteam": Sales.iteam, "customer": Sales.customer}[field]
+    query = (
+        db.query(
+            column.label("group"),
+            func.count(SaleCost.sale_id),
+            func.sum(SaleCost.revenue),
+            func.sum(SaleCost.cogs),
+        )
+        .join(Sales, Sales.id == SaleCost.sale_id)
+        .filter(SaleCost.unconverted.is_(False))
+    )
+    if date_from:
+        query = query.filter(SaleCost.date >= date_from)
+    if date_to:
+        query = query.filter(SaleCost.date <= date_to)
+
+    results = []
+    for group, count, revenue, cogs in query.group_by(column).all():
+        revenue, cogs = _money(revenue), _money(cogs)
+        results.append({
+            field: group,
+            "sales": count,
+            "revenue": float(revenue),
+            "cogs": float(cogs),
+            "margin": float(revenue - cogs),
+            "margin_percent": round(float((revenue - cogs) / revenue * 100), 2) if revenue else 0.0,
+        })
+    return results
+
+
+def profit_totals(db: Session):
+    revenue, cogs = (
+        db.query(func.sum(SaleCost.revenue), func.sum(SaleCost.cogs)).filter(SaleCost.unconverted.is_(False)).one()
+    )
+    revenue, cogs = _money(revenue), _money(cogs)
+    return {
+        "revenue": float(revenue),
+        "cogs": float(cogs),
+        "gross_profit": float(revenue - cogs),
+        "margin_percent": round(float((revenue - cogs) / revenue * 100), 2) if revenue else 0.0,
+        "unconverted_rows": db.query(func.count(SaleCost.sale_id)).filter(SaleCost.unconverted.is_(True)).scalar(),
+    }
+
+
+def closing_stock(db: Session):
+    qty, value = db.query(func.sum(CostPosition.qty_on_hand), func.sum(CostPosition.value_on_hand)).one()
+    # Units of these layers are on hand but carry no base-currency value yet
+    unconverted = (
+        db.query(func.coalesce(func.sum(CostLayer.qty_remaining), 0))
+        .filter(CostLayer.unconverted.is_(True), CostLayer.qty_remaining > 0)
+        .scalar()
+    )
+    return {
+        "method": COSTING_METHOD,
+        "qty_on_hand": qty or 0,
+        "value_on_hand": float(_money(value)),
+        "unconverted_qty": unconverted,
+    }
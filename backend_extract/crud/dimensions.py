@@ -0,0 +1,139 @@
+import threading
+
+from sqlalchemy import column, event, exists, inspect, literal, select, table, text, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, object_session
+
+from models.db_models import Sales, Purchase, LooseStock, CertifiedStock, StockTransfer
+from models.dimension_model import Dimension
+
+MODELS = {model.__tablename__: model for model in (Sales, Purchase, LooseStock, CertifiedStock, StockTransfer)}
+
+# table -> {attribute: dimension kind}. Each listed attribute is stored only
+# as the integer `<attribute>_id` into the dimensions table; the text is
+# read back through models.dimension_model.dimension().
+DIMENSION_COLUMNS = {
+    name: {attr.key: attr.info["dimension"] for attr in inspect(model).column_attrs if "dimension" in attr.info}
+    for name, model in MODELS.items()
+}
+
+
+def id_column(attribute):
+    """The integer key column behind a dimension attribute such as Sales.branch."""
+    return attribute.property.info["id_column"]
+
+
+def _insert_if_missing(dialect: str):
+    if dialect == "postgresql":
+        return postgresql.insert(Dimension).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(Dimension).on_conflict_do_nothing()
+    return Dimension.__table__.insert()
+
+
+class Interner:
+    """
+    Process-wide (kind, value) -> id cache in front of the dimensions table.
+
+    A value is looked up (and inserted when new) at most once per process;
+    after that writes resolve it from memory. Ids seen by a transaction only
+    enter the cache once it commits, so a rolled-back insert never leaves a
+    dangling id behind.
+    """
+
+    def __init__(self):
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def lookup(self, session: Session, kind: str, value):
+        if value is None:
+            return None
+        key = (kind, value)
+        dimension_id = self._ids.get(key)
+        if dimension_id is not None:
+            return dimension_id
+        pending = session.info.setdefault("dimension_pending", {})
+        if key not in pending:
+            connection = session.connection()
+            query = select(Dimension.id).where(Dimension.kind == kind, Dimension.value == value)
+            dimension_id = connection.execute(query).scalar()
+            if dimension_id is None:
+                # A concurrent writer may insert the same value; the conflict is ignored and its row read back
+                connection.execute(_insert_if_missing(connection.dialect.name).values(kind=kind, value=value))
+                dimension_id = connection.execute(query).scalar()
+            pending[key] = dimension_id
+        return pending[key]
+
+    def remember(self, ids: dict):
+        with self._lock:
+            self._ids.update(ids)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+
+interner = Interner()
+
+
+def _encode(mapper, connection, target):
+    session, state = object_session(target), inspect(target)
+    for attribute, kind in DIMENSION_COLUMNS[mapper.local_table.name].items():
+        # Only values assigned since the row was loaded; unset ones keep their id
+        if attribute in state.dict and (not state.has_identity or state.attrs[attribute].history.has_changes()):
+            setattr(target, f"{attribute}_id", interner.lookup(session, kind, state.dict[attribute]))
+
+
+for _model in MODELS.values():
+    event.listen(_model, "before_insert", _encode)
+    event.listen(_model, "before_update", _encode)
+
+
+@event.listens_for(Session, "after_commit")
+def _remember(session):
+    ids = session.info.pop("dimension_pending", None)
+    if ids:
+        interner.remember(ids)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("dimension_pending", None)
+
+
+def migrate(bind):
+    """
+    Move ledgers created while these columns were still text onto ids:
+    every distinct value gets its dimensions row, each row its `_id`
+    (one UPDATE per column, not per value), then the text column and any
+    index on it are dropped. Tables already on ids are left alone, so it is
+    safe to run on every start-up. Returns the columns migrated per table.
+    """
+    migrated = {}
+    inspector = inspect(bind)
+    for name, attributes in DIMENSION_COLUMNS.items():
+        if not inspector.has_table(name):
+            continue
+        existing = {column_info["name"] for column_info in inspector.get_columns(name)}
+        legacy = [attribute for attribute in attributes if attribute in existing]
+        if not legacy:
+            continue
+        with bind.begin() as connection:
+            for attribute in legacy:
+                kind = attributes[attribute]
+                ledger = table(name, column(attribute), column(f"{attribute}_id"))
+                value = ledger.c[attribute]
+                present = value.isnot(None)
+                known = exists().where(Dimension.kind == kind, Dimension.value == value)
+                connection.execute(Dimension.__table__.insert().from_select(
+                    ["kind", "value"], select(literal(kind), value).where(present, ~known).distinct(),
+                ))
+                key = select(Dimension.id).where(Dimension.kind == kind, Dimension.value == value).scalar_subquery()
+                connection.execute(update(ledger).where(present).values({f"{attribute}_id": key}))
+            for index in inspector.get_indexes(name):
+                if set(index["column_names"]) & set(legacy):
+                    connection.execute(text(f"DROP INDEX {index['name']}"))
+            for attribute in legacy:
+                connection.execute(text(f"ALTER TABLE {name} DROP COLUMN {attribute}"))
+        migrated[name] = legacy
+    return migrated
@@ -0,0 +1,174 @@
+import re
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from config.db import Base
+from models.db_models import Sales, Purchase, MemoGive, CertifiedStock
+
+# entity -> (code, model, title columns, body columns). Title matches rank
+# above body matches; the code keeps FTS5 rowids unique across entities.
+ENTITIES = {
+    "sales": (1, Sales, ("customer", "lab_no"), ("iteam", "shape", "size", "sales_executive", "remark")),
+    "purchase": (2, Purchase, ("vendor", "lab_no"), ("iteam", "shape", "size", "purchase_executive", "remark")),
+    "memo_give": (3, MemoGive, ("client_name",), ("item", "purity", "remark")),
+    "certified_stock": (4, CertifiedStock, ("certi_no", "lab"), ("shape", "size", "color", "clarity", "remark")),
+}
+_ROWID_SHIFT = 40
+
+_TOKEN = re.compile(r"\w+", re.UNICODE)
+
+
+def _rowid(entity: str, entity_id: int) -> int:
+    return (ENTITIES[entity][0] << _ROWID_SHIFT) | entity_id
+
+
+def _document(entity: str, row):
+    _, _, title_cols, body_cols = ENTITIES[entity]
+    title = " ".join(str(getattr(row, col)) for col in title_cols if getattr(row, col))
+    body = " ".join(str(getattr(row, col)) for col in body_cols if getattr(row, col))
+    return title, body
+
+
+def create_search_index(connection):
+    """
+    Create the search table for the connected backend (FTS5 on SQLite,
+    tsvector + trigram on Postgres) if it is missing.
+
+    Runs with the migrations (see _migrate below), never inside a request's
+    transaction; on Postgres pg_trgm needs a role allowed to create extensions.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        connection.execute(text("""
+            CREATE TABLE IF NOT EXISTS search_index (
+                entity TEXT NOT NULL,
+                entity_id INTEGER NOT NULL,
+                title TEXT,
+                body TEXT,
+                document TSVECTOR GENERATED ALWAYS AS (
+                    setweight(to_tsvector('simple', coalesce(title, '')), 'A') ||
+                    setweight(to_tsvector('simple', coalesce(body, '')), 'B')
+                ) STORED,
+                PRIMARY KEY (entity, entity_id)
+            )
+        """))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_search_index_document ON search_index USING GIN (document)"))
+        connection.execute(text("CREATE INDEX IF NOT EXISTS ix_search_index_title_trgm ON search_index USING GIN (title gin_trgm_ops)"))
+    else:
+        connection.execute(text(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS search_index "
+            "USING fts5(entity UNINDEXED, entity_id UNINDEXED, title, body, prefix='2 3 4')"
+        ))
+
+
+# The table is not a model, so it is created whenever the models' tables are
+# (Base.metadata.create_all in main.py and serve.migrate())
+@event.listens_for(Base.metadata, "after_create")
+def _migrate(target, connection, **kw):
+    create_search_index(connection)
+
+
+def index_row(connection, entity: str, row):
+    title, body = _document(entity, row)
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("""
+            INSERT INTO search_index (entity, entity_id, title, body)
+            VALUES (:entity, :entity_id, :title, :body)
+            ON CONFLICT (entity, entity_id) DO UPDATE SET title = EXCLUDED.title, body = EXCLUDED.body
+        """), {"entity": entity, "entity_id": row.id, "title": title, "body": body})
+    else:
+        rowid = _rowid(entity, row.id)
+        connection.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {"rowid": rowid})
+        connection.execute(text(
+            "INSERT INTO search_index (rowid, entity, entity_id, title, body) "
+            "VALUES (:rowid, :entity, :entity_id, :title, :body)"
+        ), {"rowid": rowid, "entity": entity, "entity_id": row.id, "title": title, "body": body})
+
+
+def unindex_row(connection, entity: str, entity_id: int):
+    if connection.dialect.name == "postgresql":
+        connection.execute(
+            text("DELETE FROM search_index WHERE entity = :entity AND entity_id = :entity_id"),
+            {"entity": entity, "entity_id": entity_id},
+        )
+    else:
+        connection.execute(text("DELETE FROM search_index WHERE rowid = :rowid"), {"rowid": _rowid(entity, entity_id)})
+
+
+def _register(entity: str, model):
+    # Mapper events run inside the flush, so the index commits or rolls back with the row
+    @event.listens_for(model, "after_insert")
+    @event.listens_for(model, "after_update")
+    def _after_write(mapper, connection, target):
+        index_row(connection, entity, target)
+
+    @event.listens_for(model, "after_delete")
+    def _after_delete(mapper, connection, target):
+        unindex_row(connection, entity, target.id)
+
+
+for _entity, (_, _model, _, _) in ENTITIES.items():
+    _register(_entity, _model)
+
+
+def _terms(query: str):
+    return [token.lower() for token in _TOKEN.findall(query)][:8]
+
+
+def search(db: Session, query: str, entities=None, limit: int = 20):
+    terms = _terms(query)
+    if not terms:
+        return []
+    connection = db.connection()
+    entities = [e for e in (entities or ENTITIES) if e in ENTITIES]
+    params = {"limit": limit, "entities": entities}
+
+    if connection.dialect.name == "postgresql":
+        params["tsquery"] = " & ".join(f"{term}:*" for term in terms)
+        params["raw"] = " ".join(terms)
+        sql = text("""
+            SELECT entity, entity_id, title,
+                   ts_headline('simple', coalesce(title, '') || ' ' || coalesce(body, ''),
+                               to_tsquery('simple', :tsquery)) AS snippet,
+                   ts_rank(document, to_tsquery('simple', :tsquery)) + similarity(title, :raw) AS score
+            FROM search_index
+            WHERE entity = ANY(:entities)
+              AND (document @@ to_tsquery('simple', :tsquery) OR title % :raw)
+            ORDER BY score DESC
+            LIMIT :limit
+        """)
+    else:
+        # Every term is a prefix match; quoting keeps FTS5 operators out of user input
+        params["match"] = " ".join(f'"{term}"*' for term in terms)
+        placeholders = ", ".join(f":entity_{i}" for i in range(len(entities)))
+        params.update({f"entity_{i}": entity for i, entity in enumerate(entities)})
+        sql = text(f"""
+            SELECT entity, entity_id, title,
+                   snippet(search_index, -1, '[', ']', '...', 10) AS snippet,
+                   -bm25(search_index, 0.0, 0.0, 10.0, 1.0) AS score
+            FROM search_index
+            WHERE search_index MATCH :match AND entity IN ({placeholders})
+            ORDER BY bm25(search_index, 0.0, 0.0, 10.0, 1.0)
+            LIMIT :limit
+        """)
+
+    return [
+        {"entity": entity, "id": entity_id, "title": title, "snippet": snippet, "score": round(float(score), 4)}
+        for entity, entity_id, title, snippet, score in connection.execute(sql, params)
+    ]
+
+
+def rebuild(db: Session, batch_size: int = 1000):
+    """Repopulate the search index from the ledgers (backfills, or after bulk SQL imports)."""
+    connection = db.connection()
+    # Standalone runs may come before the first migration
+    create_search_index(connection)
+    connection.execute(text("DELETE FROM search_index"))
+    count = 0
+    for entity, (_, model, _, _) in ENTITIES.items():
+        for row in db.query(model).yield_per(batch_size):
+            index_row(connection, entity, row)
+            count += 1
+    db.commit()
+    return count
@@ -0,0 +1,141 @@
+import os
+from decimal import Decimal
+
+from sqlalchemy import case, func, or_, select
+from sqlalchemy.orm import Session
+
+from models.fx_rate_model import FxRate
+from schemas.fx_rate import FxRateCreate
+
+# Reports are expressed in this currency; blank currencies are assumed to be in it
+BASE_CURRENCY = os.getenv("BASE_CURRENCY", "INR").upper()
+
+
+def normalize(currency) -> str:
+    return (currency or "").strip().upper()
+
+
+def upsert_rate(db: Session, data: FxRateCreate):
+    """Set a day's rate; the caller reconverts the rows it applies to (see affected_range) and commits."""
+    currency = normalize(data.currency)
+    rate = db.query(FxRate).filter(FxRate.currency == currency, FxRate.date == data.date).first()
+    if rate is None:
+        rate = FxRate(currency=currency, date=data.date)
+        db.add(rate)
+    rate.rate = data.rate
+    db.flush()
+    return rate
+
+
+def get_rates(db: Session, currency: str = None):
+    query = db.query(FxRate)
+    if currency:
+        query = query.filter(FxRate.currency == normalize(currency))
+    return query.order_by(FxRate.currency, FxRate.date.desc()).all()
+
+
+def delete_rate(db: Session, rate_id: int):
+    """Remove a rate; like upsert_rate, the caller reconverts and commits."""
+    rate = db.query(FxRate).filter(FxRate.id == rate_id).first()
+    if rate:
+        db.delete(rate)
+        db.flush()
+    return rate
+
+
+def affected_range(db: Session, currency: str, on):
+    """
+    (start, end) dates of the rows whose conversion a rate of `currency`
+    dated `on` decides: from `on` up to, not including, the currency's next
+    rate (end is None when there is none).
+    """
+    end = (
+        db.query(func.min(FxRate.date))
+        .filter(FxRate.currency == normalize(currency), FxRate.date > on)
+        .scalar()
+    )
+    return on, end
+
+
+def rows_in_range(db: Session, model, currency: str, start, end=None):
+    """Rows of `model` written in `currency` and dated in [start, end)."""
+    query = db.query(model).filter(func.upper(func.trim(model.currency)) == normalize(currency), model.date >= start)
+    if end is not None:
+        query = query.filter(model.date < end)
+    return query.order_by(model.date, model.id)
+
+
+def rate_to_base(model):
+    """
+    SQL expression for the rate that converts one ledger row into the base currency.
+
+    It is a correlated lookup of the latest rate on or before the row's date,
+    answered from the (currency, date) unique index, so a report converts
+    every row inside its single grouped query. NULL means no rate is known.
+    """
+    code = func.upper(func.trim(model.currency))
+    latest = (
+        select(FxRate.rate)
+        .where(FxRate.currency == code, FxRate.date <= model.date)
+        .order_by(FxRate.date.desc())
+        .limit(1)
+        .correlate(model)
+        .scalar_subquery()
+    )
+    return case(
+        (or_(model.currency.is_(None), func.trim(model.currency) == "", code == BASE_CURRENCY), 1),
+        else_=latest,
+    )
+
+
+def in_base(model, amount_column):
+    return amount_column * rate_to_base(model)
+
+
+def convert(db: Session, amount, currency, on):
+    """
+    Convert one amount written on date `on`. Returns None when no rate is
+    known yet: callers record the row as unconverted rather than mixing a
+    foreign amount into base-currency totals.
+    """
+    if amount is None:
+        return None
+    code = normalize(currency)
+    if not code or code == BASE_CURRENCY:
+        return amount
+    rate = (
+        db.query(FxRate.rate)
+        .filter(FxRate.currency == code, FxRate.date <= on)
+        .order_by(FxRate.date.desc())
+        .limit(1)
+        .scalar()
+    )
+    if rate is None:
+        return None
+    return Decimal(str(amount)) * Decimal(str(rate))
+
+
+def totals_in_base(db: Session, model, amount_column, group_column=None, date_from=None, date_to=None,
+                   limit: int = None):
+    """Row count, base-currency total and count of rows without a rate, optionally grouped."""
+    converted = in_base(model, amount_column)
+    columns = [
+        func.count(model.id),
+        func.sum(converted),
+        func.sum(case((rate_to_base(model).is_(None), 1), else_=0)),
+    ]
+    query = db.query(*([group_column] if group_column is not None else []), *columns)
+    if date_from:
+        query = query.filter(model.date >= date_from)
+    if date_to:
+        query = query.filter(model.date <= date_to)
+    if group_column is None:
+        count, total, unconverted = query.one()
+        return {"count": count, "total": float(total or 0), "unconverted_rows": unconverted or 0}
+    query = query.group_by(group_column).order_by(func.sum(converted).desc())
+    if limit:
+        query = query.limit(limit)
+    return [
+        {"group": group, "count": count, "total": float(total or 0), "unconverted_rows": unconverted or 0}
+        for group, count, total, unconverted in query
+    ]
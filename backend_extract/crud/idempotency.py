@@ -0,0 +1,97 @@
+import hashlib
+import json
+import os
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+
+from models.idempotency_model import IdempotencyKey
+
+# How long a stored response is replayed; later retries with the same key run again
+IDEMPOTENCY_TTL_HOURS = int(os.getenv("IDEMPOTENCY_TTL_HOURS", "24"))
+# Times a request that lost the race for a key tries again when the winner's row is gone before it can be read
+IDEMPOTENCY_CLAIM_ATTEMPTS = int(os.getenv("IDEMPOTENCY_CLAIM_ATTEMPTS", "3"))
+
+
+def _fingerprint(payload) -> str:
+    return hashlib.sha256(json.dumps(jsonable_encoder(payload), sort_keys=True).encode()).hexdigest()
+
+
+def _replay(record: IdempotencyKey, endpoint: str, fingerprint: str):
+    if record.endpoint != endpoint or record.fingerprint != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used for a different request")
+    return JSONResponse(
+        status_code=record.status_code,
+        content=json.loads(record.response),
+        headers={"Idempotent-Replayed": "true"},
+    )
+
+
+def claim(db: Session, key: str, endpoint: str, payload):
+    """
+    Reserve `key` for this request, or return the stored response of the
+    request that already used it.
+
+    Must be the first write of the request's transaction. The key row is
+    inserted right away and only committed together with the ledger rows
+    (see complete()), so a concurrent duplicate blocks on the key's primary
+    key index until the first request commits, then replays its response.
+    A request that fails rolls the key back and the client may retry it.
+    Returns None when the request should run.
+
+    If the winner's row has already been removed again (expired and purged)
+    when the loser reads it, the claim starts over; after
+    IDEMPOTENCY_CLAIM_ATTEMPTS such rounds the request gets a 409.
+    """
+    if key is None:
+        return None
+    fingerprint = _fingerprint(payload)
+    for _ in range(IDEMPOTENCY_CLAIM_ATTEMPTS):
+        record = db.get(IdempotencyKey, key)
+        if record is not None and record.expires_at > datetime.utcnow():
+            return _replay(record, endpoint, fingerprint)
+        if record is not None:
+            db.delete(record)
+            db.flush()
+        try:
+            db.add(IdempotencyKey(
+                key=key,
+                endpoint=endpoint,
+                fingerprint=fingerprint,
+                status_code=0,
+                response="null",
+                expires_at=datetime.utcnow() + timedelta(hours=IDEMPOTENCY_TTL_HOURS),
+            ))
+            db.flush()
+            return None
+        except IntegrityError:
+            # Lost the race: nothing else has been written yet, so start over and read the winner's response
+            db.rollback()
+            record = db.get(IdempotencyKey, key)
+            if record is not None:
+                return _replay(record, endpoint, fingerprint)
+    raise HTTPException(status_code=409, detail="Idempotency-Key is in use by a concurrent request, retry shortly")
+
+
+def complete(db: Session, key: str, row, schema, status_code: int = 200):
+    """Store `row` rendered as the endpoint's response `schema` for `key`, before the transaction commits."""
+    if key is None:
+        return
+    fields = getattr(schema, "model_fields", None) or schema.__fields__
+    record = db.get(IdempotencyKey, key)
+    record.status_code = status_code
+    record.response = json.dumps(jsonable_encoder({name: getattr(row, name, None) for name in fields}))
+
+
+def purge_expired(db: Session):
+    count = (
+        db.query(IdempotencyKey)
+        .filter(IdempotencyKey.expires_at <= datetime.utcnow())
+        .delete(synchronize_session=False)
+    )
+    db.commit()
+    return count
@@ -1,6 +1,7 @@
 from sqlalchemy.orm import Session
 from models.igi_receive_model import IGIReceive
 from schemas.igi_receive import IGIReceiveCreate
+from crud import igi_reconcile
 
 def get_all_igi(db: Session):
     return db.query(IGIReceive).all()
@@ -11,6 +12,8 @@ def get_igi(db: Session, receive_id: int):
 def create_igi(db: Session, entry: IGIReceiveCreate):
     new_entry = IGIReceive(**entry.dict())
     db.add(new_entry)
+    db.flush()
+    igi_reconcile.record_receive(db, new_entry)
     db.commit()
     db.refresh(new_entry)
     return new_entry
@@ -18,8 +21,11 @@ def create_igi(db: Session, entry: IGIReceiveCreate):
 def update_igi(db: Session, receive_id: int, entry: IGIReceiveCreate):
     igi = db.query(IGIReceive).filter(IGIReceive.id == receive_id).first()
     if igi:
+        old_key = igi_reconcile.item_key(igi.item_name)
         for key, value in entry.dict().items():
             setattr(igi, key, value)
+        db.flush()
+        igi_reconcile.rebuild_keys(db, [old_key, igi_reconcile.item_key(igi.item_name)])
         db.commit()
         db.refresh(igi)
     return igi
@@ -28,5 +34,7 @@ def delete_igi(db: Session, receive_id: int):
     igi = db.query(IGIReceive).filter(IGIReceive.id == receive_id).first()
     if igi:
         db.delete(igi)
+        db.flush()
+        igi_reconcile.rebuild_keys(db, [igi_reconcile.item_key(igi.item_name)])
         db.commit()
     return igi
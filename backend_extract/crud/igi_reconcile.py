@@ -0,0 +1,149 @@
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models.db_models import IGIIssue
+from models.igi_receive_model import IGIReceive
+from models.igi_reconcile_model import IGIPending, IGIMatch
+
+# Issues carry no certificate number (the lab assigns it), so stones are
+# matched back to the oldest open issue of the same item, one piece per
+# received certificate.
+
+
+def item_key(value) -> str:
+    return (value or "").strip().upper()
+
+
+def _match(db: Session, receive: IGIReceive, pending: IGIPending = None):
+    key = item_key(receive.item_name)
+    if pending is None:
+        pending = (
+            db.query(IGIPending)
+            .filter(IGIPending.item_key == key, IGIPending.pcs_pending > 0, IGIPending.issue_date <= receive.receive_date)
+            .order_by(IGIPending.issue_date, IGIPending.issue_id)
+            .first()
+        )
+    match = IGIMatch(
+        receive_id=receive.id,
+        item_key=key,
+        certificate_no=(receive.certificate_no or "").strip() or None,
+        receive_date=receive.receive_date,
+    )
+    if pending is not None:
+        pending.pcs_received += 1
+        pending.pcs_pending -= 1
+        pending.last_receive_date = max(filter(None, [pending.last_receive_date, receive.receive_date]))
+        match.issue_id = pending.issue_id
+        match.turnaround_days = (receive.receive_date - pending.issue_date).days
+    db.add(match)
+    db.flush()
+    return match
+
+
+def record_issue(db: Session, issue: IGIIssue):
+    """Open a pending-at-lab row for a new issue and attach any stones that came back unmatched."""
+    pcs = issue.pcs if issue.pcs and issue.pcs > 0 else 1
+    pending = IGIPending(
+        issue_id=issue.id,
+        item_key=item_key(issue.item),
+        issue_date=issue.date,
+        pcs_issued=pcs,
+        pcs_received=0,
+        pcs_pending=pcs,
+    )
+    db.add(pending)
+    db.flush()
+
+    unmatched = (
+        db.query(IGIMatch)
+        .filter(IGIMatch.item_key == pending.item_key, IGIMatch.issue_id.is_(None), IGIMatch.receive_date >= issue.date)
+        .order_by(IGIMatch.receive_date, IGIMatch.receive_id)
+        .limit(pcs)
+        .all()
+    )
+    for match in unmatched:
+        pending.pcs_received += 1
+        pending.pcs_pending -= 1
+        pending.last_receive_date = max(filter(None, [pending.last_receive_date, match.receive_date]))
+        match.issue_id = pending.issue_id
+        match.turnaround_days = (match.receive_date - pending.issue_date).days
+    db.flush()
+    return pending
+
+
+def record_receive(db: Session, receive: IGIReceive):
+    return _match(db, receive)
+
+
+def rebuild_keys(db: Session, keys):
+    """Replay the issues and receives of the given items after an edit or delete."""
+    keys = sorted({key for key in keys if key is not None})
+    if not keys:
+        return
+    db.query(IGIMatch).filter(IGIMatch.item_key.in_(keys)).delete(synchronize_session=False)
+    db.query(IGIPending).filter(IGIPending.item_key.in_(keys)).delete(synchronize_session=False)
+    db.flush()
+
+    issues = (
+        db.query(IGIIssue)
+        .filter(func.upper(func.trim(func.coalesce(IGIIssue.item, ""))).in_(keys))
+        .order_by(IGIIssue.date, IGIIssue.id)
+        .all()
+    )
+    for issue in issues:
+        record_issue(db, issue)
+    receives = (
+        db.query(IGIReceive)
+        .filter(func.upper(func.trim(func.coalesce(IGIReceive.item_name, ""))).in_(keys))
+        .order_by(IGIReceive.receive_date, IGIReceive.id)
+        .all()
+    )
+    for receive in receives:
+        _match(db, receive)
+
+
+def rebuild_all(db: Session):
+    db.query(IGIMatch).delete(synchronize_session=False)
+    db.query(IGIPending).delete(synchronize_session=False)
+    keys = {item_key(item) for (item,) in db.query(IGIIssue.item).distinct()}
+    keys |= {item_key(item) for (item,) in db.query(IGIReceive.item_name).distinct()}
+    rebuild_keys(db, keys)
+    db.commit()
+    return len(keys)
+
+
+def get_pending(db: Session, item: str = None):
+    query = db.query(IGIPending).filter(IGIPending.pcs_pending > 0)
+    if item:
+        query = query.filter(IGIPending.item_key == item_key(item))
+    return query.order_by(IGIPending.issue_date, IGIPending.issue_id).all()
+
+
+def get_unmatched(db: Session):
+    return db.query(IGIMatch).filter(IGIMatch.issue_id.is_(None)).order_by(IGIMatch.receive_date).all()
+
+
+def get_by_certificate(db: Session, certificate_no: str):
+    return db.query(IGIMatch).filter(IGIMatch.certificate_no == certificate_no.strip()).first()
+
+
+def turnaround_stats(db: Session, item: str = None):
+    query = db.query(
+        IGIMatch.item_key,
+        func.count(IGIMatch.receive_id),
+        func.avg(IGIMatch.turnaround_days),
+        func.min(IGIMatch.turnaround_days),
+        func.max(IGIMatch.turnaround_days),
+    ).filter(IGIMatch.issue_id.isnot(None))
+    if item:
+        query = query.filter(IGIMatch.item_key == item_key(item))
+    return [
+        {
+            "item": key,
+            "stones": count,
+            "avg_days": round(float(avg), 1) if avg is not None else None,
+            "min_days": low,
+            "max_days": high,
+        }
+        for key, count, avg, low, high in query.group_by(IGIMatch.item_key).all()
+    ]
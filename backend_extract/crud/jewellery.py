@@ -1,18 +1,122 @@
 # crud/jewellery.py
 
+from datetime import datetime
+from decimal import Decimal
+
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.orm import Session
-from models.jewellery_model import JewelleryItem
+from models.db_models import JewelleryStock
+from models.jewellery_model import JewelleryItem, JewelleryStatusHistory, JewelleryCount
 from schemas.jewellery import JewelleryItemCreate, JewelleryItemUpdate
+from crud.audit import current_actor
+
+# Status -> statuses an item may move to from it
+TRANSITIONS = {
+    "in_stock": ("reserved", "memo_out", "repair", "sold"),
+    "reserved": ("in_stock", "sold"),
+    "memo_out": ("in_stock", "sold"),
+    "repair": ("in_stock",),
+    "sold": ("in_stock",),  # customer return
+}
+STATUSES = tuple(TRANSITIONS)
+DEFAULT_STATUS = "in_stock"
+
+ZERO = Decimal("0")
+
+
+def _clean(value) -> str:
+    return (value or "").strip()
+
+
+def _amount(value) -> Decimal:
+    return Decimal(str(value)).quantize(Decimal("0.01")) if value is not None else ZERO
+
+
+def normalize_status(value) -> str:
+    """"Memo Out" -> "memo_out"; blank means a new item in stock."""
+    status = _clean(value).lower().replace("-", "_").replace(" ", "_")
+    return status or DEFAULT_STATUS
+
+
+def normalize_purity(value) -> str:
+    return _clean(value).upper()
+
+
+def check_transition(current, new: str):
+    if new not in TRANSITIONS:
+        raise ValueError(f"Unknown status {new!r}; expected one of {', '.join(STATUSES)}")
+    # Items written before statuses were validated may move to any valid status
+    if current == new or current not in TRANSITIONS:
+        return
+    if new not in TRANSITIONS[current]:
+        raise ValueError(f"Cannot change status from {current} to {new}")
+
+
+def _insert_if_missing(dialect: str):
+    if dialect == "postgresql":
+        return postgresql.insert(JewelleryCount).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(JewelleryCount).on_conflict_do_nothing()
+    return JewelleryCount.__table__.insert()
+
+
+def apply_count(db: Session, kind: str, status, purity, sign: int, weight=None, net_wt=None, value=None):
+    """Add one row (sign=1) to, or take it out of (sign=-1), its (kind, status, purity) totals."""
+    key = dict(kind=kind, status=status or "", purity=normalize_purity(purity))
+    connection = db.connection()
+    # Two writers creating the same totals row both succeed: the second insert is ignored
+    connection.execute(
+        _insert_if_missing(connection.dialect.name).values(**key, count=0, weight=ZERO, net_wt=ZERO, value=ZERO)
+    )
+    # One atomic increment, so concurrent writes to a row never lose an update
+    db.query(JewelleryCount).filter_by(**key).update({
+        JewelleryCount.count: JewelleryCount.count + sign,
+        JewelleryCount.weight: JewelleryCount.weight + sign * _amount(weight),
+        JewelleryCount.net_wt: JewelleryCount.net_wt + sign * _amount(net_wt),
+        JewelleryCount.value: JewelleryCount.value + sign * _amount(value),
+    }, synchronize_session=False)
+
+
+def apply_item(db: Session, item: JewelleryItem, sign: int = 1):
+    apply_count(db, "items", item.status, item.purity, sign, weight=item.weight)
+
+
+def apply_stock(db: Session, record: JewelleryStock, sign: int = 1):
+    apply_count(db, "stock", "", record.purity, sign, weight=record.gross_wt, net_wt=record.net_wt,
+                value=record.value)
+
+
+def _record_transition(db: Session, item: JewelleryItem, from_status, remark: str = None):
+    db.add(JewelleryStatusHistory(
+        item_id=item.id,
+        from_status=from_status,
+        to_status=item.status,
+        changed_at=datetime.utcnow(),
+        changed_by=current_actor.get(),
+        remark=remark,
+    ))
 
 def create_jewellery(db: Session, data: JewelleryItemCreate):
     item = JewelleryItem(**data.dict())
+    item.status = normalize_status(item.status)
+    check_transition(None, item.status)
+    item.purity = normalize_purity(item.purity) or None
     db.add(item)
+    db.flush()
+    apply_item(db, item)
+    _record_transition(db, item, None)
     db.commit()
     db.refresh(item)
     return item
 
-def get_all_jewellery(db: Session):
-    return db.query(JewelleryItem).all()
+def get_all_jewellery(db: Session, status: str = None, purity: str = None):
+    query = db.query(JewelleryItem)
+    if status:
+        query = query.filter(JewelleryItem.status == normalize_status(status))
+    if purity:
+        query = query.filter(JewelleryItem.purity == normalize_purity(purity))
+    return query.all()
 
 def get_jewellery_by_id(db: Session, item_id: int):
     return db.query(JewelleryItem).filter(JewelleryItem.id == item_id).first()
@@ -20,15 +124,113 @@ def get_jewellery_by_id(db: Session, item_id: int):
 def update_jewellery(db: Session, item_id: int, update_data: JewelleryItemUpdate):
     item = get_jewellery_by_id(db, item_id)
     if item:
+        previous = item.status
+        status = normalize_status(update_data.status) if update_data.status is not None else previous
+        check_transition(previous, status)
+        apply_item(db, item, sign=-1)
         for key, value in update_data.dict().items():
             setattr(item, key, value)
+        item.status = status
+        item.purity = normalize_purity(item.purity) or None
+        apply_item(db, item)
+        if status != previous:
+            _record_transition(db, item, previous)
         db.commit()
         db.refresh(item)
     return item
 
+def set_status(db: Session, item_id: int, status: str, remark: str = None):
+    """Move an item to `status`, if the state machine allows it, and record the change."""
+    item = get_jewellery_by_id(db, item_id)
+    if item:
+        previous = item.status
+        status = normalize_status(status)
+        check_transition(previous, status)
+        if status != previous:
+            apply_item(db, item, sign=-1)
+            item.status = status
+            item.last_updated = datetime.utcnow().date()
+            apply_item(db, item)
+            _record_transition(db, item, previous, remark)
+            db.commit()
+            db.refresh(item)
+    return item
+
+def get_history(db: Session, item_id: int):
+    return (
+        db.query(JewelleryStatusHistory)
+        .filter(JewelleryStatusHistory.item_id == item_id)
+        .order_by(JewelleryStatusHistory.changed_at, JewelleryStatusHistory.id)
+        .all()
+    )
+
 def delete_jewellery(db: Session, item_id: int):
     item = get_jewellery_by_id(db, item_id)
     if item:
+        apply_item(db, item, sign=-1)
         db.delete(item)
         db.commit()
     return item
+
+def _blank_totals():
+    return {"count": 0, "weight": 0.0, "net_wt": 0.0, "value": 0.0}
+
+def summary(db: Session):
+    """Counts, weights and values per status and purity, read off the maintained totals."""
+    result = {
+        "items": {"total": _blank_totals(), "by_status": {}, "by_purity": {}},
+        "stock": {"total": _blank_totals(), "by_purity": {}},
+    }
+    for counter in db.query(JewelleryCount).filter(JewelleryCount.count != 0):
+        kind = result[counter.kind]
+        targets = [kind["total"], kind["by_purity"].setdefault(counter.purity or "unspecified", _blank_totals())]
+        if counter.kind == "items":
+            targets.append(kind["by_status"].setdefault(counter.status or "unspecified", _blank_totals()))
+        for totals in targets:
+            totals["count"] += counter.count
+            totals["weight"] += float(counter.weight)
+            totals["net_wt"] += float(counter.net_wt)
+            totals["value"] += float(counter.value)
+    return result
+
+def _normalize_stored(db: Session, column, normalize):
+    """Rewrite each distinct stored value of `column` to its normalized form, one UPDATE per value."""
+    for (value,) in db.query(column).distinct().all():
+        normalized = normalize(value)
+        if normalized != value:
+            matches = column.is_(None) if value is None else column == value
+            db.query(JewelleryItem).filter(matches).update({column: normalized}, synchronize_session=False)
+
+
+def rebuild_counts(db: Session):
+    """
+    Recompute every total from jewellery_items and jewellery_stock with one
+    grouped query each. Items written before statuses and purities were
+    normalized ("Memo Out", " 18k") are stored normalized first, so they
+    count, and are later taken out of the totals, under the same key as
+    items written since.
+    """
+    _normalize_stored(db, JewelleryItem.status, normalize_status)
+    _normalize_stored(db, JewelleryItem.purity, lambda purity: normalize_purity(purity) or None)
+    db.query(JewelleryCount).delete(synchronize_session=False)
+    items = (
+        db.query(JewelleryItem.status, JewelleryItem.purity, func.count(JewelleryItem.id),
+                 func.sum(JewelleryItem.weight))
+        .group_by(JewelleryItem.status, JewelleryItem.purity)
+    )
+    stock = (
+        db.query(func.upper(func.trim(JewelleryStock.purity)), func.count(JewelleryStock.id),
+                 func.sum(JewelleryStock.gross_wt), func.sum(JewelleryStock.net_wt), func.sum(JewelleryStock.value))
+        .group_by(func.upper(func.trim(JewelleryStock.purity)))
+    )
+    rows = 0
+    for status, purity, count, weight in items:
+        db.add(JewelleryCount(kind="items", status=status or "", purity=purity or "", count=count,
+                              weight=_amount(weight), net_wt=ZERO, value=ZERO))
+        rows += count
+    for purity, count, gross_wt, net_wt, value in stock:
+        db.add(JewelleryCount(kind="stock", status="", purity=purity or "", count=count,
+                              weight=_amount(gross_wt), net_wt=_amount(net_wt), value=_amount(value)))
+        rows += count
+    db.commit()
+    return rows
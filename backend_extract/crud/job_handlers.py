@@ -0,0 +1,97 @@
+import os
+import runpy
+
+# worker_pool is re-exported so main.py starts the pool that sees these handlers
+from crud.jobs import job, worker_pool
+from schemas.job import ReconcilePayload, ExportPayload
+
+# Heavy modules (pandas, pyarrow) are imported inside the handlers so that
+# registering them costs nothing at API start-up.
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@job("jewellery_summary")
+def jewellery_summary(db, payload, progress):
+    from routes.jewellery_management_routes import build_jewellery_summary
+    return build_jewellery_summary()
+
+
+# Appends rows from a spreadsheet on the server, so a failed run is not retried
+# automatically and it is never queued over HTTP
+@job("import_data", idempotent=False, api=False)
+def import_data(db, payload, progress):
+    # import_data.py is a standalone script that reads dashboard_data.xlsx and commits on its own
+    runpy.run_path(os.path.join(BASE_DIR, "import_data.py"), run_name="__main__")
+    return {"script": "import_data.py"}
+
+
+@job("rebuild_cost_layers")
+def rebuild_cost_layers(db, payload, progress):
+    from crud.costing import rebuild_all, COSTING_METHOD
+    return {"method": COSTING_METHOD, "rows": rebuild_all(db)}
+
+
+@job("rebuild_party_ledger")
+def rebuild_party_ledger(db, payload, progress):
+    from crud.ledger import rebuild_all
+    return {"entries": rebuild_all(db)}
+
+
+@job("rebuild_price_matrix")
+def rebuild_price_matrix(db, payload, progress):
+    from crud.pricing import rebuild_all
+    return {"rows": rebuild_all(db)}
+
+
+@job("audit_certificates")
+def audit_certificates(db, payload, progress):
+    from crud.certificates import audit_all
+    return audit_all(db)
+
+
+@job("rebuild_jewellery_counts")
+def rebuild_jewellery_counts(db, payload, progress):
+    from crud.jewellery import rebuild_counts
+    return {"rows": rebuild_counts(db)}
+
+
+@job("reconcile_branch_stock", payload=ReconcilePayload)
+def reconcile_branch_stock(db, payload, progress):
+    from crud.stock_balance import reconcile
+    return {"mismatches": reconcile(db, fix=bool(payload.get("fix")))}
+
+
+@job("rebuild_igi_reconciliation")
+def rebuild_igi_reconciliation(db, payload, progress):
+    from crud.igi_reconcile import rebuild_all
+    return {"rows": rebuild_all(db)}
+
+
+@job("rebuild_search_index")
+def rebuild_search_index(db, payload, progress):
+    from crud.fulltext import rebuild
+    return {"rows": rebuild(db)}
+
+
+@job("refresh_analytics_snapshot")
+def refresh_analytics_snapshot(db, payload, progress):
+    from crud.analytics import snapshot
+    return snapshot.refresh()
+
+
+@job("export_parquet", payload=ExportPayload)
+def export_parquet(db, payload, progress):
+    from crud.parquet_export import export_all, EXPORT_TABLES
+    tables = payload.get("tables") or list(EXPORT_TABLES)
+    counts = {}
+    for number, table in enumerate(tables):
+        progress(number, len(tables), f"exporting {table}")
+        counts.update(export_all(db, [table], full=bool(payload.get("full"))))
+    return counts
+
+
+@job("purge_idempotency_keys")
+def purge_idempotency_keys(db, payload, progress):
+    from crud.idempotency import purge_expired
+    return {"deleted": purge_expired(db)}
@@ -0,0 +1,319 @@
+import json
+import logging
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from pydantic import ValidationError
+from sqlalchemy import and_, or_, update
+from sqlalchemy.orm import Session
+
+from config.db import SessionLocal
+from models.job_model import Job
+from schemas.job import NoPayload
+
+logger = logging.getLogger(__name__)
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "2"))
+JOB_POLL_SECONDS = float(os.getenv("JOB_POLL_SECONDS", "1"))
+# Every pool stamps the jobs it is running this often; a "running" job whose
+# stamp is older than JOB_STALE_AFTER has lost its worker (process killed) and
+# is queued again, or failed when it has no attempts left
+JOB_HEARTBEAT_SECONDS = float(os.getenv("JOB_HEARTBEAT_SECONDS", "30"))
+JOB_STALE_AFTER = int(os.getenv("JOB_STALE_AFTER", "300"))
+# Failed attempts are retried after 30s, 60s, 120s, ...
+JOB_RETRY_DELAY = int(os.getenv("JOB_RETRY_DELAY", "30"))
+
+# kind -> handler(db, payload, progress) returning a JSON-serializable result
+HANDLERS = {}
+# kind -> pydantic model its payload must validate against
+PAYLOADS = {}
+# Kinds that are safe to run again after a failure part-way through
+IDEMPOTENT = set()
+# Kinds an admin may queue through POST /jobs/
+API_KINDS = set()
+
+
+def job(kind: str, idempotent: bool = True, payload=NoPayload, api: bool = True):
+    """
+    Register a function as the handler for jobs of `kind`.
+
+    Jobs of a kind registered with idempotent=False (e.g. one that appends
+    rows) get a single attempt unless the caller asks for more. Payloads
+    are checked against `payload` before the job is queued; kinds with
+    api=False can only be queued from the server itself.
+    """
+    def register(handler):
+        HANDLERS[kind] = handler
+        PAYLOADS[kind] = payload
+        for kinds, member in ((IDEMPOTENT, idempotent), (API_KINDS, api)):
+            if member:
+                kinds.add(kind)
+            else:
+                kinds.discard(kind)
+        return handler
+    return register
+
+
+def to_dict(record: Job):
+    return {
+        column.name: getattr(record, column.name) for column in Job.__table__.columns
+    } | {
+        "payload": json.loads(record.payload) if record.payload else None,
+        "result": json.loads(record.result) if record.result else None,
+    }
+
+
+def validate_payload(kind: str, payload: dict = None) -> dict:
+    """The payload as the handler of `kind` will see it; ValueError when it does not fit."""
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind '{kind}'")
+    try:
+        return PAYLOADS[kind](**(payload or {})).dict()
+    except ValidationError as e:
+        details = "; ".join(
+            f"{'.'.join(map(str, error['loc'])) or 'payload'}: {error['msg']}" for error in e.errors()
+        )
+        raise ValueError(f"Invalid payload for '{kind}': {details}")
+
+
+def enqueue(db: Session, kind: str, payload: dict = None, max_attempts: int = None):
+    payload = validate_payload(kind, payload)
+    if max_attempts is None:
+        max_attempts = 3 if kind in IDEMPOTENT else 1
+    record = Job(
+        kind=kind,
+        status=JOB_QUEUED,
+        payload=json.dumps(payload or {}),
+        max_attempts=max(1, max_attempts),
+        run_after=datetime.utcnow(),
+    )
+    db.add(record)
+    db.commit()
+    db.refresh(record)
+    return record
+
+
+def get_job(db: Session, job_id: int):
+    return db.query(Job).filter(Job.id == job_id).first()
+
+
+def get_jobs(db: Session, status: str = None, kind: str = None, limit: int = 100):
+    query = db.query(Job)
+    if status:
+        query = query.filter(Job.status == status)
+    if kind:
+        query = query.filter(Job.kind == kind)
+    return query.order_by(Job.id.desc()).limit(limit).all()
+
+
+def retry(db: Session, record: Job):
+    """Queue a failed job again with a fresh set of attempts."""
+    if record.status != JOB_FAILED:
+        raise ValueError(f"Job is {record.status}")
+    record.status = JOB_QUEUED
+    record.attempts = 0
+    record.error = None
+    record.run_after = datetime.utcnow()
+    db.commit()
+    return record
+
+
+def claim_next(db: Session, worker_id: str):
+    """
+    Atomically take the oldest runnable job, or return None.
+
+    The conditional UPDATE only succeeds for one worker even when several
+    processes poll the same table, so no job runs twice.
+    """
+    while True:
+        candidate = (
+            db.query(Job.id)
+            .filter(Job.status == JOB_QUEUED, Job.run_after <= datetime.utcnow())
+            .order_by(Job.run_after, Job.id)
+            .limit(1)
+            .scalar()
+        )
+        if candidate is None:
+            return None
+        claimed = db.execute(
+            update(Job)
+            .where(Job.id == candidate, Job.status == JOB_QUEUED)
+            .values(status=JOB_RUNNING, locked_by=worker_id, started_at=datetime.utcnow(),
+                    heartbeat_at=datetime.utcnow(), attempts=Job.attempts + 1, progress=0.0, message=None)
+        ).rowcount
+        db.commit()
+        if claimed:
+            return get_job(db, candidate)
+
+
+def requeue_stale(db: Session, older_than: int = JOB_STALE_AFTER):
+    """Queue again (or fail, with no attempts left) running jobs whose worker stopped heartbeating."""
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    stale = db.query(Job).filter(
+        Job.status == JOB_RUNNING,
+        or_(Job.heartbeat_at < cutoff, and_(Job.heartbeat_at.is_(None), Job.started_at < cutoff)),
+    )
+    exhausted = Job.attempts >= Job.max_attempts
+    failed = stale.filter(exhausted).update(
+        {Job.status: JOB_FAILED, Job.locked_by: None, Job.finished_at: datetime.utcnow(),
+         Job.error: "Worker stopped while running the job"},
+        synchronize_session=False,
+    )
+    requeued = stale.filter(~exhausted).update(
+        {Job.status: JOB_QUEUED, Job.locked_by: None, Job.run_after: datetime.utcnow()},
+        synchronize_session=False,
+    )
+    db.commit()
+    return requeued + failed
+
+
+def heartbeat(db: Session, job_ids):
+    if not job_ids:
+        return 0
+    count = (
+        db.query(Job)
+        .filter(Job.id.in_(job_ids), Job.status == JOB_RUNNING)
+        .update({Job.heartbeat_at: datetime.utcnow()}, synchronize_session=False)
+    )
+    db.commit()
+    return count
+
+
+def _progress_reporter(job_id: int, min_interval: float = 0.5):
+    last = {"at": 0.0}
+
+    def progress(done, total=None, message: str = None):
+        """Report `done` out of `total` (or a 0..1 fraction when total is None)."""
+        now = time.monotonic()
+        if now - last["at"] < min_interval:
+            return
+        last["at"] = now
+        fraction = done / total if total else done
+        # Own session: the handler's transaction must not be committed early.
+        # Best effort, since on SQLite the handler may be holding the write lock.
+        session = SessionLocal()
+        try:
+            session.query(Job).filter(Job.id == job_id).update(
+                {Job.progress: max(0.0, min(1.0, float(fraction))), Job.message: message,
+                 Job.heartbeat_at: datetime.utcnow()},
+                synchronize_session=False,
+            )
+            session.commit()
+        except Exception:
+            session.rollback()
+            logger.debug("Could not record progress of job %s", job_id, exc_info=True)
+        finally:
+            session.close()
+
+    return progress
+
+
+def run_job(db: Session, record: Job):
+    handler = HANDLERS.get(record.kind)
+    try:
+        if handler is None:
+            raise ValueError(f"No handler registered for '{record.kind}'")
+        result = handler(db, json.loads(record.payload or "{}"), _progress_reporter(record.id))
+        db.commit()
+        record = get_job(db, record.id)
+        record.status = JOB_SUCCEEDED
+        record.result = json.dumps(result, default=str)
+        record.progress = 1.0
+        record.error = None
+    except Exception:
+        db.rollback()
+        logger.exception("Job %s (%s) failed", record.id, record.kind)
+        record = get_job(db, record.id)
+        record.error = traceback.format_exc(limit=5)
+        if record.attempts < record.max_attempts and handler is not None:
+            record.status = JOB_QUEUED
+            record.run_after = datetime.utcnow() + timedelta(seconds=JOB_RETRY_DELAY * 2 ** (record.attempts - 1))
+        else:
+            record.status = JOB_FAILED
+    record.locked_by = None
+    record.finished_at = datetime.utcnow()
+    db.commit()
+    return record
+
+
+class JobWorkerPool:
+    """Threads that poll the jobs table; every API process can run one."""
+
+    def __init__(self, concurrency: int = JOB_WORKERS, poll_seconds: float = JOB_POLL_SECONDS):
+        self.concurrency = concurrency
+        self.poll_seconds = poll_seconds
+        self._stop = threading.Event()
+        self._threads = []
+        # ids of the jobs this process is running, stamped by the heartbeat thread
+        self._running = set()
+
+    def start(self):
+        # No database work here: start-up must not fail before the jobs table exists.
+        # Stale jobs are requeued by the polling threads (see _work).
+        if self._threads or self.concurrency <= 0:
+            return
+        self._stop.clear()
+        prefix = f"{socket.gethostname()}:{os.getpid()}"
+        for number in range(self.concurrency):
+            thread = threading.Thread(
+                target=self._work, args=(f"{prefix}:{number}",), name=f"job-worker-{number}", daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._beat, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float = 10):
+        self._stop.set()
+        for thread in self._threads:
+            thread.join(timeout)
+        self._threads = []
+
+    def _work(self, worker_id: str):
+        requeued_at = None
+        while not self._stop.is_set():
+            db = SessionLocal()
+            try:
+                if requeued_at is None or time.monotonic() - requeued_at >= JOB_HEARTBEAT_SECONDS:
+                    requeue_stale(db)
+                    requeued_at = time.monotonic()
+                record = claim_next(db, worker_id)
+                if record is not None:
+                    self._running.add(record.id)
+                    try:
+                        run_job(db, record)
+                    finally:
+                        self._running.discard(record.id)
+            except Exception:
+                logger.exception("Job worker %s crashed while polling", worker_id)
+                record = None
+            finally:
+                db.close()
+            if record is None:
+                self._stop.wait(self.poll_seconds)
+
+
+    def _beat(self):
+        while not self._stop.wait(JOB_HEARTBEAT_SECONDS):
+            db = SessionLocal()
+            try:
+                heartbeat(db, list(self._running))
+            except Exception:
+                # Best effort: on SQLite a running handler may hold the write lock
+                db.rollback()
+                logger.warning("Could not record job heartbeats", exc_info=True)
+            finally:
+                db.close()
+
+
+worker_pool = JobWorkerPool()
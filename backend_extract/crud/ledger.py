@@ -0,0 +1,369 @@
+import heapq
+import os
+import re
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import and_, case, exists, func, or_, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session, aliased
+
+from models.db_models import Purchase, Sales
+from models.ledger_model import Payment, PartyLedgerEntry, PartyBalance
+from crud import archive, fx
+
+# Customer balances are what the customer owes us (sales less receipts),
+# vendor balances what we owe the vendor (purchases less payments made).
+# Amounts are converted to fx.BASE_CURRENCY when they are posted; an amount
+# without a known rate is posted at 0 and flagged unconverted, and reposted
+# when the rate is added (see repost_currency).
+
+PARTY_TYPES = ("customer", "vendor")
+# Source table -> (party type, party column)
+SOURCES = {
+    "sales": ("customer", "customer"),
+    "purchase": ("vendor", "vendor"),
+}
+# A sale or purchase written with one of these pay modes was settled on the
+# spot, so it posts its payment next to the invoice
+SETTLED_PAY_MODES = {
+    mode.strip().lower()
+    for mode in os.getenv("LEDGER_SETTLED_PAY_MODES", "completed,paid,cash").split(",")
+    if mode.strip()
+}
+
+ZERO = Decimal("0")
+
+
+def _clean(value) -> str:
+    return (value or "").strip()
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value)).quantize(Decimal("0.01")) if value is not None else ZERO
+
+
+def term_days(term) -> int:
+    """Credit days in a free-text term such as "Net 30"; cash and blank terms are due at once."""
+    match = re.search(r"\d+", term or "")
+    return int(match.group()) if match else 0
+
+
+def _in_base(db: Session, amount, currency, on):
+    """(amount in the base currency, unconverted); without a known rate the amount is 0 and unconverted."""
+    converted = fx.convert(db, amount, currency, on)
+    return _money(converted), converted is None and amount is not None
+
+
+def _invoice_total(db: Session, row):
+    qty = row.pcs if row.pcs and row.pcs > 0 else 1
+    total = row.total if row.total is not None else _money(row.rate) * qty
+    return _in_base(db, total, row.currency, row.date)
+
+
+def _lines(db: Session, source: str, row):
+    """The ledger entries one sale, purchase or payment posts, as column dicts."""
+    common = dict(date=row.date, source=source, source_id=row.id)
+    if source == "payments":
+        amount, unconverted = _in_base(db, row.amount, row.currency, row.date)
+        return [dict(common, party_type=row.party_type, party=_clean(row.party), kind="payment",
+                     reference=row.reference, amount=-amount, unconverted=unconverted)]
+
+    party_type, column = SOURCES[source]
+    party = _clean(getattr(row, column))
+    amount, unconverted = _invoice_total(db, row)
+    if not party or not (amount or unconverted):
+        return []
+    common.update(party_type=party_type, party=party, reference=row.lab_no or row.iteam, unconverted=unconverted)
+    lines = [dict(common, kind="invoice", amount=amount, due_date=row.date + timedelta(days=term_days(row.term)))]
+    if _clean(row.pay_mode).lower() in SETTLED_PAY_MODES:
+        lines.append(dict(common, kind="payment", amount=-amount))
+    return lines
+
+
+def _party_filter(party_type: str, party: str):
+    return and_(PartyLedgerEntry.party_type == party_type, PartyLedgerEntry.party == party)
+
+
+def _insert_if_missing(dialect: str):
+    if dialect == "postgresql":
+        return postgresql.insert(PartyBalance).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(PartyBalance).on_conflict_do_nothing()
+    return PartyBalance.__table__.insert()
+
+
+def _totals(db: Session, party_type: str, party: str) -> PartyBalance:
+    """The party's balance row, locked: postings for one party are serialized on it."""
+    connection = db.connection()
+    # Two first postings for a party both succeed: the second insert is ignored and both lock the one row
+    connection.execute(
+        _insert_if_missing(connection.dialect.name).values(party_type=party_type, party=party, balance=ZERO,
+                                                           unconverted=0)
+    )
+    return (
+        db.query(PartyBalance)
+        .filter_by(party_type=party_type, party=party)
+        .with_for_update()
+        .populate_existing()
+        .one()
+    )
+
+
+def _post(db: Session, line: dict):
+    totals = _totals(db, line["party_type"], line["party"])
+    party = _party_filter(line["party_type"], line["party"])
+    previous = (
+        db.query(PartyLedgerEntry.balance)
+        .filter(party, PartyLedgerEntry.date <= line["date"])
+        .order_by(PartyLedgerEntry.date.desc(), PartyLedgerEntry.id.desc())
+        .limit(1)
+        .scalar()
+    )
+    # A back-dated entry moves the running balance of every later one
+    db.query(PartyLedgerEntry).filter(party, PartyLedgerEntry.date > line["date"]).update(
+        {PartyLedgerEntry.balance: PartyLedgerEntry.balance + line["amount"]}, synchronize_session=False
+    )
+    db.add(PartyLedgerEntry(**line, balance=_money(previous) + line["amount"]))
+    totals.balance = _money(totals.balance) + line["amount"]
+    totals.unconverted = (totals.unconverted or 0) + (1 if line["unconverted"] else 0)
+    totals.last_date = max(totals.last_date or line["date"], line["date"])
+    # Sessions do not autoflush; the next line of the same write reads this one back
+    db.flush()
+
+
+def _unpost(db: Session, entry: PartyLedgerEntry):
+    totals = _totals(db, entry.party_type, entry.party)
+    party = _party_filter(entry.party_type, entry.party)
+    later = or_(
+        PartyLedgerEntry.date > entry.date,
+        and_(PartyLedgerEntry.date == entry.date, PartyLedgerEntry.id > entry.id),
+    )
+    db.query(PartyLedgerEntry).filter(party, later).update(
+        {PartyLedgerEntry.balance: PartyLedgerEntry.balance - entry.amount}, synchronize_session=False
+    )
+    totals.balance = _money(totals.balance) - _money(entry.amount)
+    totals.unconverted = (totals.unconverted or 0) - (1 if entry.unconverted else 0)
+    db.delete(entry)
+    db.flush()
+    totals.last_date = db.query(func.max(PartyLedgerEntry.date)).filter(party).scalar()
+
+
+def post(db: Session, source: str, row):
+    """Post a newly written sale, purchase or payment, in the caller's transaction."""
+    for line in _lines(db, source, row):
+        _post(db, line)
+
+
+def unpost(db: Session, source: str, source_id: int):
+    """Take back everything a sale, purchase or payment posted (before it is changed or deleted)."""
+    entries = (
+        db.query(PartyLedgerEntry)
+        .filter(PartyLedgerEntry.source == source, PartyLedgerEntry.source_id == source_id)
+        .order_by(PartyLedgerEntry.id.desc())
+        .all()
+    )
+    for entry in entries:
+        _unpost(db, entry)
+    db.flush()
+
+
+def repost(db: Session, source: str, row):
+    unpost(db, source, row.id)
+    post(db, source, row)
+
+
+def repost_currency(db: Session, currency: str, start, end=None):
+    """Repost the sales, purchases and payments a new or removed rate (see fx.affected_range) converts."""
+    count = 0
+    for source, model in (("sales", Sales), ("purchase", Purchase), ("payments", Payment)):
+        for row in fx.rows_in_range(db, model, currency, start, end).all():
+            repost(db, source, row)
+            count += 1
+    return count
+
+
+def record_payment(db: Session, data) -> Payment:
+    payment = Payment(**data.dict())
+    payment.party = _clean(payment.party)
+    db.add(payment)
+    db.flush()
+    post(db, "payments", payment)
+    return payment
+
+
+def delete_payment(db: Session, payment_id: int):
+    payment = db.get(Payment, payment_id)
+    if payment:
+        unpost(db, "payments", payment.id)
+        db.delete(payment)
+        db.commit()
+    return payment
+
+
+def get_payments(db: Session, party_type: str = None, party: str = None, date_from: date = None,
+                 date_to: date = None):
+    query = db.query(Payment)
+    if party_type:
+        query = query.filter(Payment.party_type == party_type)
+    if party:
+        query = query.filter(Payment.party == _clean(party))
+    if date_from:
+        query = query.filter(Payment.date >= date_from)
+    if date_to:
+        query = query.filter(Payment.date <= date_to)
+    return query.order_by(Payment.date, Payment.id).all()
+
+
+def get_balance(db: Session, party_type: str, party: str):
+    return db.query(PartyBalance).filter_by(party_type=party_type, party=_clean(party)).first()
+
+
+def get_balances(db: Session, party_type: str, include_settled: bool = False):
+    query = db.query(PartyBalance).filter(PartyBalance.party_type == party_type)
+    if not include_settled:
+        query = query.filter(PartyBalance.balance != 0)
+    return query.order_by(PartyBalance.balance.desc(), PartyBalance.party).all()
+
+
+def balance_on(db: Session, party_type: str, party: str, day: date, inclusive: bool = True) -> Decimal:
+    """Running balance at the end of `day` (or just before it), read off the latest entry."""
+    cutoff = PartyLedgerEntry.date <= day if inclusive else PartyLedgerEntry.date < day
+    balance = (
+        db.query(PartyLedgerEntry.balance)
+        .filter(_party_filter(party_type, _clean(party)), cutoff)
+        .order_by(PartyLedgerEntry.date.desc(), PartyLedgerEntry.id.desc())
+        .limit(1)
+        .scalar()
+    )
+    return _money(balance)
+
+
+def statement(db: Session, party_type: str, party: str, date_from: date = None, date_to: date = None):
+    party = _clean(party)
+    opening = balance_on(db, party_type, party, date_from, inclusive=False) if date_from else ZERO
+    query = db.query(PartyLedgerEntry).filter(_party_filter(party_type, party))
+    if date_from:
+        query = query.filter(PartyLedgerEntry.date >= date_from)
+    if date_to:
+        query = query.filter(PartyLedgerEntry.date <= date_to)
+    entries = query.order_by(PartyLedgerEntry.date, PartyLedgerEntry.id).all()
+    return {
+        "party_type": party_type,
+        "party": party,
+        "currency": fx.BASE_CURRENCY,
+        "opening_balance": float(opening),
+        "closing_balance": float(entries[-1].balance if entries else opening),
+        "entries": entries,
+    }
+
+
+def ageing(db: Session, party_type: str, as_of: date = None, party: str = None):
+    """
+    Outstanding balance per party split by days past due, where due is the
+    entry date plus its term, in one grouped query.
+
+    Payments are taken to settle the oldest invoices, so what a party still
+    owes is its most recent invoices: newest first, each invoice counts in
+    full until their running total reaches the balance. More owed than
+    invoiced (e.g. refunds) has no due date and counts as oldest.
+    """
+    as_of = as_of or date.today()
+    entries = [PartyLedgerEntry.party_type == party_type, PartyLedgerEntry.date <= as_of]
+    if party is not None:
+        entries.append(PartyLedgerEntry.party == _clean(party))
+    newest_first = (PartyLedgerEntry.date.desc(), PartyLedgerEntry.id.desc())
+
+    # Each party's balance at the end of `as_of` is that of its latest entry
+    latest = (
+        select(PartyLedgerEntry.party, PartyLedgerEntry.balance,
+               func.row_number().over(partition_by=PartyLedgerEntry.party, order_by=newest_first).label("rank"))
+        .where(*entries)
+        .subquery()
+    )
+    owed = select(latest.c.party, latest.c.balance.label("outstanding")).where(
+        latest.c.rank == 1, latest.c.balance > 0
+    ).subquery()
+
+    # Invoices settled on the spot are paid by their own payment line
+    settlement = aliased(PartyLedgerEntry)
+    settled = exists().where(
+        settlement.source == PartyLedgerEntry.source,
+        settlement.source_id == PartyLedgerEntry.source_id,
+        settlement.kind == "payment",
+    )
+    invoices = (
+        select(PartyLedgerEntry.party, PartyLedgerEntry.amount, PartyLedgerEntry.due_date,
+               func.sum(PartyLedgerEntry.amount).over(partition_by=PartyLedgerEntry.party, order_by=newest_first)
+               .label("running"))
+        .where(*entries, PartyLedgerEntry.kind == "invoice", ~settled,
+               PartyLedgerEntry.party.in_(select(owed.c.party)))
+        .subquery()
+    )
+
+    # What is left of the balance once the newer invoices are covered, and this invoice's share of it
+    left = owed.c.outstanding - (invoices.c.running - invoices.c.amount)
+    share = case((left <= 0, 0), (left >= invoices.c.amount, invoices.c.amount), else_=left)
+    due = invoices.c.due_date
+    days_ago = lambda days: as_of - timedelta(days=days)
+    buckets = {
+        "not_due": or_(due.is_(None), due >= as_of),
+        "days_1_30": and_(due < as_of, due >= days_ago(30)),
+        "days_31_60": and_(due < days_ago(30), due >= days_ago(60)),
+        "days_61_90": and_(due < days_ago(60), due >= days_ago(90)),
+        "days_over_90": due < days_ago(90),
+    }
+    columns = [func.sum(case((condition, share), else_=0)).label(name) for name, condition in buckets.items()]
+    invoiced = func.coalesce(func.sum(invoices.c.amount), 0)
+    query = (
+        select(owed.c.party, owed.c.outstanding, case((owed.c.outstanding > invoiced, owed.c.outstanding - invoiced),
+                                                      else_=0).label("uninvoiced"), *columns)
+        .select_from(owed.outerjoin(invoices, invoices.c.party == owed.c.party))
+        .group_by(owed.c.party, owed.c.outstanding)
+        .order_by(owed.c.party)
+    )
+
+    rows = []
+    for row in db.execute(query).mappings():
+        row_buckets = {name: _money(row[name]) for name in buckets}
+        row_buckets["days_over_90"] += _money(row["uninvoiced"])
+        rows.append({"party": row["party"], **{name: float(value) for name, value in row_buckets.items()},
+                     "total": float(_money(row["outstanding"]))})
+    return rows
+
+
+def rebuild_all(db: Session, batch_size: int = 1000):
+    """Rebuild the ledger and balances from every sale, purchase and payment (backfills)."""
+    db.query(PartyLedgerEntry).delete(synchronize_session=False)
+    db.query(PartyBalance).delete(synchronize_session=False)
+    db.flush()
+
+    def stream(source, model):
+        ordered = lambda session: session.query(model).order_by(model.date, model.id).yield_per(batch_size)
+        rows = archive.history(db, model, ordered) if model is not Payment else ordered(db)
+        return ((source, row) for row in rows)
+
+    # Entries are added in date order, so id order matches running-balance order
+    merged = heapq.merge(
+        stream("sales", Sales), stream("purchase", Purchase), stream("payments", Payment),
+        key=lambda item: item[1].date,
+    )
+    balances, last_dates, unconverted = {}, {}, {}
+    count = 0
+    for source, row in merged:
+        for line in _lines(db, source, row):
+            key = (line["party_type"], line["party"])
+            balances[key] = balances.get(key, ZERO) + line["amount"]
+            last_dates[key] = line["date"]
+            unconverted[key] = unconverted.get(key, 0) + (1 if line["unconverted"] else 0)
+            db.add(PartyLedgerEntry(**line, balance=balances[key]))
+            count += 1
+            if count % batch_size == 0:
+                db.flush()
+    db.add_all(
+        PartyBalance(party_type=party_type, party=party, balance=balance, last_date=last_dates[(party_type, party)],
+                     unconverted=unconverted[(party_type, party)])
+        for (party_type, party), balance in balances.items()
+    )
+    db.commit()
+    return count
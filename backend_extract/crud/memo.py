@@ -0,0 +1,169 @@
+from datetime import date, timedelta
+from decimal import Decimal
+
+from sqlalchemy import and_, case, func
+from sqlalchemy.orm import Session
+
+from models.memo_event_model import MemoEvent
+
+MEMO_OPEN = "open"
+MEMO_PARTIAL_RETURN = "partial_return"
+MEMO_CONVERTED = "converted"
+MEMO_CLOSED = "closed"
+
+# Goods are still out on memo while a memo is in one of these states
+OUTSTANDING_STATUSES = (MEMO_OPEN, MEMO_PARTIAL_RETURN)
+
+EVENT_RETURN = "return"
+EVENT_CONVERT = "convert"
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value)) if value is not None else Decimal("0")
+
+
+def refresh_status(memo):
+    """Derive outstanding amount and lifecycle state from the settled totals."""
+    amount = _money(memo.amount)
+    returned = _money(memo.returned_amount)
+    converted = _money(memo.converted_amount)
+    outstanding = max(amount - returned - converted, Decimal("0"))
+
+    memo.outstanding_amount = outstanding
+    if returned == 0 and converted == 0:
+        memo.status = MEMO_OPEN
+    elif outstanding > 0:
+        memo.status = MEMO_PARTIAL_RETURN
+    elif converted > 0:
+        memo.status = MEMO_CONVERTED
+    else:
+        memo.status = MEMO_CLOSED
+    return memo
+
+
+def init_memo(memo):
+    memo.returned_amount = Decimal("0")
+    memo.converted_amount = Decimal("0")
+    return refresh_status(memo)
+
+
+def add_event(db: Session, memo_type: str, memo, event_type: str, data):
+    """Record a return or a conversion to sale against a memo and move its state forward."""
+    amount = _money(data.amount)
+    if amount <= 0:
+        raise ValueError("Amount must be positive")
+    if memo.status not in OUTSTANDING_STATUSES:
+        raise ValueError(f"Memo is already {memo.status}")
+    if amount > _money(memo.outstanding_amount):
+        raise ValueError("Amount exceeds the outstanding memo value")
+
+    event = MemoEvent(
+        memo_type=memo_type,
+        memo_id=memo.id,
+        event_type=event_type,
+        date=data.date,
+        amount=amount,
+        sale_id=data.sale_id,
+        remark=data.remark,
+    )
+    db.add(event)
+    if event_type == EVENT_RETURN:
+        memo.returned_amount = _money(memo.returned_amount) + amount
+    else:
+        memo.converted_amount = _money(memo.converted_amount) + amount
+    refresh_status(memo)
+    db.commit()
+    db.refresh(event)
+    return event
+
+
+def get_events(db: Session, memo_type: str, memo_id: int):
+    return (
+        db.query(MemoEvent)
+        .filter(MemoEvent.memo_type == memo_type, MemoEvent.memo_id == memo_id)
+        .order_by(MemoEvent.date, MemoEvent.id)
+        .all()
+    )
+
+
+def delete_events(db: Session, memo_type: str, memo_id: int):
+    db.query(MemoEvent).filter(
+        MemoEvent.memo_type == memo_type, MemoEvent.memo_id == memo_id
+    ).delete(synchronize_session=False)
+
+
+def get_open_memos(db: Session, model, client_name: str = None):
+    query = db.query(model).filter(model.status.in_(OUTSTANDING_STATUSES))
+    if client_name:
+        query = query.filter(model.client_name == client_name)
+    return query.order_by(model.date).all()
+
+
+def outstanding_by_client(db: Session, model):
+    rows = (
+        db.query(model.client_name, func.count(model.id), func.sum(model.outstanding_amount))
+        .filter(model.status.in_(OUTSTANDING_STATUSES))
+        .group_by(model.client_name)
+        .all()
+    )
+    return [
+        {"client_name": client, "memos": count, "outstanding_amount": float(_money(total))}
+        for client, count, total in rows
+    ]
+
+
+def ageing_by_client(db: Session, model, as_of: date = None):
+    """Outstanding value per client split into 0-30/31-60/61-90/90+ day buckets in one grouped query."""
+    as_of = as_of or date.today()
+
+    def bucket(older_than=None, up_to=None):
+        conditions = []
+        if older_than is not None:
+            conditions.append(model.date < as_of - timedelta(days=older_than))
+        if up_to is not None:
+            conditions.append(model.date >= as_of - timedelta(days=up_to))
+        return func.sum(case((and_(*conditions), model.outstanding_amount), else_=0))
+
+    rows = (
+        db.query(
+            model.client_name,
+            bucket(up_to=30),
+            bucket(older_than=30, up_to=60),
+            bucket(older_than=60, up_to=90),
+            bucket(older_than=90),
+            func.sum(model.outstanding_amount),
+        )
+        .filter(model.status.in_(OUTSTANDING_STATUSES))
+        .group_by(model.client_name)
+        .all()
+    )
+    return [
+        {
+            "client_name": client,
+            "days_0_30": float(_money(b1)),
+            "days_31_60": float(_money(b2)),
+            "days_61_90": float(_money(b3)),
+            "days_over_90": float(_money(b4)),
+            "total": float(_money(total)),
+        }
+        for client, b1, b2, b3, b4, total in rows
+    ]
+
+
+def backfill_status(db: Session, model):
+    """Mark memos written before lifecycle tracking as open for their full amount."""
+    updated = (
+        db.query(model)
+        .filter(model.status.is_(None))
+        .update(
+            {
+                model.status: MEMO_OPEN,
+                model.returned_amount: 0,
+                model.converted_amount: 0,
+                model.outstanding_amount: func.coalesce(model.amount, 0),
+            },
+            synchronize_session=False,
+        )
+    )
+    db.commit()
+    return updated
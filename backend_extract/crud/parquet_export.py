@@ -0,0 +1,198 @@
+import json
+import os
+import shutil
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from sqlalchemy import Date, Integer, Numeric, inspect
+from sqlalchemy.orm import Session
+
+from models.db_models import (
+    Sales, Purchase, Expense, LooseStock, CertifiedStock, StockTransfer, JewelleryStock, MemoGive, MemoTake,
+)
+
+# pyarrow is imported by export_all() on first use; serving the files does not need it
+pa = pq = None
+
+EXPORT_TABLES = {
+    model.__tablename__: model
+    for model in (Sales, Purchase, Expense, LooseStock, CertifiedStock, StockTransfer, JewelleryStock,
+                  MemoGive, MemoTake)
+}
+
+EXPORT_DIR = os.getenv("PARQUET_EXPORT_DIR", "./exports/parquet")
+
+# Months touched within this many days are rewritten on every run so that
+# edits and deletes of recent rows reach the snapshot; older months only
+# receive rows with a new id (back-dated entries). Use full=True after
+# bulk corrections to history.
+REOPEN_DAYS = int(os.getenv("PARQUET_REOPEN_DAYS", "35"))
+
+MANIFEST = "manifest.json"
+
+
+def _arrow_type(column):
+    if isinstance(column.type, Integer):
+        return pa.int64()
+    if isinstance(column.type, Date):
+        return pa.date32()
+    if isinstance(column.type, Numeric):
+        # Analysts load these into pandas/Excel, which work in floats anyway
+        return pa.float64()
+    return pa.string()
+
+
+def _schema(model):
+    # Mapped attributes rather than table columns, so dictionary-encoded strings are written as text
+    return pa.schema([(attr.key, _arrow_type(attr.expression)) for attr in inspect(model).column_attrs])
+
+
+def _value(value):
+    return float(value) if isinstance(value, Decimal) else value
+
+
+def _month(value: date) -> str:
+    return value.strftime("%Y-%m")
+
+
+def load_manifest(export_dir: str = EXPORT_DIR):
+    path = os.path.join(export_dir, MANIFEST)
+    if not os.path.exists(path):
+        return {"tables": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def _save_manifest(export_dir: str, manifest):
+    path = os.path.join(export_dir, MANIFEST)
+    with open(path + ".tmp", "w") as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    os.replace(path + ".tmp", path)
+
+
+def _write_partitions(table_dir: str, model, rows, file_name: str, batch_size: int):
+    """
+    Stream rows ordered by date into one zstd-compressed file per month
+    partition (month=YYYY-MM/<file_name>). Returns {month: row count}.
+    """
+    schema = _schema(model)
+    names = schema.names
+    written = {}
+    state = {"month": None, "writer": None, "path": None, "buffer": []}
+
+    def flush():
+        if state["buffer"]:
+            columns = {name: [_value(getattr(row, name)) for row in state["buffer"]] for name in names}
+            state["writer"].write_table(pa.Table.from_pydict(columns, schema=schema))
+            state["buffer"] = []
+
+    def close():
+        if state["writer"] is not None:
+            flush()
+            state["writer"].close()
+            os.replace(state["path"] + ".tmp", state["path"])
+            state["writer"] = None
+
+    try:
+        for row in rows:
+            month = _month(row.date)
+            if month != state["month"]:
+                close()
+                partition_dir = os.path.join(table_dir, f"month={month}")
+                os.makedirs(partition_dir, exist_ok=True)
+                state.update(month=month, path=os.path.join(partition_dir, file_name))
+                state["writer"] = pq.ParquetWriter(state["path"] + ".tmp", schema, compression="zstd")
+            state["buffer"].append(row)
+            written[month] = written.get(month, 0) + 1
+            if len(state["buffer"]) >= batch_size:
+                flush()
+        close()
+    finally:
+        if state["writer"] is not None:
+            state["writer"].close()
+            os.remove(state["path"] + ".tmp")
+    return written
+
+
+def export_table(db: Session, name: str, manifest, export_dir: str = EXPORT_DIR, full: bool = False,
+                 today: date = None, batch_size: int = 5000):
+    """Bring one table's snapshot up to date; returns the number of rows written."""
+    model = EXPORT_TABLES[name]
+    table_dir = os.path.join(export_dir, name)
+    state = manifest["tables"].get(name)
+    if full or state is None:
+        shutil.rmtree(table_dir, ignore_errors=True)
+        state = {"max_id": 0, "partitions": {}}
+    os.makedirs(table_dir, exist_ok=True)
+
+    file_name = f"part-{datetime.now().strftime('%Y%m%dT%H%M%S%f')}.parquet"
+    reopen_from = ((today or date.today()) - timedelta(days=REOPEN_DAYS)).replace(day=1)
+    max_id = db.query(model.id).order_by(model.id.desc()).limit(1).scalar() or 0
+    ordered = (model.date, model.id)
+
+    # Closed months: append rows that are new since the last run
+    appended = _write_partitions(
+        table_dir, model,
+        db.query(model).filter(model.id > state["max_id"], model.date < reopen_from)
+        .order_by(*ordered).yield_per(batch_size),
+        file_name, batch_size,
+    )
+    for month, count in appended.items():
+        partition = state["partitions"].setdefault(month, {"files": [], "rows": 0})
+        partition["files"].append(file_name)
+        partition["rows"] += count
+
+    # Open months: rewrite entirely, replacing whatever the previous runs wrote
+    rewritten = _write_partitions(
+        table_dir, model,
+        db.query(model).filter(model.date >= reopen_from).order_by(*ordered).yield_per(batch_size),
+        file_name, batch_size,
+    )
+    open_months = [month for month in state["partitions"] if month >= _month(reopen_from)]
+    for month in set(open_months) | set(rewritten):
+        partition_dir = os.path.join(table_dir, f"month={month}")
+        for old in state["partitions"].get(month, {}).get("files", []):
+            if old != file_name and os.path.exists(os.path.join(partition_dir, old)):
+                os.remove(os.path.join(partition_dir, old))
+        if month in rewritten:
+            state["partitions"][month] = {"files": [file_name], "rows": rewritten[month]}
+        else:
+            state["partitions"].pop(month, None)
+            shutil.rmtree(partition_dir, ignore_errors=True)
+
+    state["max_id"] = max_id
+    state["exported_at"] = datetime.now().isoformat(timespec="seconds")
+    manifest["tables"][name] = state
+    return sum(appended.values()) + sum(rewritten.values())
+
+
+def _import_pyarrow():
+    global pa, pq
+    if pa is None:
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow)")
+        pa, pq = pyarrow, pyarrow.parquet
+
+
+def export_all(db: Session, tables=None, export_dir: str = EXPORT_DIR, full: bool = False):
+    """Export the ledger tables to partitioned Parquet and record the result in manifest.json."""
+    _import_pyarrow()
+    os.makedirs(export_dir, exist_ok=True)
+    manifest = load_manifest(export_dir)
+    counts = {}
+    for name in tables or EXPORT_TABLES:
+        counts[name] = export_table(db, name, manifest, export_dir, full)
+        # Saved after every table so an interrupted run keeps what it finished
+        _save_manifest(export_dir, manifest)
+    return counts
+
+
+def snapshot_file(table: str, month: str, file_name: str, export_dir: str = EXPORT_DIR):
+    """Path of an exported file, or None unless the manifest lists it."""
+    partition = load_manifest(export_dir)["tables"].get(table, {}).get("partitions", {}).get(month)
+    if not partition or file_name not in partition["files"]:
+        return None
+    return os.path.join(export_dir, table, f"month={month}", file_name)
@@ -0,0 +1,96 @@
+from datetime import date
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from crud.archive import ARCHIVED_TABLES, fiscal_year_bounds, fiscal_year_of
+
+# Native declarative partitioning is Postgres only; on SQLite the archive
+# database (crud/archive.py) is what keeps the live tables small.
+
+
+def _partition_name(table: str, year: int) -> str:
+    return f"{table}_fy{year}"
+
+
+def is_partitioned(connection, table: str) -> bool:
+    if connection.dialect.name != "postgresql":
+        return False
+    return connection.execute(text(
+        "SELECT 1 FROM pg_partitioned_table p JOIN pg_class c ON c.oid = p.partrelid WHERE c.relname = :table"
+    ), {"table": table}).first() is not None
+
+
+def _create_partition(connection, table: str, year: int):
+    start, next_start = fiscal_year_bounds(year)[0], fiscal_year_bounds(year + 1)[0]
+    connection.execute(text(
+        f"CREATE TABLE IF NOT EXISTS {_partition_name(table, year)} PARTITION OF {table} "
+        f"FOR VALUES FROM ('{start.isoformat()}') TO ('{next_start.isoformat()}')"
+    ))
+
+
+def partition_table(engine, table: str):
+    """
+    Convert a Postgres ledger table into one partitioned by fiscal year on `date`.
+
+    The table is rebuilt in one transaction: rows are copied into a
+    partitioned table of the same shape (one partition per fiscal year
+    present, plus a default partition), the id sequence is handed over and
+    the old table dropped. Postgres requires the partition column in the
+    primary key, so it becomes (id, date).
+    """
+    with engine.begin() as connection:
+        if connection.dialect.name != "postgresql" or is_partitioned(connection, table):
+            return False
+        old = f"{table}_unpartitioned"
+        connection.execute(text(f"ALTER TABLE {table} RENAME TO {old}"))
+        connection.execute(text(f"ALTER INDEX IF EXISTS ix_{table}_id RENAME TO ix_{old}_id"))
+        connection.execute(text(
+            f"CREATE TABLE {table} (LIKE {old} INCLUDING DEFAULTS INCLUDING GENERATED) PARTITION BY RANGE (date)"
+        ))
+        connection.execute(text(f"ALTER TABLE {table} ADD PRIMARY KEY (id, date)"))
+        connection.execute(text(f"CREATE INDEX ix_{table}_id ON {table} (id)"))
+
+        first, last = connection.execute(text(f"SELECT min(date), max(date) FROM {old}")).one()
+        this_year = fiscal_year_of(date.today())
+        first_year = fiscal_year_of(first) if first else this_year
+        last_year = max(fiscal_year_of(last) if last else this_year, this_year) + 1
+        for year in range(first_year, last_year + 1):
+            _create_partition(connection, table, year)
+        connection.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"))
+
+        connection.execute(text(f"INSERT INTO {table} SELECT * FROM {old}"))
+        connection.execute(text(f"ALTER SEQUENCE IF EXISTS {table}_id_seq OWNED BY {table}.id"))
+        connection.execute(text(f"DROP TABLE {old}"))
+    return True
+
+
+def ensure_partitions(engine, years_ahead: int = 1):
+    """Create the coming fiscal years' partitions before rows for them arrive in the default partition."""
+    with engine.begin() as connection:
+        for table in ARCHIVED_TABLES:
+            if is_partitioned(connection, table):
+                this_year = fiscal_year_of(date.today())
+                for year in range(this_year, this_year + years_ahead + 1):
+                    _create_partition(connection, table, year)
+
+
+def drop_archived_partitions(db: Session, model, year: int):
+    """
+    Drop the partitions of an archived range outright instead of deleting
+    their rows one by one. No-op on unpartitioned tables.
+    """
+    connection = db.connection()
+    table = model.__tablename__
+    if not is_partitioned(connection, table):
+        return
+    rows = connection.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :table"
+    ), {"table": table})
+    for (name,) in rows.all():
+        prefix = f"{table}_fy"
+        if name.startswith(prefix) and name[len(prefix):].isdigit() and int(name[len(prefix):]) <= year:
+            connection.execute(text(f"ALTER TABLE {table} DETACH PARTITION {name}"))
+            connection.execute(text(f"DROP TABLE {name}"))
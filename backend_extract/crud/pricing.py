@@ -0,0 +1,267 @@
+import re
+import statistics
+from decimal import Decimal
+
+from sqlalchemy import event, select, tuple_, update
+from sqlalchemy.orm import Session
+
+from models.db_models import Sales, Purchase, CertifiedStock
+from models.fx_rate_model import FxRate
+from models.pricing_model import PricePoint, PriceCell
+from crud import archive, fx
+
+# Every sale, purchase and certified stone with a rate is one price point in
+# a (side, shape, size band, colour, clarity, month) cell; the matrix keeps
+# min/median/max rate per cell, in fx.BASE_CURRENCY. Rows whose currency has
+# no known rate yet are left out until the rate is added (see reprice_currency).
+
+# source -> (model, side, colour column, clarity column)
+SOURCES = {
+    "purchase": (Purchase, "buy", "col", "clr"),
+    "certified_stock": (CertifiedStock, "buy", "color", "clarity"),
+    "sales": (Sales, "sell", "col", "clr"),
+}
+SIDES = ("buy", "sell")
+CELL = ("side", "shape", "size_band", "color", "clarity", "period")
+
+# Lower carat bound of each size band; a stone belongs to the last bound not above its weight
+SIZE_BANDS = (0.0, 0.23, 0.30, 0.40, 0.50, 0.70, 0.90, 1.00, 1.50, 2.00, 3.00, 4.00, 5.00, 10.00)
+
+_CARATS = re.compile(r"(\d+(?:\.\d+)?)\s*(?:CTS?|CARATS?)?")
+
+_points = PricePoint.__table__
+_cells = PriceCell.__table__
+
+
+def _norm(value) -> str:
+    return (value or "").strip().upper()
+
+
+def _money(value) -> Decimal:
+    return Decimal(str(value)).quantize(Decimal("0.01"))
+
+
+def size_band(size) -> str:
+    """"0.34" -> "0.30-0.39"; sizes that are not a carat weight ("MEDIUM") are their own band."""
+    text = _norm(size)
+    match = _CARATS.fullmatch(text)
+    if not match:
+        return text
+    carats = float(match.group(1))
+    for index, lower in enumerate(SIZE_BANDS):
+        upper = SIZE_BANDS[index + 1] if index + 1 < len(SIZE_BANDS) else None
+        if upper is None:
+            return f"{lower:.2f}+"
+        if carats < upper:
+            return f"{lower:.2f}-{upper - 0.01:.2f}"
+
+
+def cell_key(shape, size, color, clarity) -> dict:
+    return {"shape": _norm(shape), "size_band": size_band(size), "color": _norm(color), "clarity": _norm(clarity)}
+
+
+def _to_base(connection, amount, currency, on):
+    # fx.convert needs a Session; the write hooks below only have the flush's connection.
+    # Like fx.convert, None when no rate is known.
+    code = fx.normalize(currency)
+    if not code or code == fx.BASE_CURRENCY:
+        return amount
+    rate = connection.execute(
+        select(FxRate.rate).where(FxRate.currency == code, FxRate.date <= on).order_by(FxRate.date.desc()).limit(1)
+    ).scalar()
+    return None if rate is None else Decimal(str(amount)) * Decimal(str(rate))
+
+
+def _point(connection, source: str, row):
+    _, side, color_col, clarity_col = SOURCES[source]
+    if row.rate is None or row.rate <= 0 or row.date is None:
+        return None
+    rate = _to_base(connection, row.rate, row.currency, row.date)
+    if rate is None:
+        return None
+    return {
+        "side": side,
+        **cell_key(row.shape, row.size, getattr(row, color_col), getattr(row, clarity_col)),
+        "period": row.date.strftime("%Y-%m"),
+        "rate": _money(rate),
+    }
+
+
+def _where(table, key: dict):
+    return [table.c[column] == key[column] for column in CELL]
+
+
+def _cell_values(rates):
+    rates = sorted(rates)
+    return {
+        "count": len(rates),
+        "min_rate": rates[0],
+        "median_rate": _money(statistics.median(rates)),
+        "max_rate": rates[-1],
+    }
+
+
+def refresh_cell(connection, key: dict):
+    """Recompute one matrix cell from its price points."""
+    rates = [_money(rate) for (rate,) in connection.execute(select(_points.c.rate).where(*_where(_points, key)))]
+    if not rates:
+        connection.execute(_cells.delete().where(*_where(_cells, key)))
+        return
+    values = _cell_values(rates)
+    if connection.execute(update(_cells).where(*_where(_cells, key)).values(**values)).rowcount == 0:
+        connection.execute(_cells.insert().values(**{column: key[column] for column in CELL}, **values))
+
+
+def write_point(connection, source: str, row):
+    """Bring the price point of one written row, and the cells it leaves and joins, up to date."""
+    old = connection.execute(
+        select(_points).where(_points.c.source == source, _points.c.source_id == row.id)
+    ).mappings().first()
+    new = _point(connection, source, row)
+    if old is not None and new is not None and all(old[column] == new[column] for column in new):
+        return
+    if old is not None:
+        connection.execute(_points.delete().where(_points.c.id == old["id"]))
+    if new is not None:
+        connection.execute(_points.insert().values(source=source, source_id=row.id, **new))
+    keys = {tuple(point[column] for column in CELL) for point in (old, new) if point is not None}
+    for key in keys:
+        refresh_cell(connection, dict(zip(CELL, key)))
+
+
+def remove_point(connection, source: str, source_id: int):
+    old = connection.execute(
+        select(_points).where(_points.c.source == source, _points.c.source_id == source_id)
+    ).mappings().first()
+    if old is not None:
+        connection.execute(_points.delete().where(_points.c.id == old["id"]))
+        refresh_cell(connection, {column: old[column] for column in CELL})
+
+
+def reprice_currency(db: Session, currency: str, start, end=None):
+    """Reprice the rows a new or removed rate (see fx.affected_range) converts."""
+    connection = db.connection()
+    count = 0
+    for source, (model, _, _, _) in SOURCES.items():
+        for row in fx.rows_in_range(db, model, currency, start, end).all():
+            write_point(connection, source, row)
+            count += 1
+    return count
+
+
+def _register(source: str, model):
+    # Mapper events run inside the flush, so the matrix commits or rolls back with the row
+    @event.listens_for(model, "after_insert")
+    @event.listens_for(model, "after_update")
+    def _after_write(mapper, connection, target):
+        write_point(connection, source, target)
+
+    @event.listens_for(model, "after_delete")
+    def _after_delete(mapper, connection, target):
+        remove_point(connection, source, target.id)
+
+
+for _source, (_model, _, _, _) in SOURCES.items():
+    _register(_source, _model)
+
+
+def _cell_out(cell: PriceCell):
+    return {
+        "period": cell.period,
+        "count": cell.count,
+        "min_rate": float(cell.min_rate),
+        "median_rate": float(cell.median_rate),
+        "max_rate": float(cell.max_rate),
+    }
+
+
+def _pick(cells, side: str, period: str = None):
+    """The cell for `period`, or the latest one, among the cells of one stone key."""
+    matching = [cell for cell in cells if cell.side == side and (period is None or cell.period == period)]
+    return _cell_out(max(matching, key=lambda cell: cell.period)) if matching else None
+
+
+def lookup(db: Session, shape, size, color, clarity, period: str = None):
+    """Prices for one stone: a probe of the unique cell index per side, latest month unless `period` is given."""
+    key = cell_key(shape, size, color, clarity)
+    result = dict(key)
+    for side in SIDES:
+        query = db.query(PriceCell).filter(PriceCell.side == side, *[
+            getattr(PriceCell, column) == value for column, value in key.items()
+        ])
+        if period:
+            query = query.filter(PriceCell.period == period)
+        cell = query.order_by(PriceCell.period.desc()).first()
+        result[side] = _cell_out(cell) if cell else None
+    return result
+
+
+def lookup_many(db: Session, stones, chunk_size: int = 500):
+    """Price many stones with one query per `chunk_size` distinct stone keys."""
+    keys = [cell_key(stone.shape, stone.size, stone.color, stone.clarity) for stone in stones]
+    columns = (PriceCell.shape, PriceCell.size_band, PriceCell.color, PriceCell.clarity)
+    distinct = list({tuple(key.values()) for key in keys})
+    cells = {}
+    for start in range(0, len(distinct), chunk_size):
+        for cell in db.query(PriceCell).filter(tuple_(*columns).in_(distinct[start:start + chunk_size])):
+            cells.setdefault((cell.shape, cell.size_band, cell.color, cell.clarity), []).append(cell)
+
+    results = []
+    for stone, key in zip(stones, keys):
+        found = cells.get(tuple(key.values()), [])
+        results.append({**key, **{side: _pick(found, side, stone.period) for side in SIDES}})
+    return results
+
+
+def get_matrix(db: Session, side: str, period: str, shape: str = None):
+    query = db.query(PriceCell).filter(PriceCell.side == side, PriceCell.period == period)
+    if shape:
+        query = query.filter(PriceCell.shape == _norm(shape))
+    return query.order_by(PriceCell.shape, PriceCell.size_band, PriceCell.color, PriceCell.clarity).all()
+
+
+def rebuild_all(db: Session, batch_size: int = 1000):
+    """Rebuild every price point and cell from the sales, purchase and certified stock ledgers (backfills)."""
+    connection = db.connection()
+    connection.execute(_cells.delete())
+    connection.execute(_points.delete())
+
+    count = 0
+    for source, (model, _, _, _) in SOURCES.items():
+        ordered = lambda session, model=model: session.query(model).order_by(model.id).yield_per(batch_size)
+        # Archived fiscal years still priced their stones
+        rows = archive.history(db, model, ordered) if model is not CertifiedStock else ordered(db)
+        batch = []
+        for row in rows:
+            point = _point(connection, source, row)
+            if point is None:
+                continue
+            batch.append({"source": source, "source_id": row.id, **point})
+            if len(batch) >= batch_size:
+                connection.execute(_points.insert(), batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            connection.execute(_points.insert(), batch)
+            count += len(batch)
+
+    # One ordered pass over the points groups them into cells
+    ordered_points = connection.execute(
+        select(*[_points.c[column] for column in CELL], _points.c.rate)
+        .order_by(*[_points.c[column] for column in CELL])
+        .execution_options(yield_per=batch_size)
+    )
+    cells, current, rates = [], None, []
+    for row in ordered_points:
+        key = tuple(row[:len(CELL)])
+        if key != current and rates:
+            cells.append({**dict(zip(CELL, current)), **_cell_values(rates)})
+            rates = []
+        current = key
+        rates.append(_money(row.rate))
+    if rates:
+        cells.append({**dict(zip(CELL, current)), **_cell_values(rates)})
+    for start in range(0, len(cells), batch_size):
+        connection.execute(_cells.insert(), cells[start:start + batch_size])
+    db.commit()
+    return count
@@ -0,0 +1,136 @@
+from collections import defaultdict
+from decimal import Decimal
+
+from sqlalchemy import case, func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from models.db_models import LooseStock, StockTransfer, Sales
+from models.stock_balance_model import BranchStockBalance
+from crud import archive
+from crud.dimensions import id_column
+
+# Balances are counted in pieces: loose stock entries and transfers bring in
+# or move their `pcs`, a sale takes its `pcs` out of the selling branch (one
+# piece when blank, as in costing). `total` is a money value and never counted.
+
+
+def _clean(value) -> str:
+    return (value or "").strip()
+
+
+def _amount(value) -> Decimal:
+    # Balances are Numeric(14, 2); float sums from SQLite are rounded back to that
+    return Decimal(str(value)).quantize(Decimal("0.01")) if value is not None else Decimal("0")
+
+
+def _pcs(row) -> Decimal:
+    return Decimal(row.pcs if row.pcs and row.pcs > 0 else 1)
+
+
+# Same rule in SQL, for the grouped recomputation
+_PCS = lambda model: case((model.pcs > 0, model.pcs), else_=1)
+
+
+def _insert_if_missing(dialect: str):
+    if dialect == "postgresql":
+        return postgresql.insert(BranchStockBalance).on_conflict_do_nothing()
+    if dialect == "sqlite":
+        return sqlite.insert(BranchStockBalance).on_conflict_do_nothing()
+    return BranchStockBalance.__table__.insert()
+
+
+def apply(db: Session, branch, iteam, shape, size, delta: Decimal):
+    """Add `delta` to one (branch, iteam, shape, size) balance row, creating it if needed."""
+    branch = _clean(branch)
+    if not branch or not delta:
+        return
+    key = dict(branch=branch, iteam=_clean(iteam), shape=_clean(shape), size=_clean(size))
+    connection = db.connection()
+    # Two writers creating the same row both succeed: the second insert is ignored
+    connection.execute(_insert_if_missing(connection.dialect.name).values(**key, quantity=Decimal("0")))
+    # One atomic increment, so concurrent writes to a row never lose an update
+    db.query(BranchStockBalance).filter_by(**key).update(
+        {BranchStockBalance.quantity: BranchStockBalance.quantity + delta}, synchronize_session=False
+    )
+
+
+def apply_loose_stock(db: Session, record: LooseStock, sign: int = 1):
+    apply(db, record.branch, record.iteam, record.shape, record.size, sign * _pcs(record))
+
+
+def apply_transfer(db: Session, record: StockTransfer, sign: int = 1):
+    qty = sign * _pcs(record)
+    apply(db, record.from_branch, record.iteam, record.shape, record.size, -qty)
+    apply(db, record.to_branch, record.iteam, record.shape, record.size, qty)
+
+
+def apply_sale(db: Session, sale: Sales, sign: int = 1):
+    apply(db, sale.branch, sale.iteam, sale.shape, sale.size, -sign * _pcs(sale))
+
+
+def get_branch_balances(db: Session, branch: str):
+    return (
+        db.query(BranchStockBalance)
+        .filter(BranchStockBalance.branch == _clean(branch))
+        .order_by(BranchStockBalance.iteam, BranchStockBalance.shape, BranchStockBalance.size)
+        .all()
+    )
+
+
+def expected_balances(db: Session):
+    """Recompute every balance from the raw ledgers with one grouped query per ledger."""
+    expected = defaultdict(Decimal)
+
+    def add(rows, sign):
+        for branch, iteam, shape, size, qty in rows:
+            if _clean(branch):
+                key = (_clean(branch), _clean(iteam), _clean(shape), _clean(size))
+                expected[key] += sign * _amount(qty)
+
+    def grouped(branch_col, qty_col, model, session=db):
+        columns = (branch_col, model.iteam, model.shape, model.size)
+        # Grouped on the dimension ids; each group's text is looked up once
+        return session.query(*columns, func.sum(qty_col)).group_by(*map(id_column, columns)).all()
+
+    add(grouped(LooseStock.branch, _PCS(LooseStock), LooseStock), 1)
+    add(grouped(StockTransfer.to_branch, _PCS(StockTransfer), StockTransfer), 1)
+    add(grouped(StockTransfer.from_branch, _PCS(StockTransfer), StockTransfer), -1)
+    # Sales of archived fiscal years still took their stock out
+    add(archive.history(db, Sales, lambda session: grouped(Sales.branch, _PCS(Sales), Sales, session)), -1)
+    return expected
+
+
+def reconcile(db: Session, fix: bool = False):
+    """
+    Compare the materialized balances with the ledgers.
+
+    Returns the mismatching keys; with `fix=True` the balance table is
+    rewritten to the ledger values in the same transaction.
+    """
+    expected = expected_balances(db)
+    actual = {
+        (row.branch, row.iteam, row.shape, row.size): row
+        for row in db.query(BranchStockBalance).all()
+    }
+
+    mismatches = []
+    for key in set(expected) | set(actual):
+        want = expected.get(key, Decimal("0"))
+        row = actual.get(key)
+        have = _amount(row.quantity) if row is not None else Decimal("0")
+        if want == have:
+            continue
+        branch, iteam, shape, size = key
+        mismatches.append({
+            "branch": branch, "iteam": iteam, "shape": shape, "size": size,
+            "expected": float(want), "actual": float(have),
+        })
+        if fix:
+            if row is None:
+                db.add(BranchStockBalance(branch=branch, iteam=iteam, shape=shape, size=size, quantity=want))
+            else:
+                row.quantity = want
+    if fix:
+        db.commit()
+    return mismatches
@@ -0,0 +1,423 @@
+import bisect
+import logging
+import math
+import os
+import re
+import threading
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from fastapi import HTTPException
+from sqlalchemy import event, func, or_
+from sqlalchemy.orm import Session
+
+from config.db import SessionLocal
+from models.db_models import CertifiedStock
+from models.stone_index_model import StoneIndexChange
+
+logger = logging.getLogger(__name__)
+
+FACETS = ("shape", "size", "color", "clarity", "lab")
+RANGES = ("rate", "total")
+SORTS = ("id", "date", "rate", "total")
+
+# Writes through this process update the index in place. Every write also
+# logs the stone id in stone_index_changes (in the writer's transaction), and
+# a background thread of each process applies the changes logged by the
+# others every STONE_INDEX_POLL_SECONDS. Changes from the last
+# STONE_INDEX_GRACE_SECONDS are read again on every poll, so a transaction
+# that commits after a higher change id was seen is not missed.
+STONE_INDEX_POLL_SECONDS = float(os.getenv("STONE_INDEX_POLL_SECONDS", "2"))
+STONE_INDEX_GRACE_SECONDS = int(os.getenv("STONE_INDEX_GRACE_SECONDS", "30"))
+STONE_INDEX_CHANGE_RETENTION = int(os.getenv("STONE_INDEX_CHANGE_RETENTION", "86400"))
+# Searches before the warm-up has loaded the index are refused with this Retry-After
+STONE_INDEX_RETRY_AFTER = int(os.getenv("STONE_INDEX_RETRY_AFTER", "5"))
+
+_ROW_FIELDS = ("id",) + FACETS + RANGES + ("date",)
+# Everything load() rebuilds and swaps in
+_STATE = ("rows", "slot_of", "free_slots", "alive", "facets", "bins", "bin_slots", "sorted")
+_NO_VALUE_BIN = -10 ** 6
+BLANK_FACET = "(blank)"
+_NONZERO_BYTE = re.compile(rb"[^\x00]")
+
+
+def _facet_value(value) -> str:
+    return (value or "").strip().upper()
+
+
+def _number(value):
+    return float(value) if value is not None else None
+
+
+def _bin(value: float) -> int:
+    # 1/32-octave bins (~2% wide) keep the boundary bins of any range query small
+    return math.floor(math.log2(value) * 32) if value > 0 else _NO_VALUE_BIN
+
+
+def _sort_key(row, field):
+    value = row[_ROW_FIELDS.index(field)]
+    if value is None:
+        return float("-inf")
+    return value.toordinal() if field == "date" else value
+
+
+def _bitmap_from_slots(slots, size: int) -> int:
+    data = bytearray((size + 7) // 8)
+    for slot in slots:
+        data[slot >> 3] |= 1 << (slot & 7)
+    return int.from_bytes(data, "little")
+
+
+def _slots_of(bitmap: int):
+    data = bitmap.to_bytes((bitmap.bit_length() + 7) // 8, "little")
+    # The regex engine skips runs of zero bytes at C speed
+    for match in _NONZERO_BYTE.finditer(data):
+        offset, byte = match.start(), data[match.start()]
+        for bit in range(8):
+            if byte >> bit & 1:
+                yield offset * 8 + bit
+
+
+class StoneIndex:
+    """
+    In-memory bitmap index over certified stock.
+
+    Every facet value owns a bitmap (a Python int) with one bit per slot, so
+    multi-value filters are ORs, combined filters are ANDs and facet counts are
+    popcounts. Rate/total ranges use log-scale bin bitmaps with an exact check
+    only inside the two boundary bins. Pages come from per-field sorted
+    orders, so only the returned rows are loaded from the database.
+
+    The full load is built aside and swapped in under the lock, and runs once
+    per process, on the warm-up thread; searches until then get a 503 rather
+    than building it in the request. After that the index is kept current by
+    upsert()/remove() and the change log (see refresh()).
+    """
+
+    def __init__(self, poll_seconds: float = STONE_INDEX_POLL_SECONDS):
+        self.poll_seconds = poll_seconds
+        self._lock = threading.RLock()
+        self._load_lock = threading.RLock()
+        self._loaded_at = None
+        self._watermark = 0
+        self._pruned_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._reset()
+
+    def _reset(self):
+        self.rows = []  # slot -> row tuple (see _ROW_FIELDS), None when free
+        self.slot_of = {}
+        self.free_slots = []
+        self.alive = 0
+        self.facets = {name: defaultdict(int) for name in FACETS}
+        self.bins = {name: defaultdict(int) for name in RANGES}
+        self.bin_slots = {name: defaultdict(set) for name in RANGES}
+        self.sorted = {name: [] for name in SORTS}
+
+    # -- maintenance -------------------------------------------------------
+
+    def load(self, db: Session, batch_size: int = 5000):
+        """Build the index from the table without blocking searches, then swap it in."""
+        with self._load_lock:
+            # Changes logged from here on are applied after the swap
+            watermark = db.query(func.max(StoneIndexChange.id)).scalar() or 0
+            fresh = StoneIndex()
+            fresh._build(db, batch_size)
+            with self._lock:
+                for name in _STATE:
+                    setattr(self, name, getattr(fresh, name))
+                self._watermark = watermark
+                self._loaded_at = time.monotonic()
+            self.refresh(db)
+
+    def _build(self, db: Session, batch_size: int):
+        columns = [getattr(CertifiedStock, field) for field in _ROW_FIELDS]
+        # Collect slot lists first; OR-ing bits into growing ints row by row is quadratic
+        facet_slots = {name: defaultdict(list) for name in FACETS}
+        for raw in db.query(*columns).yield_per(batch_size):
+            row = self._row(*raw)
+            slot = len(self.rows)
+            self.rows.append(row)
+            self.slot_of[row[0]] = slot
+            for position, name in enumerate(FACETS, start=1):
+                facet_slots[name][row[position]].append(slot)
+            for position, name in enumerate(RANGES, start=1 + len(FACETS)):
+                if row[position] is not None:
+                    self.bin_slots[name][_bin(row[position])].add(slot)
+            for name in SORTS:
+                self.sorted[name].append((_sort_key(row, name), slot))
+
+        size = len(self.rows)
+        self.alive = (1 << size) - 1
+        for name in FACETS:
+            for value, slots in facet_slots[name].items():
+                self.facets[name][value] = _bitmap_from_slots(slots, size)
+        for name in RANGES:
+            for bin_id, slots in self.bin_slots[name].items():
+                self.bins[name][bin_id] = _bitmap_from_slots(slots, size)
+        for entries in self.sorted.values():
+            entries.sort()
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def ensure_loaded(self, db: Session):
+        # Done by the warm-up thread before the process is marked ready
+        with self._load_lock:
+            if self._loaded_at is None:
+                self.load(db)
+
+    def refresh(self, db: Session):
+        """Apply the changes other processes logged since the last refresh; returns how many stones."""
+        if self._loaded_at is None:
+            return 0
+        since = datetime.utcnow() - timedelta(seconds=STONE_INDEX_GRACE_SECONDS)
+        changes = (
+            db.query(StoneIndexChange.id, StoneIndexChange.stone_id)
+            .filter(or_(StoneIndexChange.id > self._watermark, StoneIndexChange.changed_at >= since))
+            .all()
+        )
+        if not changes:
+            return 0
+        stone_ids = {stone_id for _, stone_id in changes}
+        columns = [getattr(CertifiedStock, field) for field in _ROW_FIELDS]
+        found = {raw[0]: raw for raw in db.query(*columns).filter(CertifiedStock.id.in_(stone_ids))}
+        with self._lock:
+            for stone_id in stone_ids:
+                self._remove(stone_id)
+                if stone_id in found:
+                    self._add(self._row(*found[stone_id]))
+            self._watermark = max(self._watermark, max(change_id for change_id, _ in changes))
+        return len(stone_ids)
+
+    def prune(self, db: Session, older_than: int = STONE_INDEX_CHANGE_RETENTION):
+        cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+        count = db.query(StoneIndexChange).filter(StoneIndexChange.changed_at < cutoff).delete(
+            synchronize_session=False
+        )
+        db.commit()
+        return count
+
+    def start(self):
+        if self._thread is None and self.poll_seconds > 0:
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._poll, name="stone-index", daemon=True)
+            self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    def _poll(self):
+        while not self._stop.wait(self.poll_seconds):
+            db = SessionLocal()
+            try:
+                self.refresh(db)
+                if self._pruned_at is None or time.monotonic() - self._pruned_at > 3600:
+                    self.prune(db)
+                    self._pruned_at = time.monotonic()
+            except Exception:
+                db.rollback()
+                logger.warning("Could not apply stone index changes", exc_info=True)
+            finally:
+                db.close()
+
+    def upsert(self, stone: CertifiedStock):
+        with self._lock:
+            if self._loaded_at is None:
+                return  # the load picks it up
+            self._remove(stone.id)
+            self._add(self._row(*(getattr(stone, field) for field in _ROW_FIELDS)))
+
+    def remove(self, stone_id: int):
+        with self._lock:
+            if self._loaded_at is not None:
+                self._remove(stone_id)
+
+    def _row(self, stone_id, shape, size, color, clarity, lab, rate, total, date):
+        return (
+            stone_id,
+            _facet_value(shape), _facet_value(size), _facet_value(color),
+            _facet_value(clarity), _facet_value(lab),
+            _number(rate), _number(total),
+            date,
+        )
+
+    def _add(self, row):
+        slot = self.free_slots.pop() if self.free_slots else len(self.rows)
+        if slot == len(self.rows):
+            self.rows.append(row)
+        else:
+            self.rows[slot] = row
+        self.slot_of[row[0]] = slot
+
+        bit = 1 << slot
+        self.alive |= bit
+        for position, name in enumerate(FACETS, start=1):
+            self.facets[name][row[position]] |= bit
+        for position, name in enumerate(RANGES, start=1 + len(FACETS)):
+            if row[position] is not None:
+                bin_id = _bin(row[position])
+                self.bins[name][bin_id] |= bit
+                self.bin_slots[name][bin_id].add(slot)
+        for name in SORTS:
+            bisect.insort(self.sorted[name], (_sort_key(row, name), slot))
+
+    def _remove(self, stone_id: int):
+        slot = self.slot_of.pop(stone_id, None)
+        if slot is None:
+            return
+        row = self.rows[slot]
+        mask = ~(1 << slot)
+        self.alive &= mask
+        for position, name in enumerate(FACETS, start=1):
+            self.facets[name][row[position]] &= mask
+        for position, name in enumerate(RANGES, start=1 + len(FACETS)):
+            if row[position] is not None:
+                bin_id = _bin(row[position])
+                self.bins[name][bin_id] &= mask
+                self.bin_slots[name][bin_id].discard(slot)
+        for name in SORTS:
+            entries = self.sorted[name]
+            index = bisect.bisect_left(entries, (_sort_key(row, name), slot))
+            del entries[index]
+        self.rows[slot] = None
+        self.free_slots.append(slot)
+
+    # -- queries -----------------------------------------------------------
+
+    def _range_bitmap(self, name: str, low, high) -> int:
+        low_bin = _bin(low) if low is not None else float("-inf")
+        high_bin = _bin(high) if high is not None else float("inf")
+        bitmap = 0
+        for bin_id, bin_bitmap in self.bins[name].items():
+            if low_bin < bin_id < high_bin:
+                bitmap |= bin_bitmap
+
+        # Boundary bins are resolved exactly from the sorted order of the field
+        entries = self.sorted[name]
+        edge_slots = []
+        if low is not None:
+            index = bisect.bisect_left(entries, (low, -1))
+            while index < len(entries) and _bin(entries[index][0]) == low_bin:
+                if high is not None and entries[index][0] > high:
+                    break
+                edge_slots.append(entries[index][1])
+                index += 1
+        if high is not None and high_bin != low_bin:
+            index = bisect.bisect_right(entries, (high, float("inf"))) - 1
+            while index >= 0 and entries[index][0] != float("-inf") and _bin(entries[index][0]) == high_bin:
+                if low is not None and entries[index][0] < low:
+                    break
+                edge_slots.append(entries[index][1])
+                index -= 1
+        return bitmap | _bitmap_from_slots(edge_slots, len(self.rows))
+
+    def _page(self, result: int, total: int, sort: str, descending: bool, offset: int, limit: int,
+              bounds=(None, None)):
+        wanted = offset + limit
+        if total * 20 < len(self.rows):
+            # Sparse result: sort just the matching slots
+            slots = sorted(
+                _slots_of(result),
+                key=lambda slot: (_sort_key(self.rows[slot], sort), slot),
+                reverse=descending,
+            )
+            return [self.rows[slot][0] for slot in slots[offset:wanted]]
+
+        # Dense result: walk the presorted order until the page is filled
+        members = result.to_bytes((len(self.rows) + 7) // 8, "little")
+        entries = self.sorted[sort]
+        # A range on the sort field itself narrows the walk to that slice
+        low, high = bounds
+        start = bisect.bisect_left(entries, (low, -1)) if low is not None else 0
+        stop = bisect.bisect_right(entries, (high, float("inf"))) if high is not None else len(entries)
+        indexes = range(stop - 1, start - 1, -1) if descending else range(start, stop)
+        ids = []
+        seen = 0
+        for index in indexes:
+            slot = entries[index][1]
+            if members[slot >> 3] >> (slot & 7) & 1:
+                if seen >= offset:
+                    ids.append(self.rows[slot][0])
+                    if len(ids) == limit:
+                        break
+                seen += 1
+        return ids
+
+    def search(self, filters: dict, ranges: dict, sort: str = "id", descending: bool = False,
+               offset: int = 0, limit: int = 50):
+        """Return (total matches, ids of the requested page, facet counts)."""
+        with self._lock:
+            base = self.alive
+            for name, (low, high) in ranges.items():
+                if low is not None or high is not None:
+                    base &= self._range_bitmap(name, low, high)
+
+            facet_filters = {}
+            for name, values in filters.items():
+                if values:
+                    bitmap = 0
+                    for value in values:
+                        key = "" if value == BLANK_FACET else _facet_value(value)
+                        bitmap |= self.facets[name].get(key, 0)
+                    facet_filters[name] = bitmap
+
+            result = base
+            for bitmap in facet_filters.values():
+                result &= bitmap
+
+            # Each facet is counted with every filter applied except its own,
+            # so the client can still offer the other values of that attribute
+            counts = {}
+            for name in FACETS:
+                scope = base
+                for other, bitmap in facet_filters.items():
+                    if other != name:
+                        scope &= bitmap
+                counts[name] = {
+                    value or BLANK_FACET: count
+                    for value, bitmap in self.facets[name].items()
+                    if (count := (scope & bitmap).bit_count())
+                }
+
+            total = result.bit_count()
+            bounds = ranges.get(sort, (None, None))
+            ids = self._page(result, total, sort, descending, offset, limit, bounds) if total else []
+            return total, ids, counts
+
+
+stone_index = StoneIndex()
+
+
+# Logged in the writer's transaction, so other processes see exactly the committed changes
+@event.listens_for(CertifiedStock, "after_insert")
+@event.listens_for(CertifiedStock, "after_update")
+@event.listens_for(CertifiedStock, "after_delete")
+def _log_change(mapper, connection, target):
+    connection.execute(StoneIndexChange.__table__.insert().values(stone_id=target.id, changed_at=datetime.utcnow()))
+
+
+def search_stones(db: Session, filters: dict, ranges: dict, sort: str = "id",
+                  descending: bool = False, offset: int = 0, limit: int = 50):
+    if not stone_index.loaded:
+        raise HTTPException(
+            status_code=503,
+            detail="Stone search is still loading, retry shortly",
+            headers={"Retry-After": str(STONE_INDEX_RETRY_AFTER)},
+        )
+    total, ids, facets = stone_index.search(filters, ranges, sort, descending, offset, limit)
+    by_id = {
+        stone.id: stone
+        for stone in db.query(CertifiedStock).filter(CertifiedStock.id.in_(ids)).all()
+    } if ids else {}
+    return {
+        "total": total,
+        "items": [by_id[stone_id] for stone_id in ids if stone_id in by_id],
+        "facets": facets,
+    }
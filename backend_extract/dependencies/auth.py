@@ -1,5 +1,4 @@
 from fastapi import Depends, HTTPException
-from jose import jwt
 from sqlalchemy.orm import Session
 import os
 from models.user_model import User
@@ -14,6 +13,7 @@ ALGORITHM = os.getenv("ALGORITHM")
 oauth2_scheme = lambda: None  # Placeholder if needed
 
 def get_current_user(token: str, db: Session = Depends(get_db)) -> User:
+    from jose import jwt  # imported on first use to keep cold starts short
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         username = payload.get("sub")
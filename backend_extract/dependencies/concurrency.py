@@ -0,0 +1,44 @@
+from contextlib import contextmanager
+from typing import Optional
+
+from fastapi import Header, HTTPException
+from sqlalchemy.orm.exc import StaleDataError
+
+
+def if_match_version(if_match: Optional[str] = Header(default=None)) -> Optional[int]:
+    """Row version the client last read, from an `If-Match: "<version>"` header."""
+    if if_match is None:
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    value = value.strip('"')
+    if not value.isdigit():
+        raise HTTPException(status_code=400, detail="If-Match must carry a row version")
+    return int(value)
+
+
+def etag(record) -> str:
+    return f'"{record.version}"'
+
+
+def check_version(record, expected: Optional[int]):
+    if expected is not None and record.version != expected:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Record was changed by someone else (version {record.version}, you have {expected})",
+        )
+
+
+@contextmanager
+def conflict_on_stale(db):
+    """
+    Turn a lost version race into a 409. Versioned rows are written as
+    UPDATE ... WHERE id = :id AND version = :v, which matches nothing when
+    another request committed in between.
+    """
+    try:
+        yield
+    except StaleDataError:
+        db.rollback()
+        raise HTTPException(status_code=409, detail="Record was changed by someone else; reload and retry")
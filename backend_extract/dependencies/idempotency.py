@@ -0,0 +1,13 @@
+from typing import Optional
+
+from fastapi import Header, HTTPException
+
+
+def idempotency_key(idempotency_key: Optional[str] = Header(default=None)) -> Optional[str]:
+    """The client's `Idempotency-Key` header, if it sent one."""
+    if idempotency_key is None:
+        return None
+    key = idempotency_key.strip()
+    if not key or len(key) > 255:
+        raise HTTPException(status_code=400, detail="Idempotency-Key must be 1 to 255 characters")
+    return key
@@ -0,0 +1,17 @@
+import sys
+from config.db import SessionLocal
+from crud.parquet_export import export_all, EXPORT_DIR
+
+def export_parquet_snapshots(full: bool = False):
+    db = SessionLocal()
+    try:
+        counts = export_all(db, full=full)
+        for table, count in counts.items():
+            print(f"{table}: {count} rows written")
+        print(f"Parquet snapshots updated in {EXPORT_DIR}")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    # --full rewrites every partition (after bulk corrections to old months)
+    export_parquet_snapshots(full="--full" in sys.argv)
@@ -1,16 +1,60 @@
+import os
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # Correct paths for Render deployment
-from backend_extract.config.db import Base, engine
 from backend_extract.routes.auth_routes import router as auth_router
-from backend_extract.routes.dashboard_routes import router as dashboard_router
+from backend_extract.routes.dashboard import router as dashboard_router
 from backend_extract.routes.sales_routes import router as sales_router
+from backend_extract.routes.health_routes import router as health_router, readiness
+from backend_extract.routes.events_routes import router as events_router
+from backend_extract.routes.certified_stock_routes import router as certified_stock_router
+from backend_extract.routes.search_routes import router as search_router
+from backend_extract.routes.analytics_routes import router as analytics_router
+from backend_extract.routes.job_routes import router as job_router
+from backend_extract.routes.ledger_routes import router as ledger_router
+from backend_extract.routes.pricing_routes import router as pricing_router
+from backend_extract.routes.certificate_routes import router as certificate_router
+from backend_extract.routes.fx_routes import router as fx_router
+from backend_extract.routes.igi_reconcile_routes import router as igi_reconcile_router
+from backend_extract.routes.snapshot_routes import router as snapshot_router
+from backend_extract.routes.audit_routes import router as audit_router
+from backend_extract.routes.purchase_routes import router as purchase_router
+from backend_extract.routes.memo_give_routes import router as memo_give_router
+from backend_extract.routes.memo_take_routes import router as memo_take_router
+from backend_extract.routes.inventory_routes import router as inventory_router
+from backend_extract.routes.reports_routes import router as reports_router
+from backend_extract.routes.jewellery_routes import router as jewellery_router
+from backend_extract.routes.jewellery_stock_routes import router as jewellery_stock_router
+from backend_extract.routes.loose_stock_routes import router as loose_stock_router
+from backend_extract.routes.stock_transfer_routes import router as stock_transfer_router
+from backend_extract.routes.igi_issue_routes import router as igi_issue_router
+from backend_extract.routes.igi_receive_routes import router as igi_receive_router
+from backend_extract.routes.expenses_routes import router as expenses_router
+from backend_extract.utils.compression import CompressionMiddleware
+from backend_extract.crud import job_handlers  # registers the built-in job kinds
+from backend_extract.utils.audit_actor import AuditActorMiddleware, flusher as audit_flusher
+from backend_extract.utils.rate_limit import RateLimitMiddleware
+from backend_extract.utils.read_your_writes import ReadYourWritesMiddleware
+# Same modules the routers and models import: the tables are registered on this Base,
+# and the replica heartbeat table and the stone index exist once
+from config.db import Base, engine, sync_schema
+from config.replicas import router as replica_router
+from crud.stone_search import stone_index
+from crud.change_feed import hub as change_feed
+from crud.analytics import snapshot as analytics_snapshot
+from crud import dimensions
 
 app = FastAPI()
 
-# Optional: Auto-create tables at startup
-Base.metadata.create_all(bind=engine)
+# Optional: Auto-create tables at startup. serve.py migrates once before
+# starting its workers and sets SKIP_MIGRATIONS=1 so they do not race.
+if os.getenv("SKIP_MIGRATIONS") != "1":
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+    # Ledgers created with text dimension columns move to ids before any request reads them
+    dimensions.migrate(engine)
 
 # Middleware
 app.add_middleware(
@@ -19,12 +63,72 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Last-Write"],
 )
+# Compress large JSON list payloads (/sales/, /purchase/) for slow branch links
+app.add_middleware(CompressionMiddleware, minimum_size=1024)
+# Names the user behind each write in the audit trail
+app.add_middleware(AuditActorMiddleware)
+# Tells clients when they last wrote, so their next reads skip lagging replicas
+app.add_middleware(ReadYourWritesMiddleware)
+# Outermost, so requests over their budget are turned away before any other work
+app.add_middleware(RateLimitMiddleware)
 
 # Routers
 app.include_router(auth_router)
 app.include_router(dashboard_router)
 app.include_router(sales_router)
+app.include_router(health_router)
+app.include_router(events_router)
+app.include_router(certified_stock_router)
+app.include_router(search_router)
+app.include_router(analytics_router)
+app.include_router(job_router)
+app.include_router(ledger_router)
+app.include_router(pricing_router)
+app.include_router(certificate_router)
+app.include_router(fx_router)
+app.include_router(igi_reconcile_router)
+app.include_router(snapshot_router)
+app.include_router(audit_router)
+app.include_router(purchase_router)
+app.include_router(memo_give_router)
+app.include_router(memo_take_router)
+app.include_router(inventory_router)
+app.include_router(reports_router)
+app.include_router(jewellery_router)
+app.include_router(jewellery_stock_router)
+app.include_router(loose_stock_router)
+app.include_router(stock_transfer_router)
+app.include_router(igi_issue_router)
+app.include_router(igi_receive_router)
+app.include_router(expenses_router)
+
+# Background jobs run on worker threads of every API process (JOB_WORKERS, 0 disables);
+# audit entries are batched by one flusher thread; replica lag is checked by another,
+# a warm-up thread fills pools, caches and the stone index before /health/ready
+# reports ready, two more apply the stone changes and pass on the change-feed
+# events that the other processes logged, and one queues an analytics snapshot
+# refresh whenever the snapshot is older than ANALYTICS_SNAPSHOT_REFRESH_SECONDS
+@app.on_event("startup")
+def start_background_workers():
+    job_handlers.worker_pool.start()
+    audit_flusher.start()
+    replica_router.start()
+    readiness.start()
+    stone_index.start()
+    change_feed.start()
+    analytics_snapshot.start()
+
+@app.on_event("shutdown")
+def stop_background_workers():
+    job_handlers.worker_pool.stop()
+    audit_flusher.stop()
+    replica_router.stop()
+    readiness.stop()
+    stone_index.stop()
+    change_feed.stop()
+    analytics_snapshot.stop()
 
 # Root endpoint
 @app.get("/")
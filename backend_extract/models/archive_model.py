@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Date, DateTime, UniqueConstraint
+from config.db import Base
+
+class ArchivedPeriod(Base):
+    __tablename__ = "archived_periods"
+    __table_args__ = (
+        UniqueConstraint("table_name", "fiscal_year", name="uq_archived_periods_table_year"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String, nullable=False, index=True)
+    fiscal_year = Column(Integer, nullable=False)  # starting calendar year, e.g. 2023 for FY 2023-24
+    date_from = Column(Date, nullable=False)
+    date_to = Column(Date, nullable=False)
+    rows = Column(Integer, nullable=False)
+    archived_at = Column(DateTime, default=datetime.utcnow)
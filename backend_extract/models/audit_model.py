@@ -0,0 +1,18 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Text, DateTime, Index
+from config.db import Base
+
+class AuditLog(Base):
+    __tablename__ = "audit_log"
+    __table_args__ = (
+        Index("ix_audit_log_table_row", "table_name", "row_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer)
+    operation = Column(String, nullable=False)  # insert / update / delete
+    changes = Column(Text)  # JSON: {column: [before, after]}
+    actor = Column(String, index=True)  # username from the request's bearer token
+    changed_at = Column(DateTime, default=datetime.utcnow)
@@ -0,0 +1,41 @@
+from sqlalchemy import Column, Integer, String, Date, DateTime, Boolean, Index, UniqueConstraint
+from config.db import Base
+
+class CertificateEvent(Base):
+    __tablename__ = "certificate_events"
+    __table_args__ = (
+        UniqueConstraint("source", "source_id", name="uq_certificate_events_source"),
+        # Conflict checks and stone histories are one probe of this index
+        Index("ix_certificate_events_number_source", "certificate_no", "source"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    certificate_no = Column(String, nullable=False)  # trimmed, upper-case, no spaces
+    source = Column(String, nullable=False)  # "purchase", "certified_stock", "memo_give", "memo_take" or "sales"
+    source_id = Column(Integer, nullable=False)
+    date = Column(Date, nullable=False)
+    state = Column(String, nullable=False)  # what the row says about the stone, e.g. "sold" (see crud/certificates.py)
+
+class Certificate(Base):
+    __tablename__ = "certificates"
+
+    certificate_no = Column(String, primary_key=True)
+    state = Column(String, nullable=False)  # state of the latest event
+    first_date = Column(Date)
+    last_date = Column(Date)
+    events = Column(Integer, nullable=False, default=0)
+
+class CertificateConflict(Base):
+    __tablename__ = "certificate_conflicts"
+    __table_args__ = (
+        Index("ix_certificate_conflicts_open", "resolved", "certificate_no"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    certificate_no = Column(String, nullable=False)
+    source = Column(String, nullable=False)  # the row that conflicts...
+    source_id = Column(Integer, nullable=False)
+    conflicting_source = Column(String, nullable=False)  # ...with this earlier one
+    conflicting_id = Column(Integer, nullable=False)
+    detected_at = Column(DateTime, nullable=False)
+    resolved = Column(Boolean, nullable=False, default=False)
@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import Optional
+from typing import Optional, Dict, List
 from datetime import date
 
 class CertifiedStockBase(BaseModel):
@@ -24,3 +24,8 @@ class CertifiedStock(CertifiedStockBase):
 
     class Config:
         orm_mode = True
+
+class CertifiedStockSearchResult(BaseModel):
+    total: int
+    items: List[CertifiedStock]
+    facets: Dict[str, Dict[str, int]]
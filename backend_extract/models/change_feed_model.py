@@ -0,0 +1,14 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, DateTime
+from config.db import Base
+
+class ChangeFeedEvent(Base):
+    __tablename__ = "change_feed"
+
+    id = Column(Integer, primary_key=True, index=True)  # the SSE event id every process shares
+    table_name = Column(String, nullable=False)
+    row_id = Column(Integer)
+    op = Column(String, nullable=False)  # "insert", "update" or "delete"
+    version = Column(Integer)
+    created_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
@@ -0,0 +1,35 @@
+from sqlalchemy import Column, Integer, String, Date, Numeric, Boolean, false
+from config.db import Base
+
+class CostLayer(Base):
+    __tablename__ = "cost_layers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    purchase_id = Column(Integer, unique=True, nullable=False)
+    cost_key = Column(String, nullable=False, index=True)  # "LAB:<lab_no>" or "LOT:<iteam>|<shape>|<size>"
+    date = Column(Date, nullable=False)
+    qty_in = Column(Integer, nullable=False)
+    qty_remaining = Column(Integer, nullable=False)
+    unit_cost = Column(Numeric(12, 2), nullable=False)
+    # No rate to fx.BASE_CURRENCY was known: unit_cost is 0 and sales drawing on the layer are unconverted
+    unconverted = Column(Boolean, nullable=False, default=False, server_default=false())
+
+class CostPosition(Base):
+    __tablename__ = "cost_positions"
+
+    cost_key = Column(String, primary_key=True)
+    qty_on_hand = Column(Integer, nullable=False, default=0)
+    value_on_hand = Column(Numeric(14, 2), nullable=False, default=0)
+
+class SaleCost(Base):
+    __tablename__ = "sale_costs"
+
+    sale_id = Column(Integer, primary_key=True)
+    cost_key = Column(String, nullable=False, index=True)
+    date = Column(Date, nullable=False, index=True)
+    qty = Column(Integer, nullable=False)
+    unmatched_qty = Column(Integer, nullable=False, default=0)
+    revenue = Column(Numeric(14, 2), nullable=False, default=0)
+    cogs = Column(Numeric(14, 2), nullable=False, default=0)
+    # Revenue or part of the cost had no rate yet; left out of margins until a rate is added
+    unconverted = Column(Boolean, nullable=False, default=False, server_default=false())
@@ -1,45 +1,71 @@
-from sqlalchemy import Column, Integer, String, Date, Numeric
+from sqlalchemy import Column, Integer, String, Date, Numeric, Index
 from config.db import Base  # ✅ FIXED: import from correct path
+from models.dimension_model import dimension, dimension_id
+
+# Repeated ledger strings are stored as ids into the dimensions table; each
+# `dimension()` attribute reads and filters them as text.
 
 class Sales(Base):
     __tablename__ = "sales"
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
-    customer = Column(String)
-    iteam = Column(String)
-    shape = Column(String)
-    size = Column(String)
-    col = Column(String)
-    clr = Column(String)
+    customer_id = dimension_id()
+    customer = dimension("customer", customer_id)
+    iteam_id = dimension_id()
+    iteam = dimension("item", iteam_id)
+    shape_id = dimension_id()
+    shape = dimension("shape", shape_id)
+    size_id = dimension_id()
+    size = dimension("size", size_id)
+    col_id = dimension_id()
+    col = dimension("color", col_id)
+    clr_id = dimension_id()
+    clr = dimension("clarity", clr_id)
     pcs = Column(Integer)
     lab_no = Column(String)
     rate = Column(Numeric(10, 2))
     total = Column(Numeric(12, 2))
     term = Column(String)
-    currency = Column(String)
-    pay_mode = Column(String)
+    currency_id = dimension_id()
+    currency = dimension("currency", currency_id)
+    pay_mode_id = dimension_id()
+    pay_mode = dimension("pay_mode", pay_mode_id)
     sales_executive = Column(String)
     remark = Column(String)
+    branch_id = dimension_id()
+    branch = dimension("branch", branch_id)
+    # Bumped on every UPDATE, which only matches the version that was read (see dependencies/concurrency.py)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
 class Purchase(Base):
     __tablename__ = "purchase"
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
-    vendor = Column(String)
-    iteam = Column(String)
-    shape = Column(String)
-    size = Column(String)
-    col = Column(String)
-    clr = Column(String)
+    vendor_id = dimension_id()
+    vendor = dimension("vendor", vendor_id)
+    iteam_id = dimension_id()
+    iteam = dimension("item", iteam_id)
+    shape_id = dimension_id()
+    shape = dimension("shape", shape_id)
+    size_id = dimension_id()
+    size = dimension("size", size_id)
+    col_id = dimension_id()
+    col = dimension("color", col_id)
+    clr_id = dimension_id()
+    clr = dimension("clarity", clr_id)
     pcs = Column(Integer)
     lab_no = Column(String)
     rate = Column(Numeric(10, 2))
     total = Column(Numeric(12, 2))
     term = Column(String)
-    currency = Column(String)
-    pay_mode = Column(String)
+    currency_id = dimension_id()
+    currency = dimension("currency", currency_id)
+    pay_mode_id = dimension_id()
+    pay_mode = dimension("pay_mode", pay_mode_id)
     purchase_executive = Column(String)
     remark = Column(String)
 
@@ -63,10 +89,15 @@ class LooseStock(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
-    branch = Column(String)
-    iteam = Column(String)
-    shape = Column(String)
-    size = Column(String)
+    branch_id = dimension_id()
+    branch = dimension("branch", branch_id)
+    iteam_id = dimension_id()
+    iteam = dimension("item", iteam_id)
+    shape_id = dimension_id()
+    shape = dimension("shape", shape_id)
+    size_id = dimension_id()
+    size = dimension("size", size_id)
+    pcs = Column(Integer)
     total = Column(Numeric(12, 2))
     remark = Column(String)
 
@@ -77,14 +108,20 @@ class CertifiedStock(Base):
     date = Column(Date, nullable=False)
     certi_no = Column(String)
     lab = Column(String)
-    shape = Column(String)
-    size = Column(String)
-    color = Column(String)
-    clarity = Column(String)
+    shape_id = dimension_id()
+    shape = dimension("shape", shape_id)
+    size_id = dimension_id()
+    size = dimension("size", size_id)
+    color_id = dimension_id()
+    color = dimension("color", color_id)
+    clarity_id = dimension_id()
+    clarity = dimension("clarity", clarity_id)
     rate = Column(Numeric(10, 2))
     total = Column(Numeric(12, 2))
-    currency = Column(String)
-    pay_mode = Column(String)
+    currency_id = dimension_id()
+    currency = dimension("currency", currency_id)
+    pay_mode_id = dimension_id()
+    pay_mode = dimension("pay_mode", pay_mode_id)
     remark = Column(String)
 
 class StockTransfer(Base):
@@ -92,11 +129,17 @@ class StockTransfer(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
-    from_branch = Column(String)
-    to_branch = Column(String)
-    iteam = Column(String)
-    shape = Column(String)
-    size = Column(String)
+    from_branch_id = dimension_id()
+    from_branch = dimension("branch", from_branch_id)
+    to_branch_id = dimension_id()
+    to_branch = dimension("branch", to_branch_id)
+    iteam_id = dimension_id()
+    iteam = dimension("item", iteam_id)
+    shape_id = dimension_id()
+    shape = dimension("shape", shape_id)
+    size_id = dimension_id()
+    size = dimension("size", size_id)
+    pcs = Column(Integer)
     total = Column(Numeric(12, 2))
     remark = Column(String)
 
@@ -115,6 +158,9 @@ class JewelleryStock(Base):
 
 class MemoGive(Base):
     __tablename__ = "memo_give"
+    __table_args__ = (
+        Index("ix_memo_give_status_client", "status", "client_name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
@@ -126,9 +172,21 @@ class MemoGive(Base):
     rate = Column(Numeric(10, 2))
     amount = Column(Numeric(12, 2))
     remark = Column(String)
+    certi_no = Column(String)  # certificate of the stone on memo, if any (see crud/certificates.py)
+    # Lifecycle: open -> partial_return -> converted / closed (see crud/memo.py)
+    status = Column(String, default="open")
+    returned_amount = Column(Numeric(12, 2), default=0)
+    converted_amount = Column(Numeric(12, 2), default=0)
+    outstanding_amount = Column(Numeric(12, 2))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
 class MemoTake(Base):
     __tablename__ = "memo_take"
+    __table_args__ = (
+        Index("ix_memo_take_status_client", "status", "client_name"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     date = Column(Date, nullable=False)
@@ -140,6 +198,15 @@ class MemoTake(Base):
     rate = Column(Numeric(10, 2))
     amount = Column(Numeric(12, 2))
     remark = Column(String)
+    certi_no = Column(String)  # certificate of the stone on memo, if any (see crud/certificates.py)
+    # Lifecycle: open -> partial_return -> converted / closed (see crud/memo.py)
+    status = Column(String, default="open")
+    returned_amount = Column(Numeric(12, 2), default=0)
+    converted_amount = Column(Numeric(12, 2), default=0)
+    outstanding_amount = Column(Numeric(12, 2))
+    version = Column(Integer, nullable=False, default=1, server_default="1")
+
+    __mapper_args__ = {"version_id_col": version}
 
 class IGIIssue(Base):
     __tablename__ = "igi_issue"
@@ -0,0 +1,45 @@
+from sqlalchemy import Column, ForeignKey, Integer, String, UniqueConstraint, select
+from sqlalchemy.orm import ColumnProperty, column_property
+from sqlalchemy.sql import operators
+from config.db import Base
+
+class Dimension(Base):
+    __tablename__ = "dimensions"
+    __table_args__ = (
+        # One row per distinct value of a kind; ledgers store its id (see crud/dimensions.py)
+        UniqueConstraint("kind", "value", name="uq_dimensions_kind_value"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # customer, vendor, item, shape, size, color, clarity, currency, pay_mode, branch
+    value = Column(String, nullable=False)
+
+
+class DimensionComparator(ColumnProperty.Comparator):
+    """Equality and IN filters on a dimension's text compare the ledger's integer id instead."""
+
+    def _ids(self, values):
+        return select(Dimension.id).where(Dimension.kind == self.prop.info["dimension"], Dimension.value.in_(values))
+
+    def operate(self, op, *other, **kwargs):
+        id_column = self.prop.info["id_column"]
+        if op is operators.eq and isinstance(other[0], str):
+            return id_column == self._ids([other[0]]).scalar_subquery()
+        if op is operators.in_op and all(isinstance(value, str) for value in other[0]):
+            return id_column.in_(self._ids(list(other[0])))
+        return super().operate(op, *other, **kwargs)
+
+
+def dimension_id():
+    return Column(Integer, ForeignKey("dimensions.id"))
+
+
+def dimension(kind: str, id_column):
+    """
+    Text of a ledger's dimension id, read through a correlated lookup so
+    rows load, filter and serialize as if the string were still stored.
+    Assigned values are turned into ids on flush (see crud/dimensions.py).
+    """
+    value = select(Dimension.value).where(Dimension.id == id_column).correlate_except(Dimension).scalar_subquery()
+    return column_property(value, comparator_factory=DimensionComparator,
+                           info={"dimension": kind, "id_column": id_column})
@@ -0,0 +1,14 @@
+from sqlalchemy import Column, Integer, String, Date, Numeric, UniqueConstraint
+from config.db import Base
+
+class FxRate(Base):
+    __tablename__ = "fx_rates"
+    __table_args__ = (
+        # Serves the "latest rate on or before a date" lookup used by every report
+        UniqueConstraint("currency", "date", name="uq_fx_rates_currency_date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    currency = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    rate = Column(Numeric(18, 8), nullable=False)  # units of base currency per 1 unit of `currency`
@@ -0,0 +1,13 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime
+from config.db import Base
+
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    # The client's Idempotency-Key header; the primary key index is what serializes duplicates
+    key = Column(String(255), primary_key=True)
+    endpoint = Column(String, nullable=False)  # e.g. "POST /sales/"
+    fingerprint = Column(String(64), nullable=False)  # sha256 of the request body
+    status_code = Column(Integer, nullable=False)
+    response = Column(Text, nullable=False)  # JSON
+    expires_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,23 @@
+from sqlalchemy import Column, Integer, String, Date
+from config.db import Base
+
+class IGIPending(Base):
+    __tablename__ = "igi_pending"
+
+    issue_id = Column(Integer, primary_key=True)
+    item_key = Column(String, nullable=False, index=True)
+    issue_date = Column(Date, nullable=False)
+    pcs_issued = Column(Integer, nullable=False)
+    pcs_received = Column(Integer, nullable=False, default=0)
+    pcs_pending = Column(Integer, nullable=False, index=True)
+    last_receive_date = Column(Date)
+
+class IGIMatch(Base):
+    __tablename__ = "igi_matches"
+
+    receive_id = Column(Integer, primary_key=True)
+    issue_id = Column(Integer, index=True)  # NULL when no open issue was found for the stone
+    item_key = Column(String, nullable=False, index=True)
+    certificate_no = Column(String, index=True)
+    receive_date = Column(Date, nullable=False)
+    turnaround_days = Column(Integer)
@@ -1,16 +1,46 @@
 # models/jewellery_model.py
 
-from sqlalchemy import Column, Integer, String, Date, Numeric
+from sqlalchemy import Column, Integer, String, Date, DateTime, Numeric, Index, UniqueConstraint
 from config.db import Base
 
 class JewelleryItem(Base):
     __tablename__ = "jewellery_items"
+    __table_args__ = (
+        # Serves /jewellery/?status= (and ?status=&purity=)
+        Index("ix_jewellery_items_status_purity", "status", "purity"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     item_code = Column(String, unique=True, nullable=False)
     description = Column(String)
     purity = Column(String)
     weight = Column(Numeric(10, 2))
-    status = Column(String)  # Example: in_stock, sold, memo_out, etc.
+    status = Column(String)  # in_stock, reserved, memo_out, repair or sold (see crud/jewellery.py)
     last_updated = Column(Date)
     remarks = Column(String)
+
+class JewelleryStatusHistory(Base):
+    __tablename__ = "jewellery_status_history"
+
+    id = Column(Integer, primary_key=True, index=True)
+    item_id = Column(Integer, nullable=False, index=True)
+    from_status = Column(String)  # None when the item was created
+    to_status = Column(String, nullable=False)
+    changed_at = Column(DateTime, nullable=False)
+    changed_by = Column(String)
+    remark = Column(String)
+
+class JewelleryCount(Base):
+    __tablename__ = "jewellery_counts"
+    __table_args__ = (
+        UniqueConstraint("kind", "status", "purity", name="uq_jewellery_counts_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)  # "items" (jewellery_items) or "stock" (jewellery_stock)
+    status = Column(String, nullable=False, default="")  # blank for stock entries
+    purity = Column(String, nullable=False, default="")
+    count = Column(Integer, nullable=False, default=0)
+    weight = Column(Numeric(14, 2), nullable=False, default=0)  # items' weight, stock's gross_wt
+    net_wt = Column(Numeric(14, 2), nullable=False, default=0)
+    value = Column(Numeric(14, 2), nullable=False, default=0)
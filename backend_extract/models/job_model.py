@@ -0,0 +1,28 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, String, Float, Text, DateTime, Index
+from config.db import Base
+
+class Job(Base):
+    __tablename__ = "jobs"
+    __table_args__ = (
+        # Workers poll for the oldest runnable job
+        Index("ix_jobs_status_run_after", "status", "run_after"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    kind = Column(String, nullable=False)
+    status = Column(String, nullable=False, default="queued")  # queued -> running -> succeeded / failed
+    payload = Column(Text)  # JSON
+    result = Column(Text)  # JSON
+    error = Column(Text)
+    progress = Column(Float, default=0.0)  # 0..1
+    message = Column(String)
+    attempts = Column(Integer, nullable=False, default=0)
+    max_attempts = Column(Integer, nullable=False, default=3)
+    run_after = Column(DateTime, nullable=False, default=datetime.utcnow)
+    locked_by = Column(String)
+    created_at = Column(DateTime, default=datetime.utcnow)
+    started_at = Column(DateTime)
+    heartbeat_at = Column(DateTime)  # last sign of life from the worker running it
+    finished_at = Column(DateTime)
@@ -0,0 +1,54 @@
+from sqlalchemy import Column, Integer, String, Date, Numeric, Boolean, Index, UniqueConstraint, false
+from config.db import Base
+
+class Payment(Base):
+    __tablename__ = "payments"
+    __table_args__ = (
+        Index("ix_payments_party_date", "party_type", "party", "date"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    date = Column(Date, nullable=False)
+    party_type = Column(String, nullable=False)  # "customer" (received) or "vendor" (paid out)
+    party = Column(String, nullable=False)
+    amount = Column(Numeric(12, 2), nullable=False)
+    currency = Column(String)
+    pay_mode = Column(String)
+    reference = Column(String)
+    remark = Column(String)
+
+class PartyLedgerEntry(Base):
+    __tablename__ = "party_ledger"
+    __table_args__ = (
+        # Statements, opening balances and ageing are range reads on this index
+        Index("ix_party_ledger_party_date", "party_type", "party", "date", "id"),
+        Index("ix_party_ledger_source", "source", "source_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    party_type = Column(String, nullable=False)
+    party = Column(String, nullable=False)
+    date = Column(Date, nullable=False)
+    due_date = Column(Date)  # invoices only: date plus the days of their `term`
+    kind = Column(String, nullable=False)  # "invoice" or "payment"
+    source = Column(String, nullable=False)  # "sales", "purchase" or "payments"
+    source_id = Column(Integer, nullable=False)
+    reference = Column(String)
+    # In fx.BASE_CURRENCY; positive raises what the party owes (customer) or is owed (vendor)
+    amount = Column(Numeric(14, 2), nullable=False)
+    balance = Column(Numeric(14, 2), nullable=False)  # running balance after this entry, in (date, id) order
+    # No rate to fx.BASE_CURRENCY was known: posted at 0 and reposted once the rate is added
+    unconverted = Column(Boolean, nullable=False, default=False, server_default=false())
+
+class PartyBalance(Base):
+    __tablename__ = "party_balances"
+    __table_args__ = (
+        UniqueConstraint("party_type", "party", name="uq_party_balances_party"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    party_type = Column(String, nullable=False)
+    party = Column(String, nullable=False)
+    balance = Column(Numeric(14, 2), nullable=False, default=0)
+    last_date = Column(Date)
+    unconverted = Column(Integer, nullable=False, default=0, server_default="0")  # entries left out of the balance
@@ -8,6 +8,7 @@ class LooseStockBase(BaseModel):
     iteam: Optional[str]
     shape: Optional[str]
     size: Optional[str]
+    pcs: Optional[int] = None
     total: Optional[float]
     remark: Optional[str]
 
@@ -0,0 +1,17 @@
+from sqlalchemy import Column, Integer, String, Date, Numeric, Index
+from config.db import Base
+
+class MemoEvent(Base):
+    __tablename__ = "memo_events"
+    __table_args__ = (
+        Index("ix_memo_events_memo", "memo_type", "memo_id"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    memo_type = Column(String, nullable=False)  # "give" or "take"
+    memo_id = Column(Integer, nullable=False)
+    event_type = Column(String, nullable=False)  # "return" or "convert"
+    date = Column(Date, nullable=False)
+    amount = Column(Numeric(12, 2), nullable=False)
+    sale_id = Column(Integer)
+    remark = Column(String)
@@ -12,12 +12,18 @@ class MemoGiveBase(BaseModel):
     rate: Optional[float]
     amount: Optional[float]
     remark: Optional[str]
+    certi_no: Optional[str] = None
 
 class MemoGiveCreate(MemoGiveBase):
     pass
 
 class MemoGive(MemoGiveBase):
     id: int
+    status: Optional[str] = None
+    returned_amount: Optional[float] = None
+    converted_amount: Optional[float] = None
+    outstanding_amount: Optional[float] = None
+    version: Optional[int] = None
 
     class Config:
         orm_mode = True
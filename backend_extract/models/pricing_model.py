@@ -0,0 +1,40 @@
+from sqlalchemy import Column, Integer, String, Numeric, Index, UniqueConstraint
+from config.db import Base
+
+class PricePoint(Base):
+    __tablename__ = "price_points"
+    __table_args__ = (
+        UniqueConstraint("source", "source_id", name="uq_price_points_source"),
+        # Recomputing one matrix cell reads only its own points
+        Index("ix_price_points_cell", "side", "shape", "size_band", "color", "clarity", "period"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    source = Column(String, nullable=False)  # "purchase", "certified_stock" or "sales"
+    source_id = Column(Integer, nullable=False)
+    side = Column(String, nullable=False)  # "buy" (purchase, certified stock) or "sell" (sales)
+    shape = Column(String, nullable=False, default="")
+    size_band = Column(String, nullable=False, default="")
+    color = Column(String, nullable=False, default="")
+    clarity = Column(String, nullable=False, default="")
+    period = Column(String, nullable=False)  # "YYYY-MM"
+    rate = Column(Numeric(14, 2), nullable=False)  # in fx.BASE_CURRENCY
+
+class PriceCell(Base):
+    __tablename__ = "price_matrix"
+    __table_args__ = (
+        # One cell per key: /pricing/lookup is a single index probe
+        UniqueConstraint("side", "shape", "size_band", "color", "clarity", "period", name="uq_price_matrix_cell"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    side = Column(String, nullable=False)
+    shape = Column(String, nullable=False, default="")
+    size_band = Column(String, nullable=False, default="")
+    color = Column(String, nullable=False, default="")
+    clarity = Column(String, nullable=False, default="")
+    period = Column(String, nullable=False)
+    count = Column(Integer, nullable=False, default=0)
+    min_rate = Column(Numeric(14, 2), nullable=False)
+    median_rate = Column(Numeric(14, 2), nullable=False)
+    max_rate = Column(Numeric(14, 2), nullable=False)
@@ -19,12 +19,14 @@ class SalesBase(BaseModel):
     pay_mode: Optional[str]
     sales_executive: Optional[str]
     remark: Optional[str]
+    branch: Optional[str] = None
 
 class SalesCreate(SalesBase):
     pass
 
 class Sales(SalesBase):
     id: int
+    version: Optional[int] = None
 
     class Config:
         orm_mode = True
@@ -0,0 +1,16 @@
+from sqlalchemy import Column, Integer, String, Numeric, UniqueConstraint
+from config.db import Base
+
+class BranchStockBalance(Base):
+    __tablename__ = "branch_stock_balance"
+    __table_args__ = (
+        # Leading `branch` column serves the per-branch lookup as well
+        UniqueConstraint("branch", "iteam", "shape", "size", name="uq_branch_stock_balance_key"),
+    )
+
+    id = Column(Integer, primary_key=True, index=True)
+    branch = Column(String, nullable=False)
+    iteam = Column(String, nullable=False, default="")
+    shape = Column(String, nullable=False, default="")
+    size = Column(String, nullable=False, default="")
+    quantity = Column(Numeric(14, 2), nullable=False, default=0)  # pieces
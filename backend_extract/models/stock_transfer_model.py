@@ -9,6 +9,7 @@ class StockTransferBase(BaseModel):
     iteam: Optional[str]
     shape: Optional[str]
     size: Optional[str]
+    pcs: Optional[int] = None
     total: Optional[float]
     remark: Optional[str]
 
@@ -0,0 +1,11 @@
+from datetime import datetime
+
+from sqlalchemy import Column, Integer, DateTime
+from config.db import Base
+
+class StoneIndexChange(Base):
+    __tablename__ = "stone_index_changes"
+
+    id = Column(Integer, primary_key=True, index=True)
+    stone_id = Column(Integer, nullable=False)  # certified_stock row inserted, updated or deleted
+    changed_at = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
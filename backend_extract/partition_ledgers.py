@@ -0,0 +1,16 @@
+from config.db import engine
+from crud.archive import ARCHIVED_TABLES
+from crud.partitioning import partition_table, ensure_partitions
+
+def partition_ledgers():
+    if engine.dialect.name != "postgresql":
+        print("Declarative partitioning needs Postgres; use archive_fiscal_year.py to trim SQLite tables")
+        return
+    for table in ARCHIVED_TABLES:
+        converted = partition_table(engine, table)
+        print(f"{table}: {'partitioned by fiscal year' if converted else 'already partitioned'}")
+    # Run periodically (e.g. monthly) so next year's partition exists before April
+    ensure_partitions(engine)
+
+if __name__ == "__main__":
+    partition_ledgers()
@@ -0,0 +1,16 @@
+from config.db import SessionLocal, Base, engine
+from crud.costing import rebuild_all, COSTING_METHOD
+import models.costing_model  # registers the costing tables
+
+def rebuild_cost_layers():
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        count = rebuild_all(db)
+        print(f"Rebuilt {COSTING_METHOD} cost layers from {count} purchase/sale rows")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_cost_layers()
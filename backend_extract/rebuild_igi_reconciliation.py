@@ -0,0 +1,16 @@
+from config.db import SessionLocal, Base, engine
+from crud.igi_reconcile import rebuild_all
+import models.igi_reconcile_model  # registers the reconciliation tables
+
+def rebuild_igi_reconciliation():
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        count = rebuild_all(db)
+        print(f"Rebuilt IGI pending/match tables for {count} items")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_igi_reconciliation()
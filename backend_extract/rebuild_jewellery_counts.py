@@ -0,0 +1,17 @@
+from config.db import SessionLocal, Base, engine, sync_schema
+from crud.jewellery import rebuild_counts
+import models.jewellery_model  # registers the jewellery tables
+
+def rebuild_jewellery_counts():
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+
+    db = SessionLocal()
+    try:
+        rows = rebuild_counts(db)
+        print(f"Rebuilt jewellery status/purity totals from {rows} items and stock entries")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_jewellery_counts()
@@ -0,0 +1,16 @@
+from config.db import SessionLocal, Base, engine
+from crud.ledger import rebuild_all
+import models.ledger_model  # registers the ledger tables
+
+def rebuild_party_ledger():
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        count = rebuild_all(db)
+        print(f"Rebuilt {count} customer/vendor ledger entries")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_party_ledger()
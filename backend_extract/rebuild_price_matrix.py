@@ -0,0 +1,16 @@
+from config.db import SessionLocal, Base, engine
+from crud.pricing import rebuild_all
+import models.pricing_model  # registers the price matrix tables
+
+def rebuild_price_matrix():
+    Base.metadata.create_all(bind=engine)
+
+    db = SessionLocal()
+    try:
+        count = rebuild_all(db)
+        print(f"Rebuilt the price matrix from {count} priced sales/purchase/certified stock rows")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_price_matrix()
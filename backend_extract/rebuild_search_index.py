@@ -0,0 +1,13 @@
+from config.db import SessionLocal
+from crud.fulltext import rebuild
+
+def rebuild_search_index():
+    db = SessionLocal()
+    try:
+        count = rebuild(db)
+        print(f"Indexed {count} rows for /search")
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    rebuild_search_index()
@@ -0,0 +1,23 @@
+import sys
+from config.db import SessionLocal, Base, engine, sync_schema
+from crud.stock_balance import reconcile
+import models.stock_balance_model  # registers the balance table
+
+def reconcile_branch_stock(fix: bool = False):
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+
+    db = SessionLocal()
+    try:
+        mismatches = reconcile(db, fix=fix)
+        for m in mismatches:
+            print(f"{m['branch']} {m['iteam']} {m['shape']} {m['size']}: expected {m['expected']}, found {m['actual']}")
+        status = "fixed" if fix else "found"
+        print(f"{len(mismatches)} mismatched branch balances {status}")
+        return mismatches
+    finally:
+        db.close()
+
+if __name__ == "__main__":
+    mismatches = reconcile_branch_stock(fix="--fix" in sys.argv)
+    sys.exit(1 if mismatches and "--fix" not in sys.argv else 0)
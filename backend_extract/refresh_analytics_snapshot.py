@@ -0,0 +1,10 @@
+from crud.analytics import snapshot
+
+def refresh_analytics_snapshot():
+    counts = snapshot.refresh()
+    for table, count in counts.items():
+        print(f"{table}: {count} rows")
+    print(f"Analytics snapshot written to {snapshot.directory}")
+
+if __name__ == "__main__":
+    refresh_analytics_snapshot()
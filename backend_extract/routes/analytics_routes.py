@@ -0,0 +1,38 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from config.db import get_db
+from config.replicas import get_read_db
+from crud import analytics
+
+router = APIRouter(prefix="/analytics", tags=["Analytics"])
+
+@router.get("/")
+def get_analytics_tables():
+    return {
+        "tables": {
+            name: {"group_by": list(dimensions) + list(analytics.TIME_GRAINS), "metrics": list(measures)}
+            for name, (_, dimensions, measures) in analytics.TABLES.items()
+        },
+        "functions": list(analytics.AGGREGATES),
+        "snapshot_at": analytics.snapshot.taken_at(),
+        "snapshot_age_seconds": analytics.snapshot.age_seconds(),
+    }
+
+@router.get("/{table}")
+def run_analytics(table: str, group_by: Optional[str] = None, metrics: str = "count()",
+                  date_from: Optional[date] = None, date_to: Optional[date] = None,
+                  order_by: Optional[str] = None,
+                  limit: int = Query(default=1000, ge=1, le=analytics.MAX_ROWS),
+                  source: str = Query(default="auto", pattern="^(auto|live|snapshot)$"),
+                  db: Session = Depends(get_read_db)):
+    if table not in analytics.TABLES:
+        raise HTTPException(status_code=404, detail="Unknown analytics table")
+    try:
+        return analytics.run(db, table, group_by, metrics, date_from, date_to, order_by, limit, source)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except LookupError as e:
+        raise HTTPException(status_code=404, detail=str(e))
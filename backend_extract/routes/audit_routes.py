@@ -0,0 +1,25 @@
+import json
+from typing import Optional
+
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.orm import Session
+from config.db import get_db
+from crud import audit
+
+router = APIRouter(prefix="/audit", tags=["Audit"])
+
+@router.get("/")
+def get_audit_log(table: Optional[str] = None, row_id: Optional[int] = None, actor: Optional[str] = None,
+                  limit: int = Query(default=100, ge=1, le=1000), db: Session = Depends(get_db)):
+    return [
+        {
+            "id": entry.id,
+            "table": entry.table_name,
+            "row_id": entry.row_id,
+            "operation": entry.operation,
+            "changes": json.loads(entry.changes) if entry.changes else {},
+            "actor": entry.actor,
+            "changed_at": entry.changed_at,
+        }
+        for entry in audit.get_audit_log(db, table, row_id, actor, limit)
+    ]
@@ -0,0 +1,49 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from config.db import get_db
+from config.replicas import get_read_db
+from crud import certificates
+from schemas.certificate import CertificateOut, CertificateConflictOut, CertificateCheck
+
+router = APIRouter(prefix="/certificates", tags=["Certificates"])
+
+@router.get("/conflicts", response_model=list[CertificateConflictOut])
+def list_conflicts(include_resolved: bool = False, db: Session = Depends(get_read_db)):
+    return certificates.get_conflicts(db, include_resolved)
+
+@router.post("/conflicts/{conflict_id}/resolve", response_model=CertificateConflictOut)
+def resolve_conflict(conflict_id: int, db: Session = Depends(get_db)):
+    conflict = certificates.resolve_conflict(db, conflict_id)
+    if not conflict:
+        raise HTTPException(status_code=404, detail="Conflict not found")
+    return conflict
+
+# Lets a form warn before it submits: would a `source` row with this certificate (dated `on`) conflict?
+@router.get("/check", response_model=CertificateCheck)
+def check_certificate(number: str, source: str, on: Optional[date] = None, db: Session = Depends(get_read_db)):
+    if source not in certificates.SOURCES:
+        raise HTTPException(status_code=400, detail=f"Source must be one of {', '.join(certificates.SOURCES)}")
+    certificate = certificates.get_certificate(db, number)
+    return {
+        "certificate_no": certificates.normalize(number),
+        "state": certificate.state if certificate else None,
+        "conflict": certificates.check(db.connection(), source, number, on),
+    }
+
+@router.get("/{number}", response_model=CertificateOut)
+def get_certificate(number: str, db: Session = Depends(get_read_db)):
+    certificate = certificates.get_certificate(db, number)
+    if not certificate:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+    return {
+        "certificate_no": certificate.certificate_no,
+        "state": certificate.state,
+        "first_date": certificate.first_date,
+        "last_date": certificate.last_date,
+        "events": certificate.events,
+        "history": certificates.get_history(db, number),
+    }
@@ -1,23 +1,58 @@
-from fastapi import APIRouter, Depends, HTTPException
+from typing import List, Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from models.certified_stock_model import CertifiedStockCreate, CertifiedStock
+from models.certified_stock_model import CertifiedStockCreate, CertifiedStock, CertifiedStockSearchResult
 from config.db import get_db
 from models.db_models import CertifiedStock as CertifiedStockModel
+from crud.stone_search import stone_index, search_stones, SORTS
+from crud import certificates
+import crud.fulltext  # registers the write hooks that keep /search in sync
+import crud.audit  # registers the session hooks that write the audit trail
+import crud.change_feed  # registers the session hooks that announce writes on /events
+import crud.dimensions  # registers the hook that keeps the dimension ids in step
+import crud.pricing  # registers the write hooks that keep the price matrix in step
 
 router = APIRouter(prefix="/certified-stock", tags=["Certified Stock"])
 
 @router.post("/", response_model=CertifiedStock)
 def create_certified_stock(entry: CertifiedStockCreate, db: Session = Depends(get_db)):
+    certificates.guard(db, "certified_stock", entry)
     record = CertifiedStockModel(**entry.dict())
     db.add(record)
     db.commit()
     db.refresh(record)
+    stone_index.upsert(record)
     return record
 
 @router.get("/", response_model=list[CertifiedStock])
 def get_all_certified_stock(db: Session = Depends(get_db)):
     return db.query(CertifiedStockModel).all()
 
+@router.get("/search", response_model=CertifiedStockSearchResult)
+def search_certified_stock(
+    shape: List[str] = Query(default=[]),
+    size: List[str] = Query(default=[]),
+    color: List[str] = Query(default=[]),
+    clarity: List[str] = Query(default=[]),
+    lab: List[str] = Query(default=[]),
+    rate_min: Optional[float] = None,
+    rate_max: Optional[float] = None,
+    total_min: Optional[float] = None,
+    total_max: Optional[float] = None,
+    sort: str = "id",
+    offset: int = Query(default=0, ge=0),
+    limit: int = Query(default=50, ge=1, le=500),
+    db: Session = Depends(get_db),
+):
+    descending = sort.startswith("-")
+    sort_field = sort.lstrip("-")
+    if sort_field not in SORTS:
+        raise HTTPException(status_code=400, detail=f"Sort must be one of {', '.join(SORTS)} (prefix '-' for descending)")
+    filters = {"shape": shape, "size": size, "color": color, "clarity": clarity, "lab": lab}
+    ranges = {"rate": (rate_min, rate_max), "total": (total_min, total_max)}
+    return search_stones(db, filters, ranges, sort_field, descending, offset, limit)
+
 @router.get("/{stock_id}", response_model=CertifiedStock)
 def get_certified_stock(stock_id: int, db: Session = Depends(get_db)):
     record = db.query(CertifiedStockModel).filter(CertifiedStockModel.id == stock_id).first()
@@ -30,10 +65,12 @@ def update_certified_stock(stock_id: int, updated: CertifiedStockCreate, db: Ses
     record = db.query(CertifiedStockModel).filter(CertifiedStockModel.id == stock_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Certified stock not found")
+    certificates.guard(db, "certified_stock", updated, stock_id)
     for key, value in updated.dict().items():
         setattr(record, key, value)
     db.commit()
     db.refresh(record)
+    stone_index.upsert(record)
     return record
 
 @router.delete("/{stock_id}")
@@ -43,4 +80,5 @@ def delete_certified_stock(stock_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Certified stock not found")
     db.delete(record)
     db.commit()
+    stone_index.remove(stock_id)
     return {"detail": "Certified stock deleted successfully"}
@@ -0,0 +1,22 @@
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from crud.change_feed import hub, FEED_TABLES
+
+router = APIRouter(prefix="/events", tags=["Events"])
+
+# Server-Sent Events: dashboards keep one connection open and refetch only
+# what a change notification names, instead of polling every list
+@router.get("/")
+async def stream_events(tables: Optional[str] = None, last_event_id: Optional[str] = Header(default=None)):
+    wanted = [table.strip() for table in (tables or "").split(",") if table.strip()]
+    unknown = [table for table in wanted if table not in FEED_TABLES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown table: {', '.join(unknown)}")
+    resume_from = int(last_event_id) if last_event_id and last_event_id.isdigit() else None
+    return StreamingResponse(
+        hub.stream(wanted, resume_from),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
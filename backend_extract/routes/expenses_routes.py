@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from models.expenses_model import ExpenseCreate, Expense
 from config.db import get_db
 from models.db_models import Expense as ExpenseModel
+import crud.change_feed  # registers the session hooks that announce writes on /events
 
 router = APIRouter(prefix="/expenses", tags=["Expenses"])
 
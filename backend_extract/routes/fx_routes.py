@@ -0,0 +1,42 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from config.db import get_db
+from schemas.fx_rate import FxRateCreate, FxRateOut
+from crud import costing, fx, ledger, pricing
+import crud.change_feed  # registers the session hooks that announce writes on /events
+
+router = APIRouter(prefix="/fx-rates", tags=["FX Rates"])
+
+
+def _reconvert(db: Session, currency: str, on):
+    # Rows converted at the changed rate (or waiting for one) are recosted,
+    # reposted and repriced in the same transaction as the rate itself
+    start, end = fx.affected_range(db, currency, on)
+    costing.recost_currency(db, currency, start, end)
+    ledger.repost_currency(db, currency, start, end)
+    pricing.reprice_currency(db, currency, start, end)
+
+@router.post("/", response_model=FxRateOut)
+def set_rate(data: FxRateCreate, db: Session = Depends(get_db)):
+    if data.rate <= 0:
+        raise HTTPException(status_code=400, detail="Rate must be positive")
+    rate = fx.upsert_rate(db, data)
+    _reconvert(db, rate.currency, rate.date)
+    db.commit()
+    db.refresh(rate)
+    return rate
+
+@router.get("/", response_model=list[FxRateOut])
+def list_rates(currency: Optional[str] = None, db: Session = Depends(get_db)):
+    return fx.get_rates(db, currency)
+
+@router.delete("/{rate_id}")
+def delete_rate(rate_id: int, db: Session = Depends(get_db)):
+    rate = fx.delete_rate(db, rate_id)
+    if not rate:
+        raise HTTPException(status_code=404, detail="Rate not found")
+    _reconvert(db, rate.currency, rate.date)
+    db.commit()
+    return {"detail": "Rate deleted successfully"}
@@ -0,0 +1,20 @@
+from fastapi import APIRouter, Response
+
+# readiness is re-exported so main.py starts the instance this router reports on
+from utils.warmup import readiness
+
+router = APIRouter(prefix="/health", tags=["Health"])
+
+# Process is up and serving (for restarts)
+@router.get("/live")
+def live():
+    return {"status": "ok"}
+
+# Warm-up has finished: imports loaded, connection pool filled, caches primed.
+# Load balancers should only route traffic once this answers 200.
+@router.get("/ready")
+def ready(response: Response):
+    report = readiness.report()
+    if not report["ready"]:
+        response.status_code = 503
+    return report
@@ -3,6 +3,8 @@ from sqlalchemy.orm import Session
 from config.db import get_db
 from models.igi_issue_model import IGIIssueCreate, IGIIssue
 from models.db_models import IGIIssue as IGIIssueModel
+from crud import igi_reconcile
+import crud.change_feed  # registers the session hooks that announce writes on /events
 
 router = APIRouter(prefix="/igi-issue", tags=["IGI Issue"])
 
@@ -10,6 +12,8 @@ router = APIRouter(prefix="/igi-issue", tags=["IGI Issue"])
 def create_entry(data: IGIIssueCreate, db: Session = Depends(get_db)):
     entry = IGIIssueModel(**data.dict())
     db.add(entry)
+    db.flush()
+    igi_reconcile.record_issue(db, entry)
     db.commit()
     db.refresh(entry)
     return entry
@@ -30,8 +34,11 @@ def update_entry(issue_id: int, data: IGIIssueCreate, db: Session = Depends(get_
     entry = db.query(IGIIssueModel).filter(IGIIssueModel.id == issue_id).first()
     if not entry:
         raise HTTPException(status_code=404, detail="Record not found")
+    old_key = igi_reconcile.item_key(entry.item)
     for key, value in data.dict().items():
         setattr(entry, key, value)
+    db.flush()
+    igi_reconcile.rebuild_keys(db, [old_key, igi_reconcile.item_key(entry.item)])
     db.commit()
     db.refresh(entry)
     return entry
@@ -42,5 +49,7 @@ def delete_entry(issue_id: int, db: Session = Depends(get_db)):
     if not entry:
         raise HTTPException(status_code=404, detail="Record not found")
     db.delete(entry)
+    db.flush()
+    igi_reconcile.rebuild_keys(db, [igi_reconcile.item_key(entry.item)])
     db.commit()
     return {"detail": "Record deleted successfully"}
@@ -3,6 +3,7 @@ from sqlalchemy.orm import Session
 from config.db import get_db
 from schemas.igi_receive import IGIReceiveCreate, IGIReceiveOut
 import crud.igi_receive as crud
+from crud import change_feed  # registers the session hooks that announce writes on /events
 
 router = APIRouter(
     prefix="/igi-receive",
@@ -0,0 +1,28 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from config.db import get_db
+from schemas.igi_reconcile import IGIPendingOut, IGIMatchOut, IGITurnaround
+from crud import igi_reconcile
+
+router = APIRouter(prefix="/igi-reconciliation", tags=["IGI Reconciliation"])
+
+@router.get("/pending", response_model=list[IGIPendingOut])
+def get_pending_at_lab(item: Optional[str] = None, db: Session = Depends(get_db)):
+    return igi_reconcile.get_pending(db, item)
+
+@router.get("/unmatched", response_model=list[IGIMatchOut])
+def get_unmatched_receives(db: Session = Depends(get_db)):
+    return igi_reconcile.get_unmatched(db)
+
+@router.get("/turnaround", response_model=list[IGITurnaround])
+def get_turnaround(item: Optional[str] = None, db: Session = Depends(get_db)):
+    return igi_reconcile.turnaround_stats(db, item)
+
+@router.get("/certificate/{certificate_no}", response_model=IGIMatchOut)
+def get_certificate(certificate_no: str, db: Session = Depends(get_db)):
+    match = igi_reconcile.get_by_certificate(db, certificate_no)
+    if not match:
+        raise HTTPException(status_code=404, detail="Certificate not found")
+    return match
@@ -1,4 +1,8 @@
-from fastapi import APIRouter
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
+from config.db import get_db
+from config.replicas import get_read_db
+from crud import stock_balance
 
 router = APIRouter(
     prefix="/inventory",
@@ -20,3 +24,15 @@ def get_inventory_summary():
 
     except Exception as e:
         return {"error": str(e)}
+
+
+@router.get("/branches/{branch}")
+def get_branch_stock(branch: str, db: Session = Depends(get_read_db)):
+    balances = stock_balance.get_branch_balances(db, branch)
+    return {
+        "branch": branch,
+        "items": [
+            {"iteam": b.iteam, "shape": b.shape, "size": b.size, "quantity": float(b.quantity)}
+            for b in balances
+        ],
+    }
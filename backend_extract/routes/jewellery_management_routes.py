@@ -1,7 +1,11 @@
-from fastapi import APIRouter
-import pandas as pd
+from fastapi import APIRouter, Depends
+from sqlalchemy.orm import Session
 import os
 
+from config.db import get_db
+from crud import jobs
+import crud.job_handlers  # registers the "jewellery_summary" job
+
 router = APIRouter(
     prefix="/jewellery-management",
     tags=["Jewellery Management"]
@@ -10,19 +14,28 @@ router = APIRouter(
 # Path to your Excel file
 EXCEL_FILE_PATH = os.path.join(os.path.dirname(__file__), '..', 'dashboard_data.xlsx')
 
+def build_jewellery_summary():
+    import pandas as pd  # heavy; only this endpoint and its job need it
+    df = pd.read_excel(EXCEL_FILE_PATH, sheet_name="Sheet1")
+    jewellery_rows = df[df['AREA'].str.contains("jewel", case=False, na=False)]
+
+    return {
+        "total_modules": len(jewellery_rows),
+        "modules": jewellery_rows[['AREA', 'REQUIRED DETAILS']].fillna("").to_dict(orient="records")
+    }
+
 @router.get("/summary")
 def get_jewellery_summary():
     try:
-        df = pd.read_excel(EXCEL_FILE_PATH, sheet_name="Sheet1")
-        jewellery_rows = df[df['AREA'].str.contains("jewel", case=False, na=False)]
-
-        summary = {
-            "total_modules": len(jewellery_rows),
-            "modules": jewellery_rows[['AREA', 'REQUIRED DETAILS']].fillna("").to_dict(orient="records")
-        }
-        return summary
+        return build_jewellery_summary()
 
     except FileNotFoundError:
         return {"error": f"Excel file not found at {EXCEL_FILE_PATH}"}
     except Exception as e:
         return {"error": str(e)}
+
+# Parses the workbook on a background worker; poll /jobs/{job_id} for the result
+@router.post("/summary/jobs")
+def queue_jewellery_summary(db: Session = Depends(get_db)):
+    record = jobs.enqueue(db, "jewellery_summary")
+    return {"job_id": record.id, "status": record.status}
@@ -1,20 +1,34 @@
 # routes/jewellery_routes.py
 
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from config.db import get_db
+from config.replicas import get_read_db
 from crud import jewellery
-from schemas.jewellery import JewelleryItemCreate, JewelleryItemOut, JewelleryItemUpdate
+import crud.change_feed  # registers the session hooks that announce writes on /events
+from schemas.jewellery import (
+    JewelleryItemCreate, JewelleryItemOut, JewelleryItemUpdate, JewelleryStatusChange, JewelleryStatusHistoryOut,
+)
 
 router = APIRouter(prefix="/jewellery", tags=["Jewellery Management"])
 
 @router.post("/", response_model=JewelleryItemOut)
 def create_jewellery_item(data: JewelleryItemCreate, db: Session = Depends(get_db)):
-    return jewellery.create_jewellery(db, data)
+    try:
+        return jewellery.create_jewellery(db, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 @router.get("/", response_model=list[JewelleryItemOut])
-def list_all(db: Session = Depends(get_db)):
-    return jewellery.get_all_jewellery(db)
+def list_all(status: Optional[str] = None, purity: Optional[str] = None, db: Session = Depends(get_db)):
+    return jewellery.get_all_jewellery(db, status, purity)
+
+# Read off the maintained per-status/per-purity totals, not the item tables
+@router.get("/summary")
+def get_summary(db: Session = Depends(get_read_db)):
+    return jewellery.summary(db)
 
 @router.get("/{item_id}", response_model=JewelleryItemOut)
 def get_one(item_id: int, db: Session = Depends(get_db)):
@@ -25,7 +39,27 @@ def get_one(item_id: int, db: Session = Depends(get_db)):
 
 @router.put("/{item_id}", response_model=JewelleryItemOut)
 def update_item(item_id: int, data: JewelleryItemUpdate, db: Session = Depends(get_db)):
-    return jewellery.update_jewellery(db, item_id, data)
+    try:
+        item = jewellery.update_jewellery(db, item_id, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not item:
+        raise HTTPException(status_code=404, detail="Jewellery item not found")
+    return item
+
+@router.post("/{item_id}/status", response_model=JewelleryItemOut)
+def change_status(item_id: int, data: JewelleryStatusChange, db: Session = Depends(get_db)):
+    try:
+        item = jewellery.set_status(db, item_id, data.status, data.remark)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not item:
+        raise HTTPException(status_code=404, detail="Jewellery item not found")
+    return item
+
+@router.get("/{item_id}/history", response_model=list[JewelleryStatusHistoryOut])
+def get_status_history(item_id: int, db: Session = Depends(get_db)):
+    return jewellery.get_history(db, item_id)
 
 @router.delete("/{item_id}")
 def delete_item(item_id: int, db: Session = Depends(get_db)):
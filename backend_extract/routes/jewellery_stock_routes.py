@@ -3,6 +3,9 @@ from sqlalchemy.orm import Session
 from models.jewellery_stock_model import JewelleryStockCreate, JewelleryStock
 from config.db import get_db
 from models.db_models import JewelleryStock as JewelleryStockModel
+from crud import jewellery
+import crud.audit  # registers the session hooks that write the audit trail
+import crud.change_feed  # registers the session hooks that announce writes on /events
 
 router = APIRouter(prefix="/jewellery-stock", tags=["Jewellery Stock"])
 
@@ -10,6 +13,7 @@ router = APIRouter(prefix="/jewellery-stock", tags=["Jewellery Stock"])
 def create_stock(entry: JewelleryStockCreate, db: Session = Depends(get_db)):
     record = JewelleryStockModel(**entry.dict())
     db.add(record)
+    jewellery.apply_stock(db, record)
     db.commit()
     db.refresh(record)
     return record
@@ -30,8 +34,10 @@ def update_stock(stock_id: int, updated: JewelleryStockCreate, db: Session = Dep
     record = db.query(JewelleryStockModel).filter(JewelleryStockModel.id == stock_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Jewellery stock not found")
+    jewellery.apply_stock(db, record, sign=-1)
     for key, value in updated.dict().items():
         setattr(record, key, value)
+    jewellery.apply_stock(db, record)
     db.commit()
     db.refresh(record)
     return record
@@ -41,6 +47,7 @@ def delete_stock(stock_id: int, db: Session = Depends(get_db)):
     record = db.query(JewelleryStockModel).filter(JewelleryStockModel.id == stock_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Jewellery stock not found")
+    jewellery.apply_stock(db, record, sign=-1)
     db.delete(record)
     db.commit()
     return {"detail": "Jewellery stock deleted successfully"}
@@ -0,0 +1,51 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from config.db import get_db
+from dependencies.auth import admin_required
+from models.user_model import User
+from schemas.job import JobCreate, JobOut
+from crud import jobs
+import crud.job_handlers  # registers the built-in job kinds
+
+router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+# Jobs rebuild and rewrite whole tables, so every endpoint here is for admins only
+
+@router.get("/kinds")
+def get_job_kinds(current_user: User = Depends(admin_required)):
+    return sorted(jobs.API_KINDS)
+
+@router.post("/", response_model=JobOut, status_code=202)
+def create_job(entry: JobCreate, current_user: User = Depends(admin_required), db: Session = Depends(get_db)):
+    if entry.kind in jobs.HANDLERS and entry.kind not in jobs.API_KINDS:
+        raise HTTPException(status_code=403, detail=f"Jobs of kind '{entry.kind}' cannot be queued over the API")
+    try:
+        record = jobs.enqueue(db, entry.kind, entry.payload, entry.max_attempts)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return jobs.to_dict(record)
+
+@router.get("/", response_model=list[JobOut])
+def get_jobs(status: Optional[str] = None, kind: Optional[str] = None,
+             limit: int = Query(default=100, ge=1, le=1000), current_user: User = Depends(admin_required),
+             db: Session = Depends(get_db)):
+    return [jobs.to_dict(record) for record in jobs.get_jobs(db, status, kind, limit)]
+
+@router.get("/{job_id}", response_model=JobOut)
+def get_job(job_id: int, current_user: User = Depends(admin_required), db: Session = Depends(get_db)):
+    record = jobs.get_job(db, job_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return jobs.to_dict(record)
+
+@router.post("/{job_id}/retry", response_model=JobOut)
+def retry_job(job_id: int, current_user: User = Depends(admin_required), db: Session = Depends(get_db)):
+    record = jobs.get_job(db, job_id)
+    if not record:
+        raise HTTPException(status_code=404, detail="Job not found")
+    try:
+        return jobs.to_dict(jobs.retry(db, record))
+    except ValueError as e:
+        raise HTTPException(status_code=409, detail=str(e))
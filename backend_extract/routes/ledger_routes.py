@@ -0,0 +1,79 @@
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+
+from config.db import get_db
+from config.replicas import get_read_db
+from crud import idempotency, ledger
+from dependencies.idempotency import idempotency_key
+from schemas.ledger import PaymentCreate, PaymentOut, PartyBalanceOut, PartyStatement, PartyAgeing
+
+router = APIRouter(prefix="/ledger", tags=["Ledger"])
+
+
+def _check_party_type(party_type: str):
+    if party_type not in ledger.PARTY_TYPES:
+        raise HTTPException(status_code=404, detail="Party type must be customer or vendor")
+
+
+@router.post("/payments/", response_model=PaymentOut)
+def create_payment(payment: PaymentCreate, key: Optional[str] = Depends(idempotency_key),
+                   db: Session = Depends(get_db)):
+    if payment.party_type not in ledger.PARTY_TYPES:
+        raise HTTPException(status_code=400, detail="Party type must be customer or vendor")
+    if not payment.party.strip():
+        raise HTTPException(status_code=400, detail="Party is required")
+    if payment.amount <= 0:
+        raise HTTPException(status_code=400, detail="Amount must be positive")
+    replay = idempotency.claim(db, key, "POST /ledger/payments/", payment)
+    if replay is not None:
+        return replay
+    db_payment = ledger.record_payment(db, payment)
+    idempotency.complete(db, key, db_payment, PaymentOut)
+    db.commit()
+    db.refresh(db_payment)
+    return db_payment
+
+@router.get("/payments/", response_model=list[PaymentOut])
+def list_payments(party_type: Optional[str] = None, party: Optional[str] = None,
+                  date_from: Optional[date] = None, date_to: Optional[date] = None,
+                  db: Session = Depends(get_read_db)):
+    return ledger.get_payments(db, party_type, party, date_from, date_to)
+
+@router.delete("/payments/{payment_id}")
+def delete_payment(payment_id: int, db: Session = Depends(get_db)):
+    if not ledger.delete_payment(db, payment_id):
+        raise HTTPException(status_code=404, detail="Payment not found")
+    return {"detail": "Payment deleted successfully"}
+
+@router.get("/{party_type}/balances", response_model=list[PartyBalanceOut])
+def list_balances(party_type: str, include_settled: bool = False, db: Session = Depends(get_read_db)):
+    _check_party_type(party_type)
+    return ledger.get_balances(db, party_type, include_settled)
+
+@router.get("/{party_type}/ageing", response_model=list[PartyAgeing])
+def get_ageing(party_type: str, as_of: Optional[date] = None, db: Session = Depends(get_read_db)):
+    _check_party_type(party_type)
+    return ledger.ageing(db, party_type, as_of)
+
+@router.get("/{party_type}/{party}/balance", response_model=PartyBalanceOut)
+def get_balance(party_type: str, party: str, db: Session = Depends(get_read_db)):
+    _check_party_type(party_type)
+    balance = ledger.get_balance(db, party_type, party)
+    if not balance:
+        raise HTTPException(status_code=404, detail="No ledger entries for this party")
+    return balance
+
+@router.get("/{party_type}/{party}/statement", response_model=PartyStatement)
+def get_statement(party_type: str, party: str, date_from: Optional[date] = None,
+                  date_to: Optional[date] = None, db: Session = Depends(get_read_db)):
+    _check_party_type(party_type)
+    return ledger.statement(db, party_type, party, date_from, date_to)
+
+@router.get("/{party_type}/{party}/ageing", response_model=list[PartyAgeing])
+def get_party_ageing(party_type: str, party: str, as_of: Optional[date] = None,
+                     db: Session = Depends(get_read_db)):
+    _check_party_type(party_type)
+    return ledger.ageing(db, party_type, as_of, party=party)
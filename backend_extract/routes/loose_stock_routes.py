@@ -3,6 +3,10 @@ from sqlalchemy.orm import Session
 from models.loose_stock_model import LooseStockCreate, LooseStock
 from config.db import get_db
 from models.db_models import LooseStock as LooseStockModel
+from crud import stock_balance
+import crud.audit  # registers the session hooks that write the audit trail
+import crud.change_feed  # registers the session hooks that announce writes on /events
+import crud.dimensions  # registers the hook that keeps the dimension ids in step
 
 router = APIRouter(prefix="/loose-stock", tags=["Loose Stock"])
 
@@ -10,6 +14,8 @@ router = APIRouter(prefix="/loose-stock", tags=["Loose Stock"])
 def create_loose_stock(entry: LooseStockCreate, db: Session = Depends(get_db)):
     record = LooseStockModel(**entry.dict())
     db.add(record)
+    db.flush()
+    stock_balance.apply_loose_stock(db, record)
     db.commit()
     db.refresh(record)
     return record
@@ -30,8 +36,10 @@ def update_loose_stock(stock_id: int, updated: LooseStockCreate, db: Session = D
     record = db.query(LooseStockModel).filter(LooseStockModel.id == stock_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Loose stock not found")
+    stock_balance.apply_loose_stock(db, record, sign=-1)
     for key, value in updated.dict().items():
         setattr(record, key, value)
+    stock_balance.apply_loose_stock(db, record)
     db.commit()
     db.refresh(record)
     return record
@@ -41,6 +49,7 @@ def delete_loose_stock(stock_id: int, db: Session = Depends(get_db)):
     record = db.query(LooseStockModel).filter(LooseStockModel.id == stock_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Loose stock not found")
+    stock_balance.apply_loose_stock(db, record, sign=-1)
     db.delete(record)
     db.commit()
     return {"detail": "Loose stock deleted successfully"}
@@ -1,14 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 from config.db import get_db
 from models.memo_take_model import MemoTakeCreate, MemoTake
 from models.db_models import MemoTake as MemoTakeModel
+from schemas.memo import MemoEventCreate, MemoEventOut, MemoOutstanding, MemoAgeing
+from crud import memo as memo_crud
+from crud import certificates
+import crud.change_feed  # registers the session hooks that announce writes on /events
+from dependencies.concurrency import if_match_version, etag, check_version, conflict_on_stale
 
 router = APIRouter(prefix="/memo-take", tags=["Memo Take"])
 
 @router.post("/", response_model=MemoTake)
 def create_memo(entry: MemoTakeCreate, db: Session = Depends(get_db)):
+    certificates.guard(db, "memo_take", entry)
     record = MemoTakeModel(**entry.dict())
+    memo_crud.init_memo(record)
     db.add(record)
     db.commit()
     db.refresh(record)
@@ -18,29 +28,78 @@ def create_memo(entry: MemoTakeCreate, db: Session = Depends(get_db)):
 def get_all_memos(db: Session = Depends(get_db)):
     return db.query(MemoTakeModel).all()
 
+@router.get("/open", response_model=list[MemoTake])
+def get_open_memos(client_name: Optional[str] = None, db: Session = Depends(get_db)):
+    return memo_crud.get_open_memos(db, MemoTakeModel, client_name)
+
+@router.get("/outstanding", response_model=list[MemoOutstanding])
+def get_outstanding_by_client(db: Session = Depends(get_db)):
+    return memo_crud.outstanding_by_client(db, MemoTakeModel)
+
+@router.get("/ageing", response_model=list[MemoAgeing])
+def get_memo_ageing(as_of: Optional[date] = None, db: Session = Depends(get_db)):
+    return memo_crud.ageing_by_client(db, MemoTakeModel, as_of)
+
 @router.get("/{memo_id}", response_model=MemoTake)
-def get_memo(memo_id: int, db: Session = Depends(get_db)):
+def get_memo(memo_id: int, response: Response, db: Session = Depends(get_db)):
     record = db.query(MemoTakeModel).filter(MemoTakeModel.id == memo_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Memo not found")
+    response.headers["ETag"] = etag(record)
     return record
 
 @router.put("/{memo_id}", response_model=MemoTake)
-def update_memo(memo_id: int, updated: MemoTakeCreate, db: Session = Depends(get_db)):
+def update_memo(memo_id: int, updated: MemoTakeCreate, response: Response,
+                expected_version: Optional[int] = Depends(if_match_version), db: Session = Depends(get_db)):
     record = db.query(MemoTakeModel).filter(MemoTakeModel.id == memo_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Memo not found")
+    check_version(record, expected_version)
+    certificates.guard(db, "memo_take", updated, memo_id)
     for key, value in updated.dict().items():
         setattr(record, key, value)
-    db.commit()
+    memo_crud.refresh_status(record)
+    with conflict_on_stale(db):
+        db.commit()
     db.refresh(record)
+    response.headers["ETag"] = etag(record)
     return record
 
 @router.delete("/{memo_id}")
-def delete_memo(memo_id: int, db: Session = Depends(get_db)):
+def delete_memo(memo_id: int, expected_version: Optional[int] = Depends(if_match_version),
+                db: Session = Depends(get_db)):
     record = db.query(MemoTakeModel).filter(MemoTakeModel.id == memo_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Memo not found")
+    check_version(record, expected_version)
+    memo_crud.delete_events(db, "take", memo_id)
     db.delete(record)
     db.commit()
     return {"detail": "Memo deleted successfully"}
+
+
+def _add_memo_event(memo_id: int, event_type: str, data: MemoEventCreate, expected_version, db: Session):
+    record = db.query(MemoTakeModel).filter(MemoTakeModel.id == memo_id).first()
+    if not record:
+        raise HTTPException(status_code=404, detail="Memo not found")
+    check_version(record, expected_version)
+    try:
+        # Two counters settling the same memo at once cannot both pass the outstanding check
+        with conflict_on_stale(db):
+            return memo_crud.add_event(db, "take", record, event_type, data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@router.post("/{memo_id}/return", response_model=MemoEventOut)
+def return_memo(memo_id: int, data: MemoEventCreate, expected_version: Optional[int] = Depends(if_match_version),
+                db: Session = Depends(get_db)):
+    return _add_memo_event(memo_id, memo_crud.EVENT_RETURN, data, expected_version, db)
+
+@router.post("/{memo_id}/convert", response_model=MemoEventOut)
+def convert_memo(memo_id: int, data: MemoEventCreate, expected_version: Optional[int] = Depends(if_match_version),
+                 db: Session = Depends(get_db)):
+    return _add_memo_event(memo_id, memo_crud.EVENT_CONVERT, data, expected_version, db)
+
+@router.get("/{memo_id}/events", response_model=list[MemoEventOut])
+def get_memo_events(memo_id: int, db: Session = Depends(get_db)):
+    return memo_crud.get_events(db, "take", memo_id)
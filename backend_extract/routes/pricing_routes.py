@@ -0,0 +1,33 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+
+from config.replicas import get_read_db
+from crud import pricing
+from schemas.pricing import StoneQuery, PriceLookup, PriceMatrixCell
+
+router = APIRouter(prefix="/pricing", tags=["Pricing"])
+
+# Largest batch POST /pricing/lookup/batch accepts
+MAX_BATCH = 1000
+PERIOD = r"^\d{4}-\d{2}$"
+
+@router.get("/lookup", response_model=PriceLookup)
+def lookup_price(shape: Optional[str] = None, size: Optional[str] = None, color: Optional[str] = None,
+                 clarity: Optional[str] = None, period: Optional[str] = Query(default=None, pattern=PERIOD),
+                 db: Session = Depends(get_read_db)):
+    return pricing.lookup(db, shape, size, color, clarity, period)
+
+@router.post("/lookup/batch", response_model=list[PriceLookup])
+def lookup_prices(stones: list[StoneQuery], db: Session = Depends(get_read_db)):
+    if len(stones) > MAX_BATCH:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH} stones per request")
+    return pricing.lookup_many(db, stones)
+
+@router.get("/matrix", response_model=list[PriceMatrixCell])
+def get_price_matrix(period: str = Query(pattern=PERIOD), side: str = "buy", shape: Optional[str] = None,
+                     db: Session = Depends(get_read_db)):
+    if side not in pricing.SIDES:
+        raise HTTPException(status_code=400, detail="Side must be buy or sell")
+    return pricing.get_matrix(db, side, period, shape)
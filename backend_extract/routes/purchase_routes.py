@@ -1,26 +1,50 @@
+from datetime import date
+from typing import Optional
+
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from models.purchase_model import PurchaseCreate, Purchase
-from config.db import get_db
+from config.db import get_db
+from config.replicas import get_read_db
 from models.db_models import Purchase as PurchaseModel
+from crud import archive, certificates, costing, idempotency, ledger
+import crud.fulltext  # registers the write hooks that keep /search in sync
+import crud.audit  # registers the session hooks that write the audit trail
+import crud.change_feed  # registers the session hooks that announce writes on /events
+import crud.dimensions  # registers the hook that keeps the dimension ids in step
+import crud.pricing  # registers the write hooks that keep the price matrix in step
+from dependencies.idempotency import idempotency_key
 
 router = APIRouter(prefix="/purchase", tags=["Purchase"])
 
 @router.post("/", response_model=Purchase)
-def create_purchase(purchase: PurchaseCreate, db: Session = Depends(get_db)):
+def create_purchase(purchase: PurchaseCreate, key: Optional[str] = Depends(idempotency_key),
+                    db: Session = Depends(get_db)):
+    if archive.is_archived(db, PurchaseModel, purchase.date):
+        raise HTTPException(status_code=409, detail="Purchase date falls in an archived fiscal year")
+    replay = idempotency.claim(db, key, "POST /purchase/", purchase)
+    if replay is not None:
+        return replay
+    certificates.guard(db, "purchase", purchase)
     db_purchase = PurchaseModel(**purchase.dict())
     db.add(db_purchase)
+    db.flush()
+    costing.post_purchase(db, db_purchase)
+    ledger.post(db, "purchase", db_purchase)
+    idempotency.complete(db, key, db_purchase, Purchase)
     db.commit()
     db.refresh(db_purchase)
     return db_purchase
 
 @router.get("/", response_model=list[Purchase])
-def get_all_purchases(db: Session = Depends(get_db)):
-    return db.query(PurchaseModel).all()
+def get_all_purchases(date_from: Optional[date] = None, date_to: Optional[date] = None,
+                      db: Session = Depends(get_read_db)):
+    return archive.list_rows(db, PurchaseModel, date_from, date_to)
 
 @router.get("/{purchase_id}", response_model=Purchase)
-def get_purchase(purchase_id: int, db: Session = Depends(get_db)):
-    purchase = db.query(PurchaseModel).filter(PurchaseModel.id == purchase_id).first()
+def get_purchase(purchase_id: int, db: Session = Depends(get_read_db)):
+    purchase = db.query(PurchaseModel).filter(PurchaseModel.id == purchase_id).first() \
+        or archive.get_archived_row(db, PurchaseModel, purchase_id)
     if not purchase:
         raise HTTPException(status_code=404, detail="Purchase not found")
     return purchase
@@ -29,9 +53,18 @@ def get_purchase(purchase_id: int, db: Session = Depends(get_db)):
 def update_purchase(purchase_id: int, updated: PurchaseCreate, db: Session = Depends(get_db)):
     purchase = db.query(PurchaseModel).filter(PurchaseModel.id == purchase_id).first()
     if not purchase:
+        if archive.get_archived_row(db, PurchaseModel, purchase_id):
+            raise HTTPException(status_code=409, detail="Purchase belongs to an archived fiscal year")
         raise HTTPException(status_code=404, detail="Purchase not found")
+    if archive.is_archived(db, PurchaseModel, updated.date):
+        raise HTTPException(status_code=409, detail="Purchase date falls in an archived fiscal year")
+    certificates.guard(db, "purchase", updated, purchase_id)
+    old_cost_key = costing.key_for(purchase)
     for key, value in updated.dict().items():
         setattr(purchase, key, value)
+    db.flush()
+    costing.rebuild_keys(db, [old_cost_key, costing.key_for(purchase)])
+    ledger.repost(db, "purchase", purchase)
     db.commit()
     db.refresh(purchase)
     return purchase
@@ -40,7 +73,13 @@ def update_purchase(purchase_id: int, updated: PurchaseCreate, db: Session = Dep
 def delete_purchase(purchase_id: int, db: Session = Depends(get_db)):
     purchase = db.query(PurchaseModel).filter(PurchaseModel.id == purchase_id).first()
     if not purchase:
+        if archive.get_archived_row(db, PurchaseModel, purchase_id):
+            raise HTTPException(status_code=409, detail="Purchase belongs to an archived fiscal year")
         raise HTTPException(status_code=404, detail="Purchase not found")
+    cost_key = costing.key_for(purchase)
+    ledger.unpost(db, "purchase", purchase.id)
     db.delete(purchase)
+    db.flush()
+    costing.rebuild_keys(db, [cost_key])
     db.commit()
     return {"detail": "Purchase deleted successfully"}
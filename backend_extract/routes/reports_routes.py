@@ -1,4 +1,12 @@
-from fastapi import APIRouter
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from config.db import get_db
+from config.replicas import get_read_db
+from crud import costing, fx
+from models.db_models import Sales, Purchase, Expense, CertifiedStock
 
 router = APIRouter(
     prefix="/reports",
@@ -6,26 +14,71 @@ router = APIRouter(
 )
 
 @router.get("/summary")
-def get_report_summary():
+def get_report_summary(db: Session = Depends(get_read_db)):
     try:
-        # Example static report data (can be replaced with real-time aggregation later)
+        # All amounts are in fx.BASE_CURRENCY, converted inside each grouped query
+        sales = fx.totals_in_base(db, Sales, Sales.total)
+        purchases = fx.totals_in_base(db, Purchase, Purchase.total)
+        top_item = fx.totals_in_base(db, Sales, Sales.total, Sales.iteam, limit=1)
+        top_vendor = fx.totals_in_base(db, Purchase, Purchase.total, Purchase.vendor, limit=1)
+        expenses = fx.totals_in_base(db, Expense, Expense.total)
+        top_party = fx.totals_in_base(db, Expense, Expense.total, Expense.party, limit=1)
+        certified = fx.totals_in_base(db, CertifiedStock, CertifiedStock.total)
         summary = {
+            "base_currency": fx.BASE_CURRENCY,
             "sales_report": {
-                "total_sales": 152,
-                "total_amount": 1250000,
-                "top_selling_item": "Gold Ring"
+                "total_sales": sales["count"],
+                "total_amount": sales["total"],
+                "top_selling_item": top_item[0]["group"] if top_item else None,
+                "unconverted_rows": sales["unconverted_rows"]
             },
             "purchase_report": {
-                "total_purchases": 97,
-                "total_spent": 880000,
-                "top_vendor": "Rajasthan Gold Traders"
+                "total_purchases": purchases["count"],
+                "total_spent": purchases["total"],
+                "top_vendor": top_vendor[0]["group"] if top_vendor else None,
+                "unconverted_rows": purchases["unconverted_rows"]
+            },
+            "expense_report": {
+                "total_expenses": expenses["count"],
+                "total_amount": expenses["total"],
+                "top_party": top_party[0]["group"] if top_party else None,
+                "unconverted_rows": expenses["unconverted_rows"]
+            },
+            "certified_stock_report": {
+                "total_stones": certified["count"],
+                "total_value": certified["total"],
+                "unconverted_rows": certified["unconverted_rows"]
             },
-            "profit": {
-                "gross_profit": 370000,
-                "margin_percent": 29.6
-            }
+            "profit": costing.profit_totals(db)
         }
         return summary
 
     except Exception as e:
         return {"error": str(e)}
+
+@router.get("/cogs/{sale_id}")
+def get_sale_cogs(sale_id: int, db: Session = Depends(get_read_db)):
+    sale_cost = costing.get_sale_cost(db, sale_id)
+    if not sale_cost:
+        raise HTTPException(status_code=404, detail="No cost recorded for this sale")
+    return {
+        "sale_id": sale_cost.sale_id,
+        "cost_key": sale_cost.cost_key,
+        "qty": sale_cost.qty,
+        "unmatched_qty": sale_cost.unmatched_qty,
+        "revenue": float(sale_cost.revenue),
+        "cogs": float(sale_cost.cogs),
+        "margin": float(sale_cost.revenue - sale_cost.cogs),
+        "unconverted": sale_cost.unconverted,
+    }
+
+@router.get("/margin")
+def get_margin(by: str = "iteam", date_from: Optional[date] = None, date_to: Optional[date] = None,
+               db: Session = Depends(get_read_db)):
+    if by not in ("iteam", "customer"):
+        raise HTTPException(status_code=400, detail="Margin can be grouped by 'iteam' or 'customer'")
+    return costing.margin_by(db, by, date_from, date_to)
+
+@router.get("/closing-stock")
+def get_closing_stock(db: Session = Depends(get_read_db)):
+    return costing.closing_stock(db)
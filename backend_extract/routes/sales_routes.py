@@ -1,47 +1,88 @@
-from fastapi import APIRouter, Depends, HTTPException
+from datetime import date
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Response
 from sqlalchemy.orm import Session
 
 from models.sales_model import SalesCreate, Sales
-from config.db import get_db
+from config.db import get_db
+from config.replicas import get_read_db
 from models.db_models import Sales as SalesModel
+from crud import archive, certificates, costing, idempotency, ledger, stock_balance
+import crud.fulltext  # registers the write hooks that keep /search in sync
+import crud.audit  # registers the session hooks that write the audit trail
+import crud.change_feed  # registers the session hooks that announce writes on /events
+import crud.dimensions  # registers the hook that keeps the dimension ids in step
+import crud.pricing  # registers the write hooks that keep the price matrix in step
 
 from dependencies.auth import get_current_user
+from dependencies.concurrency import if_match_version, etag, check_version, conflict_on_stale
+from dependencies.idempotency import idempotency_key
 from models.user_model import User
 
 router = APIRouter(prefix="/sales", tags=["Sales"])
 
 # Create sale
 @router.post("/", response_model=Sales)
-def create_sale(sale: SalesCreate, db: Session = Depends(get_db)):
+def create_sale(sale: SalesCreate, key: Optional[str] = Depends(idempotency_key), db: Session = Depends(get_db)):
+    if archive.is_archived(db, SalesModel, sale.date):
+        raise HTTPException(status_code=409, detail="Sale date falls in an archived fiscal year")
+    # A POS retry carrying the same Idempotency-Key gets the first response back
+    replay = idempotency.claim(db, key, "POST /sales/", sale)
+    if replay is not None:
+        return replay
+    certificates.guard(db, "sales", sale)
     db_sale = SalesModel(**sale.dict())
     db.add(db_sale)
+    db.flush()
+    costing.post_sale(db, db_sale)
+    stock_balance.apply_sale(db, db_sale)
+    ledger.post(db, "sales", db_sale)
+    idempotency.complete(db, key, db_sale, Sales)
     db.commit()
     db.refresh(db_sale)
     return db_sale
 
 # Get all sales
 @router.get("/", response_model=list[Sales])
-def get_sales(db: Session = Depends(get_db)):
-    return db.query(SalesModel).all()
+def get_sales(date_from: Optional[date] = None, date_to: Optional[date] = None, db: Session = Depends(get_read_db)):
+    return archive.list_rows(db, SalesModel, date_from, date_to)
 
 # Get sale by ID
 @router.get("/{sale_id}", response_model=Sales)
-def get_sale(sale_id: int, db: Session = Depends(get_db)):
-    sale = db.query(SalesModel).filter(SalesModel.id == sale_id).first()
+def get_sale(sale_id: int, response: Response, db: Session = Depends(get_read_db)):
+    sale = db.query(SalesModel).filter(SalesModel.id == sale_id).first() \
+        or archive.get_archived_row(db, SalesModel, sale_id)
     if not sale:
         raise HTTPException(status_code=404, detail="Sale not found")
+    response.headers["ETag"] = etag(sale)
     return sale
 
 # Update sale
 @router.put("/{sale_id}", response_model=Sales)
-def update_sale(sale_id: int, updated: SalesCreate, db: Session = Depends(get_db)):
+def update_sale(sale_id: int, updated: SalesCreate, response: Response,
+                expected_version: Optional[int] = Depends(if_match_version), db: Session = Depends(get_db)):
     db_sale = db.query(SalesModel).filter(SalesModel.id == sale_id).first()
     if not db_sale:
+        if archive.get_archived_row(db, SalesModel, sale_id):
+            raise HTTPException(status_code=409, detail="Sale belongs to an archived fiscal year")
         raise HTTPException(status_code=404, detail="Sale not found")
-    for key, value in updated.dict().items():
-        setattr(db_sale, key, value)
-    db.commit()
+    if archive.is_archived(db, SalesModel, updated.date):
+        raise HTTPException(status_code=409, detail="Sale date falls in an archived fiscal year")
+    check_version(db_sale, expected_version)
+    certificates.guard(db, "sales", updated, sale_id)
+    old_cost_key = costing.key_for(db_sale)
+    with conflict_on_stale(db):
+        stock_balance.apply_sale(db, db_sale, sign=-1)
+        for key, value in updated.dict().items():
+            setattr(db_sale, key, value)
+        db.flush()
+        stock_balance.apply_sale(db, db_sale)
+        costing.rebuild_keys(db, [old_cost_key, costing.key_for(db_sale)])
+        ledger.repost(db, "sales", db_sale)
+        db.commit()
     db.refresh(db_sale)
+    response.headers["ETag"] = etag(db_sale)
     return db_sale
 
 # Protected summary
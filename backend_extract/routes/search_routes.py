@@ -0,0 +1,16 @@
+from typing import List
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy.orm import Session
+from config.db import get_db
+from crud import fulltext
+
+router = APIRouter(prefix="/search", tags=["Search"])
+
+@router.get("/")
+def search(q: str, entity: List[str] = Query(default=[]), limit: int = Query(default=20, ge=1, le=100),
+           db: Session = Depends(get_db)):
+    unknown = [e for e in entity if e not in fulltext.ENTITIES]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown entity: {', '.join(unknown)}")
+    return fulltext.search(db, q, entity or None, limit)
@@ -0,0 +1,16 @@
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import FileResponse
+from crud import parquet_export
+
+router = APIRouter(prefix="/snapshots", tags=["Snapshots"])
+
+@router.get("/")
+def get_snapshot_manifest():
+    return parquet_export.load_manifest()
+
+@router.get("/{table}/{month}/{file_name}")
+def download_snapshot_file(table: str, month: str, file_name: str):
+    path = parquet_export.snapshot_file(table, month, file_name)
+    if not path:
+        raise HTTPException(status_code=404, detail="Snapshot file not found")
+    return FileResponse(path, media_type="application/vnd.apache.parquet", filename=f"{table}-{month}-{file_name}")
@@ -3,6 +3,10 @@ from sqlalchemy.orm import Session
 from models.stock_transfer_model import StockTransferCreate, StockTransfer
 from config.db import get_db
 from models.db_models import StockTransfer as StockTransferModel
+from crud import stock_balance
+import crud.audit  # registers the session hooks that write the audit trail
+import crud.change_feed  # registers the session hooks that announce writes on /events
+import crud.dimensions  # registers the hook that keeps the dimension ids in step
 
 router = APIRouter(prefix="/stock-transfer", tags=["Stock Transfer"])
 
@@ -10,6 +14,8 @@ router = APIRouter(prefix="/stock-transfer", tags=["Stock Transfer"])
 def create_stock_transfer(entry: StockTransferCreate, db: Session = Depends(get_db)):
     record = StockTransferModel(**entry.dict())
     db.add(record)
+    db.flush()
+    stock_balance.apply_transfer(db, record)
     db.commit()
     db.refresh(record)
     return record
@@ -30,8 +36,10 @@ def update_stock_transfer(transfer_id: int, updated: StockTransferCreate, db: Se
     record = db.query(StockTransferModel).filter(StockTransferModel.id == transfer_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Stock transfer not found")
+    stock_balance.apply_transfer(db, record, sign=-1)
     for key, value in updated.dict().items():
         setattr(record, key, value)
+    stock_balance.apply_transfer(db, record)
     db.commit()
     db.refresh(record)
     return record
@@ -41,6 +49,7 @@ def delete_stock_transfer(transfer_id: int, db: Session = Depends(get_db)):
     record = db.query(StockTransferModel).filter(StockTransferModel.id == transfer_id).first()
     if not record:
         raise HTTPException(status_code=404, detail="Stock transfer not found")
+    stock_balance.apply_transfer(db, record, sign=-1)
     db.delete(record)
     db.commit()
     return {"detail": "Stock transfer deleted successfully"}
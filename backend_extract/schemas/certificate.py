@@ -0,0 +1,38 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date, datetime
+
+class CertificateEventOut(BaseModel):
+    source: str
+    source_id: int
+    date: date
+    state: str
+
+    class Config:
+        orm_mode = True
+
+class CertificateOut(BaseModel):
+    certificate_no: str
+    state: str
+    first_date: Optional[date]
+    last_date: Optional[date]
+    events: int
+    history: list[CertificateEventOut] = []
+
+class CertificateConflictOut(BaseModel):
+    id: int
+    certificate_no: str
+    source: str
+    source_id: int
+    conflicting_source: str
+    conflicting_id: int
+    detected_at: datetime
+    resolved: bool
+
+    class Config:
+        orm_mode = True
+
+class CertificateCheck(BaseModel):
+    certificate_no: str
+    state: Optional[str]
+    conflict: Optional[CertificateEventOut]
@@ -0,0 +1,13 @@
+from pydantic import BaseModel
+from datetime import date
+
+class FxRateCreate(BaseModel):
+    currency: str
+    date: date
+    rate: float
+
+class FxRateOut(FxRateCreate):
+    id: int
+
+    class Config:
+        orm_mode = True
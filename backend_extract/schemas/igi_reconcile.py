@@ -0,0 +1,33 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date
+
+class IGIPendingOut(BaseModel):
+    issue_id: int
+    item_key: str
+    issue_date: date
+    pcs_issued: int
+    pcs_received: int
+    pcs_pending: int
+    last_receive_date: Optional[date]
+
+    class Config:
+        orm_mode = True
+
+class IGIMatchOut(BaseModel):
+    receive_id: int
+    issue_id: Optional[int]
+    item_key: str
+    certificate_no: Optional[str]
+    receive_date: date
+    turnaround_days: Optional[int]
+
+    class Config:
+        orm_mode = True
+
+class IGITurnaround(BaseModel):
+    item: str
+    stones: int
+    avg_days: Optional[float]
+    min_days: Optional[int]
+    max_days: Optional[int]
@@ -2,7 +2,7 @@
 
 from pydantic import BaseModel
 from typing import Optional
-from datetime import date
+from datetime import date, datetime
 
 class JewelleryItemBase(BaseModel):
     item_code: str
@@ -24,3 +24,19 @@ class JewelleryItemOut(JewelleryItemBase):
 
     class Config:
         orm_mode = True
+
+class JewelleryStatusChange(BaseModel):
+    status: str
+    remark: Optional[str] = None
+
+class JewelleryStatusHistoryOut(BaseModel):
+    id: int
+    item_id: int
+    from_status: Optional[str]
+    to_status: str
+    changed_at: datetime
+    changed_by: Optional[str]
+    remark: Optional[str]
+
+    class Config:
+        orm_mode = True
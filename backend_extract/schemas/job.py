@@ -0,0 +1,47 @@
+from pydantic import BaseModel, field_validator
+from typing import Any, Optional
+from datetime import datetime
+
+class JobCreate(BaseModel):
+    kind: str
+    payload: dict = {}
+    max_attempts: Optional[int] = None  # 3, or 1 for kinds that are not safe to re-run
+
+# Job payloads, one model per shape; unknown keys are refused rather than ignored
+class NoPayload(BaseModel):
+    class Config:
+        extra = "forbid"
+
+class FullPayload(NoPayload):
+    full: bool = False  # redo every row, not only the ones still missing
+
+class ReconcilePayload(NoPayload):
+    fix: bool = False  # overwrite mismatching balances with the recomputed ones
+
+class ExportPayload(FullPayload):
+    tables: Optional[list[str]] = None  # every exported table when omitted
+
+    @field_validator("tables")
+    @classmethod
+    def known_tables(cls, tables):
+        from crud.parquet_export import EXPORT_TABLES
+        unknown = [table for table in tables or [] if table not in EXPORT_TABLES]
+        if unknown:
+            raise ValueError(f"unknown tables {', '.join(unknown)}; expected some of {', '.join(EXPORT_TABLES)}")
+        return tables
+
+class JobOut(BaseModel):
+    id: int
+    kind: str
+    status: str
+    payload: Optional[Any] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
+    progress: Optional[float] = None
+    message: Optional[str] = None
+    attempts: int
+    max_attempts: int
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    heartbeat_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
@@ -0,0 +1,61 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date
+
+class PaymentCreate(BaseModel):
+    date: date
+    party_type: str  # "customer" or "vendor"
+    party: str
+    amount: float
+    currency: Optional[str] = None
+    pay_mode: Optional[str] = None
+    reference: Optional[str] = None
+    remark: Optional[str] = None
+
+class PaymentOut(PaymentCreate):
+    id: int
+
+    class Config:
+        orm_mode = True
+
+class LedgerEntryOut(BaseModel):
+    id: int
+    date: date
+    due_date: Optional[date]
+    kind: str
+    source: str
+    source_id: int
+    reference: Optional[str]
+    amount: float
+    balance: float
+    unconverted: bool = False
+
+    class Config:
+        orm_mode = True
+
+class PartyBalanceOut(BaseModel):
+    party_type: str
+    party: str
+    balance: float
+    last_date: Optional[date]
+    unconverted: int = 0
+
+    class Config:
+        orm_mode = True
+
+class PartyStatement(BaseModel):
+    party_type: str
+    party: str
+    currency: str
+    opening_balance: float
+    closing_balance: float
+    entries: list[LedgerEntryOut]
+
+class PartyAgeing(BaseModel):
+    party: str
+    not_due: float
+    days_1_30: float
+    days_31_60: float
+    days_61_90: float
+    days_over_90: float
+    total: float
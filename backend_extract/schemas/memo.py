@@ -0,0 +1,31 @@
+from pydantic import BaseModel
+from typing import Optional
+from datetime import date
+
+class MemoEventCreate(BaseModel):
+    date: date
+    amount: float
+    sale_id: Optional[int] = None
+    remark: Optional[str] = None
+
+class MemoEventOut(MemoEventCreate):
+    id: int
+    memo_type: str
+    memo_id: int
+    event_type: str
+
+    class Config:
+        orm_mode = True
+
+class MemoOutstanding(BaseModel):
+    client_name: Optional[str]
+    memos: int
+    outstanding_amount: float
+
+class MemoAgeing(BaseModel):
+    client_name: Optional[str]
+    days_0_30: float
+    days_31_60: float
+    days_61_90: float
+    days_over_90: float
+    total: float
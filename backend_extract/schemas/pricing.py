@@ -0,0 +1,34 @@
+from pydantic import BaseModel
+from typing import Optional
+
+class StoneQuery(BaseModel):
+    shape: Optional[str] = None
+    size: Optional[str] = None
+    color: Optional[str] = None
+    clarity: Optional[str] = None
+    period: Optional[str] = None  # "YYYY-MM"; latest month with prices when blank
+
+class PriceCellOut(BaseModel):
+    period: str
+    count: int
+    min_rate: float
+    median_rate: float
+    max_rate: float
+
+class PriceLookup(BaseModel):
+    shape: str
+    size_band: str
+    color: str
+    clarity: str
+    buy: Optional[PriceCellOut]
+    sell: Optional[PriceCellOut]
+
+class PriceMatrixCell(PriceCellOut):
+    side: str
+    shape: str
+    size_band: str
+    color: str
+    clarity: str
+
+    class Config:
+        orm_mode = True
@@ -0,0 +1,138 @@
+"""
+Production entry point: N worker processes behind one listening socket.
+
+    python -m backend_extract.serve --workers 8 --port 8000
+
+With gunicorn installed the app is imported once in the master (preload),
+so migrations run a single time and workers share the imported code
+copy-on-write; `kill -HUP <master>` replaces workers one by one while the
+old ones finish their in-flight requests. Without gunicorn, uvicorn's own
+supervisor runs the workers (SIGHUP restarts them one at a time, each
+draining for --graceful-timeout); migrations still run once here first.
+
+Every worker gets DB_CONNECTION_BUDGET // workers database connections; the
+server refuses to start when that leaves a worker fewer than
+MIN_POOL_SIZE.
+"""
+import argparse
+import os
+
+DEFAULT_WORKERS = int(os.getenv("WEB_CONCURRENCY", str(os.cpu_count() or 1)))
+# Connections the database allows this server in total (Postgres max_connections minus headroom)
+DB_CONNECTION_BUDGET = int(os.getenv("DB_CONNECTION_BUDGET", "80"))
+# A worker needs one connection for requests and one for its background threads
+MIN_POOL_SIZE = 2
+
+APP = "backend_extract.main:app"
+
+
+def size_pools(workers: int, budget: int = DB_CONNECTION_BUDGET):
+    """Give each worker an equal, fixed share of the connection budget (no overflow past it)."""
+    per_worker = budget // workers
+    if per_worker < MIN_POOL_SIZE:
+        # Rounding the share up would open more connections than the database allows
+        raise ValueError(
+            f"{workers} workers need at least {workers * MIN_POOL_SIZE} database connections but "
+            f"DB_CONNECTION_BUDGET is {budget}; use at most {budget // MIN_POOL_SIZE} workers or raise the budget"
+        )
+    os.environ["DB_POOL_SIZE"] = str(per_worker)
+    os.environ["DB_MAX_OVERFLOW"] = "0"
+    return per_worker
+
+
+def migrate():
+    """Create missing tables and columns once, before any worker starts."""
+    os.environ["SKIP_MIGRATIONS"] = "1"
+    import backend_extract.main  # noqa: F401  (registers every router's models)
+    from config.db import Base, engine, sync_schema
+    from crud import dimensions
+    Base.metadata.create_all(bind=engine)
+    sync_schema(engine)
+    dimensions.migrate(engine)
+
+
+def _post_fork(server, worker):
+    # Connections opened by the master during preload must not be shared with the children
+    import config.db
+    from config.replicas import router
+    for engine in (config.db.engine, *router.replicas):
+        engine.dispose(close=False)
+
+
+def run_gunicorn(args):
+    from gunicorn.app.base import BaseApplication
+
+    try:
+        import uvicorn_worker  # noqa: F401
+        worker_class = "uvicorn_worker.UvicornWorker"
+    except ImportError:
+        worker_class = "uvicorn.workers.UvicornWorker"
+
+    class Server(BaseApplication):
+        def load_config(self):
+            self.cfg.set("bind", f"{args.host}:{args.port}")
+            self.cfg.set("workers", args.workers)
+            self.cfg.set("worker_class", worker_class)
+            self.cfg.set("preload_app", True)
+            self.cfg.set("graceful_timeout", args.graceful_timeout)
+            self.cfg.set("timeout", args.timeout)
+            self.cfg.set("keepalive", 5)
+            # Recycling workers now and then bounds slow leaks without a full restart
+            self.cfg.set("max_requests", args.max_requests)
+            self.cfg.set("max_requests_jitter", args.max_requests // 10)
+            self.cfg.set("post_fork", _post_fork)
+
+        def load(self):
+            from backend_extract.main import app
+            return app
+
+    Server().run()
+
+
+def run_uvicorn(args):
+    import uvicorn
+
+    uvicorn.run(
+        APP,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        timeout_graceful_shutdown=args.graceful_timeout,
+        limit_max_requests=args.max_requests or None,
+        proxy_headers=True,
+    )
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the API with several worker processes")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS)
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=int(os.getenv("PORT", "8000")))
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    parser.add_argument("--timeout", type=int, default=120)
+    parser.add_argument("--max-requests", type=int, default=10000)
+    parser.add_argument("--server", choices=("auto", "gunicorn", "uvicorn"), default="auto")
+    args = parser.parse_args(argv)
+
+    try:
+        per_worker = size_pools(args.workers)
+    except ValueError as e:
+        parser.error(str(e))
+    print(f"Starting {args.workers} workers with {per_worker} database connections each")
+    migrate()
+
+    server = args.server
+    if server == "auto":
+        try:
+            import gunicorn  # noqa: F401
+            server = "gunicorn"
+        except ImportError:  # gunicorn is optional (and not available on Windows)
+            server = "uvicorn"
+    if server == "gunicorn":
+        run_gunicorn(args)
+    else:
+        run_uvicorn(args)
+
+
+if __name__ == "__main__":
+    main()
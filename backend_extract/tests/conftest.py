@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The app imports its packages top-level (config, crud, models) and main.py as backend_extract.*
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path[:0] = [BACKEND, os.path.dirname(BACKEND)]
+
+# config/db.py opens ./test.db, so the suite runs in a scratch directory and never touches a real database
+os.chdir(tempfile.mkdtemp(prefix="backend-tests-"))
+os.environ.setdefault("JOB_WORKERS", "0")
+os.environ.setdefault("SECRET_KEY", "test-secret")
+os.environ.setdefault("ALGORITHM", "HS256")
+
+
+@pytest.fixture
+def db():
+    """A session on a freshly created schema."""
+    from config.db import Base, SessionLocal, engine
+    # Registers every table, and the session hooks the routers rely on
+    import backend_extract.main  # noqa: F401
+    from crud.dimensions import interner
+
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    # Ids cached by an earlier test point into the dropped dimensions table
+    interner.clear()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
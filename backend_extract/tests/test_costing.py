@@ -0,0 +1,105 @@
+from datetime import date
+from decimal import Decimal
+
+import pytest
+
+from crud import costing
+from models.db_models import Purchase, Sales
+
+
+def buy(db, day, pcs, total, currency="INR", size="0.30"):
+    row = Purchase(date=day, vendor="V", iteam="DIA", shape="RD", size=size, pcs=pcs, total=total, currency=currency)
+    db.add(row)
+    db.flush()
+    costing.post_purchase(db, row)
+    db.flush()
+    return row
+
+
+def sell(db, day, pcs, total=0, size="0.30"):
+    row = Sales(date=day, customer="C", iteam="DIA", shape="RD", size=size, pcs=pcs, total=total, currency="INR")
+    db.add(row)
+    db.flush()
+    costing.post_sale(db, row)
+    db.flush()
+    return costing.get_sale_cost(db, row.id)
+
+
+@pytest.fixture
+def average(monkeypatch):
+    monkeypatch.setattr(costing, "COSTING_METHOD", "average")
+
+
+def test_fifo_charges_the_oldest_layers_first(db):
+    buy(db, date(2025, 1, 1), 2, 200)
+    buy(db, date(2025, 1, 2), 2, 600)
+
+    cost = sell(db, date(2025, 1, 3), 3, total=1000)
+
+    assert cost.cogs == Decimal("500.00")
+    assert cost.revenue == Decimal("1000.00")
+    assert cost.unmatched_qty == 0
+    assert not cost.unconverted
+
+
+def test_average_charges_the_weighted_average(db, average):
+    buy(db, date(2025, 1, 1), 2, 200)
+    buy(db, date(2025, 1, 2), 2, 600)
+
+    cost = sell(db, date(2025, 1, 3), 3)
+
+    assert cost.cogs == Decimal("600.00")
+    assert costing.closing_stock(db) == {
+        "method": "average", "qty_on_hand": 1, "value_on_hand": 200.0, "unconverted_qty": 0,
+    }
+
+
+def test_average_leaves_units_without_a_rate_out_of_the_average(db, average):
+    buy(db, date(2025, 1, 1), 10, 100)
+    # No USD rate is known, so this layer has no value in the base currency yet
+    buy(db, date(2025, 1, 2), 10, 50, currency="USD")
+
+    cost = sell(db, date(2025, 1, 3), 5)
+
+    assert cost.cogs == Decimal("50.00")
+    assert cost.unconverted
+    # Past the valued units a sale draws on unvalued stock and never drives the value negative
+    cost = sell(db, date(2025, 1, 4), 10)
+    assert cost.cogs == Decimal("50.00")
+    assert costing.closing_stock(db)["value_on_hand"] == 0.0
+
+
+def test_back_dated_sale_replays_the_lot(db):
+    buy(db, date(2025, 1, 1), 1, 100)
+    buy(db, date(2025, 1, 3), 1, 200)
+    later = sell(db, date(2025, 1, 4), 1)
+    assert later.cogs == Decimal("100.00")
+
+    earlier = sell(db, date(2025, 1, 2), 1)
+
+    # Only the first layer was in stock on the 2nd; the later sale moves on to the second layer
+    assert earlier.cogs == Decimal("100.00")
+    assert costing.get_sale_cost(db, later.sale_id).cogs == Decimal("200.00")
+
+
+def test_back_dated_purchase_fills_a_sale_that_was_short(db):
+    short = sell(db, date(2025, 1, 5), 2)
+    assert short.unmatched_qty == 2
+
+    buy(db, date(2025, 1, 1), 2, 300)
+
+    short = costing.get_sale_cost(db, short.sale_id)
+    assert short.unmatched_qty == 0
+    assert short.cogs == Decimal("300.00")
+
+
+def test_closing_stock_totals_every_lot(db):
+    buy(db, date(2025, 1, 1), 3, 300)
+    buy(db, date(2025, 1, 1), 2, 500, size="0.50")
+    buy(db, date(2025, 1, 2), 4, 40, currency="USD")
+    sell(db, date(2025, 1, 3), 1)
+    sell(db, date(2025, 1, 3), 1, size="0.50")
+
+    assert costing.closing_stock(db) == {
+        "method": "fifo", "qty_on_hand": 7, "value_on_hand": 450.0, "unconverted_qty": 4,
+    }
@@ -0,0 +1,83 @@
+import threading
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+from fastapi.testclient import TestClient
+
+from config.db import SessionLocal
+from crud import idempotency
+from models.db_models import Sales
+from models.idempotency_model import IdempotencyKey
+
+SALE = dict(date="2025-01-05", customer="C", iteam="DIA", shape="RD", size="0.30", col="D", clr="VS1", pcs=1,
+            lab_no=None, rate=150, total=150, term=None, currency="INR", pay_mode=None, sales_executive="A",
+            remark=None)
+
+
+def _key_row(key: str):
+    return IdempotencyKey(key=key, endpoint="POST /sales/", fingerprint="other", status_code=200, response="{}",
+                          expires_at=datetime.utcnow() + timedelta(hours=1))
+
+
+def test_concurrent_requests_with_the_same_key_create_one_sale(db):
+    from backend_extract.main import app
+
+    clients = 4
+    start = threading.Barrier(clients)
+    responses = []
+
+    def post():
+        client = TestClient(app)
+        start.wait()
+        responses.append(client.post("/sales/", json=SALE, headers={"Idempotency-Key": "pos-1"}))
+
+    threads = [threading.Thread(target=post) for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert [response.status_code for response in responses] == [200] * clients
+    assert len({response.json()["id"] for response in responses}) == 1
+    assert sum("Idempotent-Replayed" not in response.headers for response in responses) == 1
+    assert db.query(Sales).count() == 1
+
+
+def test_claim_starts_over_when_the_winning_key_is_gone(db, monkeypatch):
+    other = SessionLocal()
+    real_get = db.get
+    calls = []
+
+    def get(model, key):
+        calls.append(key)
+        if len(calls) == 1:
+            # A concurrent request commits the key after this one found it free...
+            other.add(_key_row(key))
+            other.commit()
+            return None
+        if len(calls) == 2:
+            # ...and the row is purged before this one can read the winner's response
+            other.query(IdempotencyKey).delete()
+            other.commit()
+        return real_get(model, key)
+
+    monkeypatch.setattr(db, "get", get)
+    try:
+        assert idempotency.claim(db, "pos-2", "POST /sales/", SALE) is None
+    finally:
+        other.close()
+    assert len(calls) == 3
+
+
+def test_claim_gives_up_with_409_when_the_key_keeps_vanishing(db, monkeypatch):
+    other = SessionLocal()
+    other.add(_key_row("pos-3"))
+    other.commit()
+    other.close()
+    # Every read misses the row that every insert collides with
+    monkeypatch.setattr(db, "get", lambda model, key: None)
+
+    with pytest.raises(HTTPException) as error:
+        idempotency.claim(db, "pos-3", "POST /sales/", SALE)
+    assert error.value.status_code == 409
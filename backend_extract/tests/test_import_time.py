@@ -0,0 +1,11 @@
+from check_import_time import IMPORT_TIME_BUDGET_MS, MODULE, measure
+
+
+def test_app_imports_within_budget_and_defers_heavy_modules():
+    total_ms, deferred, _ = measure()
+
+    assert deferred == [], f"imported at start-up but should be deferred: {', '.join(deferred)}"
+    assert total_ms <= IMPORT_TIME_BUDGET_MS, (
+        f"import {MODULE} took {total_ms:.0f} ms, over the {IMPORT_TIME_BUDGET_MS:.0f} ms budget "
+        "(python backend_extract/check_import_time.py lists the slowest modules)"
+    )
@@ -0,0 +1,28 @@
+from datetime import date
+
+from fastapi.testclient import TestClient
+
+from models.db_models import CertifiedStock, Expense
+from models.fx_rate_model import FxRate
+
+
+def test_summary_converts_expenses_and_certified_stock_to_the_base_currency(db):
+    from backend_extract.main import app
+
+    db.add(FxRate(currency="USD", date=date(2025, 1, 1), rate=80))
+    db.add_all([
+        Expense(date=date(2025, 1, 2), party="Rent", total=1000, currency="INR"),
+        Expense(date=date(2025, 1, 3), party="Courier", total=10, currency="USD"),
+        # No EUR rate: left out of the total and counted as unconverted
+        Expense(date=date(2025, 1, 4), party="Courier", total=5, currency="EUR"),
+        CertifiedStock(date=date(2025, 1, 2), certi_no="IGI1", total=100, currency="USD"),
+        CertifiedStock(date=date(2025, 1, 2), certi_no="IGI2", total=500, currency=None),
+    ])
+    db.commit()
+
+    summary = TestClient(app).get("/reports/summary").json()
+
+    assert summary["expense_report"] == {
+        "total_expenses": 3, "total_amount": 1800.0, "top_party": "Rent", "unconverted_rows": 1,
+    }
+    assert summary["certified_stock_report"] == {"total_stones": 2, "total_value": 8500.0, "unconverted_rows": 0}
@@ -0,0 +1,27 @@
+from datetime import date
+from decimal import Decimal
+
+from crud import stock_balance
+from models.db_models import LooseStock, StockTransfer
+
+
+def test_reconcile_counts_blank_and_negative_pieces_as_one_like_the_writes(db):
+    rows = [
+        LooseStock(date=date(2025, 1, 1), branch="MUM", iteam="DIA", shape="RD", size="0.30", pcs=5),
+        LooseStock(date=date(2025, 1, 1), branch="MUM", iteam="DIA", shape="RD", size="0.30", pcs=None),
+        LooseStock(date=date(2025, 1, 1), branch="MUM", iteam="DIA", shape="RD", size="0.30", pcs=-3),
+        StockTransfer(date=date(2025, 1, 2), from_branch="MUM", to_branch="DEL", iteam="DIA", shape="RD",
+                      size="0.30", pcs=0),
+    ]
+    db.add_all(rows)
+    db.flush()
+    for row in rows[:3]:
+        stock_balance.apply_loose_stock(db, row)
+    stock_balance.apply_transfer(db, rows[3])
+    db.commit()
+
+    assert stock_balance.expected_balances(db) == {
+        ("MUM", "DIA", "RD", "0.30"): Decimal("6.00"),
+        ("DEL", "DIA", "RD", "0.30"): Decimal("1.00"),
+    }
+    assert stock_balance.reconcile(db) == []
@@ -0,0 +1,32 @@
+from utils.auth_utils import decode_access_token
+# flusher is re-exported so main.py starts the same instance the session hooks feed
+from crud.audit import current_actor, flusher
+
+
+def actor_from_headers(headers) -> str:
+    authorization = headers.get(b"authorization", b"").decode("latin-1")
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return None
+    from jose import JWTError
+    try:
+        return decode_access_token(token).get("sub")
+    except (JWTError, AttributeError):
+        return None
+
+
+class AuditActorMiddleware:
+    """Record who is making each request so audit entries can name them."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        token = current_actor.set(actor_from_headers(dict(scope.get("headers") or [])))
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            current_actor.reset(token)
@@ -0,0 +1,159 @@
+import gzip
+import hashlib
+from collections import OrderedDict
+from threading import Lock
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Only text-like payloads are worth compressing; images/xlsx are already compressed
+COMPRESSIBLE_TYPES = (
+    "application/json",
+    "text/html",
+    "text/plain",
+    "text/csv",
+    "application/javascript",
+)
+
+# Responses that must not carry a body, so there is nothing to compress or measure
+BODYLESS_STATUSES = (204, 304)
+
+
+class _BodyCache:
+    """Small LRU of already-compressed bodies keyed by (etag, encoding)."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = Lock()
+
+    def get(self, key):
+        with self._lock:
+            body = self._entries.get(key)
+            if body is not None:
+                self._entries.move_to_end(key)
+            return body
+
+    def put(self, key, body: bytes):
+        with self._lock:
+            self._entries[key] = body
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+def _quality(params) -> float:
+    for param in params:
+        name, _, value = param.partition("=")
+        if name.strip().lower() == "q":
+            try:
+                return float(value)
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+def _choose_encoding(accept_encoding: str):
+    """The coding the client weights highest (brotli on a tie); q=0 refuses a coding, "*" covers unlisted ones."""
+    weights = {}
+    for part in accept_encoding.split(","):
+        coding, *params = part.split(";")
+        coding = coding.strip().lower()
+        if coding:
+            weights[coding] = _quality(params)
+    best, best_quality = None, 0.0
+    for coding in (("br", "gzip") if brotli is not None else ("gzip",)):
+        quality = weights.get(coding, weights.get("*", 0.0))
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing large text/JSON responses with brotli or gzip.
+
+    Responses smaller than `minimum_size`, with a content type outside the
+    allowlist, already carrying a Content-Encoding, without a body (204,
+    304) or to a HEAD request are passed through untouched. Compressed bodies are cached by ETag (or a digest of the body
+    when the handler set none), so identical payloads are compressed once.
+    """
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4, cache_entries: int = 64):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.cache = _BodyCache(cache_entries)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] == "HEAD":
+            # A HEAD response keeps the Content-Length the handler computed for the GET body
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        encoding = _choose_encoding(headers.get(b"accept-encoding", b"").decode("latin-1"))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message = None
+        chunks = []
+        passthrough = False
+
+        async def send_wrapper(message):
+            nonlocal start_message, passthrough
+            if passthrough:
+                await send(message)
+                return
+
+            if message["type"] == "http.response.start":
+                response_headers = dict(message.get("headers") or [])
+                content_type = response_headers.get(b"content-type", b"").decode("latin-1")
+                if (b"content-encoding" in response_headers or not content_type.startswith(COMPRESSIBLE_TYPES)
+                        or message["status"] in BODYLESS_STATUSES):
+                    # Streaming responses such as event streams are never buffered
+                    passthrough = True
+                    await send(message)
+                    return
+                start_message = message
+                return
+
+            chunks.append(message.get("body", b""))
+            if message.get("more_body", False):
+                return
+
+            body = b"".join(chunks)
+            await self._send_body(start_message, body, encoding, send)
+
+        await self.app(scope, receive, send_wrapper)
+
+    async def _send_body(self, start_message, body: bytes, encoding: str, send):
+        response_headers = [
+            (key, value) for key, value in start_message.get("headers", [])
+            if key != b"content-length"
+        ]
+
+        if len(body) >= self.minimum_size:
+            etag = dict(response_headers).get(b"etag")
+            cache_key = (etag or hashlib.blake2b(body, digest_size=16).digest(), encoding)
+            compressed = self.cache.get(cache_key)
+            if compressed is None:
+                compressed = self._compress(body, encoding)
+                self.cache.put(cache_key, compressed)
+            body = compressed
+            response_headers.append((b"content-encoding", encoding.encode("latin-1")))
+            response_headers.append((b"vary", b"Accept-Encoding"))
+
+        response_headers.append((b"content-length", str(len(body)).encode("latin-1")))
+        await send({**start_message, "headers": response_headers})
+        await send({"type": "http.response.body", "body": body})
+
+    def _compress(self, body: bytes, encoding: str) -> bytes:
+        if encoding == "br":
+            return brotli.compress(body, quality=self.brotli_quality)
+        return gzip.compress(body, compresslevel=self.gzip_level, mtime=0)
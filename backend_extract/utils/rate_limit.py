@@ -0,0 +1,247 @@
+import asyncio
+import ipaddress
+import logging
+import math
+import os
+import time
+from threading import Lock
+
+from utils.audit_actor import actor_from_headers
+
+logger = logging.getLogger(__name__)
+
+
+def _budget(name: str, default: str):
+    """Parse "<requests>/<seconds>" into (bucket capacity, tokens refilled per second)."""
+    requests, _, seconds = os.getenv(f"RATE_LIMIT_{name.upper()}", default).partition("/")
+    return int(requests), int(requests) / float(seconds or 1)
+
+
+# Token bucket per (route class, user or client IP). A full bucket allows a
+# burst of <requests>, after which requests are admitted at the average rate.
+RATE_LIMITS = {
+    "auth": _budget("auth", "5/60"),  # brute force against bcrypt
+    "list": _budget("list", "120/60"),
+    "write": _budget("write", "60/60"),
+    "report": _budget("report", "20/60"),
+}
+
+# Route class -> (requests running at once per process, requests allowed to wait)
+CONCURRENCY_LIMITS = {
+    "auth": (int(os.getenv("AUTH_CONCURRENCY", "2")), int(os.getenv("AUTH_QUEUE", "8"))),
+    "report": (int(os.getenv("REPORT_CONCURRENCY", "4")), int(os.getenv("REPORT_QUEUE", "8"))),
+}
+# How long a queued request waits for a slot before it is shed with 503
+QUEUE_TIMEOUT_SECONDS = float(os.getenv("RATE_LIMIT_QUEUE_SECONDS", "5"))
+
+REPORT_PREFIXES = (
+    "/reports", "/analytics", "/inventory", "/search", "/snapshots", "/jewellery-management/summary",
+    "/igi-reconciliation", "/audit",
+)
+# Long-lived streams are not requests in the usual sense; health probes must never be refused
+EXEMPT_PREFIXES = ("/events", "/health", "/docs", "/openapi.json")
+
+RATE_LIMIT_REDIS_URL = os.getenv("RATE_LIMIT_REDIS_URL")
+# Comma-separated addresses or networks of the proxies in front of the app
+# (e.g. Render's). X-Forwarded-For is only read when the peer is one of them;
+# unset, the peer address is the client and the header is ignored
+TRUSTED_PROXIES = [
+    ipaddress.ip_network(entry.strip(), strict=False)
+    for entry in os.getenv("RATE_LIMIT_TRUSTED_PROXIES", "").split(",") if entry.strip()
+]
+
+
+def route_class(method: str, path: str):
+    if path.startswith(EXEMPT_PREFIXES):
+        return None
+    if path.startswith("/auth"):
+        return "auth"
+    if path.startswith(REPORT_PREFIXES):
+        return "report"
+    if method in ("POST", "PUT", "PATCH", "DELETE"):
+        return "write"
+    return "list"
+
+
+class MemoryBackend:
+    """Token buckets in this process; each API worker enforces its own share."""
+
+    def __init__(self, max_keys: int = 100000):
+        self.max_keys = max_keys
+        self._buckets = {}  # key -> (tokens, updated_at, full_at)
+        self._lock = Lock()
+
+    async def take(self, key: str, capacity: int, rate: float):
+        """Take one token; returns (admitted, seconds until a token is available)."""
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (capacity, now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            admitted = tokens >= 1
+            if admitted:
+                tokens -= 1
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self._buckets) > self.max_keys:
+                # Buckets that have refilled completely carry no state
+                self._buckets = {key: bucket for key, bucket in self._buckets.items() if bucket[2] > now}
+        return admitted, 0.0 if admitted else (1 - tokens) / rate
+
+
+# Atomic refill-and-take; the bucket expires once it would be full again
+_TAKE_SCRIPT = """
+local capacity, rate, now = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+local bucket = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local tokens = tonumber(bucket[1]) or capacity
+local updated = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local admitted = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    admitted = 1
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 1)
+return {admitted, tostring(tokens)}
+"""
+
+
+class RedisBackend:
+    """Token buckets shared by every API process through Redis."""
+
+    def __init__(self, url: str, prefix: str = "ratelimit:"):
+        import redis.asyncio as aioredis  # optional, and only needed when configured
+        self.client = aioredis.from_url(url)
+        self.prefix = prefix
+        self._script = self.client.register_script(_TAKE_SCRIPT)
+
+    async def take(self, key: str, capacity: int, rate: float):
+        try:
+            admitted, tokens = await self._script(keys=[self.prefix + key], args=[capacity, rate, time.time()])
+        except Exception:
+            # Failing open: an unreachable Redis must not take the API down with it
+            logger.warning("Rate limit backend unavailable, admitting request", exc_info=True)
+            return True, 0.0
+        return bool(admitted), 0.0 if admitted else (1 - float(tokens)) / rate
+
+
+def default_backend():
+    if RATE_LIMIT_REDIS_URL:
+        try:
+            return RedisBackend(RATE_LIMIT_REDIS_URL)
+        except ImportError:
+            logger.warning("RATE_LIMIT_REDIS_URL is set but redis is not installed; using in-process buckets")
+    return MemoryBackend()
+
+
+class _Gate:
+    """At most `limit` requests inside, at most `queue` more waiting for a slot."""
+
+    def __init__(self, limit: int, queue: int):
+        self.limit = limit
+        self.queue = queue
+        self.waiting = 0
+        self._semaphore = None
+
+    async def acquire(self, timeout: float) -> bool:
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.limit)
+        if self._semaphore.locked() and self.waiting >= self.queue:
+            return False
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            self.waiting -= 1
+
+    def release(self):
+        self._semaphore.release()
+
+
+def _trusted_proxy(address: str) -> bool:
+    try:
+        ip = ipaddress.ip_address(address)
+    except ValueError:
+        return False
+    return any(ip in network for network in TRUSTED_PROXIES)
+
+
+def _client_ip(scope, headers) -> str:
+    client = scope.get("client")
+    peer = client[0] if client else "unknown"
+    if not _trusted_proxy(peer):
+        return peer
+    # Each trusted proxy appends the address it got the request from; the
+    # right-most hop that is not one of them is the client, anything to its
+    # left is whatever the client sent
+    hops = [hop.strip() for hop in headers.get(b"x-forwarded-for", b"").decode("latin-1").split(",") if hop.strip()]
+    for hop in reversed(hops):
+        if not _trusted_proxy(hop):
+            return hop
+    return hops[0] if hops else peer
+
+
+async def _reject(send, status: int, detail: str, retry_after: float):
+    body = ('{"detail": "%s"}' % detail).encode("utf-8")
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(max(1, math.ceil(retry_after))).encode("latin-1")),
+        ],
+    })
+    await send({"type": "http.response.body", "body": body})
+
+
+class RateLimitMiddleware:
+    """
+    Admission control in front of the worker pool.
+
+    Each request is classed as auth, list, write or report and charged one
+    token from its (class, user) bucket, the user being the JWT subject or,
+    without a valid token, the client IP. An empty bucket answers 429 with
+    Retry-After. Report and auth requests additionally pass a per-process
+    concurrency gate: a few run, a few more queue briefly, the rest are shed
+    with 503 so a burst of heavy queries cannot occupy every thread.
+    """
+
+    def __init__(self, app, backend=None, limits: dict = None, concurrency: dict = None,
+                 queue_timeout: float = QUEUE_TIMEOUT_SECONDS):
+        self.app = app
+        self.backend = backend or default_backend()
+        self.limits = limits or RATE_LIMITS
+        self.gates = {name: _Gate(*sizes) for name, sizes in (concurrency or CONCURRENCY_LIMITS).items()}
+        self.queue_timeout = queue_timeout
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        name = route_class(scope["method"], scope["path"])
+        if name is None or name not in self.limits:
+            await self.app(scope, receive, send)
+            return
+
+        headers = dict(scope.get("headers") or [])
+        # Logins are always counted per client address, the user is who is being guessed
+        who = (name != "auth" and actor_from_headers(headers)) or _client_ip(scope, headers)
+        admitted, retry_after = await self.backend.take(f"{name}:{who}", *self.limits[name])
+        if not admitted:
+            await _reject(send, 429, "Too many requests", retry_after)
+            return
+
+        gate = self.gates.get(name)
+        if gate is None:
+            await self.app(scope, receive, send)
+            return
+        if not await gate.acquire(self.queue_timeout):
+            await _reject(send, 503, "Server busy, retry shortly", self.queue_timeout)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            gate.release()
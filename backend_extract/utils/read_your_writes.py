@@ -0,0 +1,36 @@
+import math
+
+from config.replicas import STICKY_COOKIE, STICKY_HEADER, request_writes, router
+
+
+class ReadYourWritesMiddleware:
+    """
+    Hand the client the time of any write its request committed, as a
+    cookie and a header; get_read_db keeps its reads on the primary while
+    that time is recent, on whichever process serves them.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        writes = {}
+        token = request_writes.set(writes)
+
+        async def send_with_write_time(message):
+            if message["type"] == "http.response.start" and "at" in writes:
+                value = f"{writes['at']:.3f}"
+                cookie = (f"{STICKY_COOKIE}={value}; Max-Age={math.ceil(router.sticky_seconds)}; Path=/; "
+                          f"HttpOnly; SameSite=Lax")
+                headers = list(message.get("headers") or [])
+                headers += [(STICKY_HEADER.lower().encode(), value.encode()), (b"set-cookie", cookie.encode())]
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_write_time)
+        finally:
+            request_writes.reset(token)
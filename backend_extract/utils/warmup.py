@@ -0,0 +1,128 @@
+import logging
+import os
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import text
+
+from config.db import engine, DB_POOL_SIZE
+
+logger = logging.getLogger(__name__)
+
+# Connections opened ahead of the first requests (capped by the pool size)
+WARM_CONNECTIONS = int(os.getenv("WARM_CONNECTIONS", "4"))
+# A failed step is retried after this many seconds, doubling up to the cap, until it succeeds
+WARMUP_RETRY_SECONDS = float(os.getenv("WARMUP_RETRY_SECONDS", "1"))
+WARMUP_RETRY_MAX_SECONDS = float(os.getenv("WARMUP_RETRY_MAX_SECONDS", "60"))
+
+
+def _imports():
+    from utils.auth_utils import pwd_context
+    import jose.jwt  # noqa: F401
+    pwd_context()
+
+
+def _database_pool():
+    connections = [engine.connect() for _ in range(max(1, min(WARM_CONNECTIONS, DB_POOL_SIZE)))]
+    try:
+        for connection in connections:
+            connection.execute(text("SELECT 1"))
+    finally:
+        for connection in connections:
+            connection.close()
+
+
+def _replicas():
+    from config.replicas import router
+    if router.replicas:
+        router.check()
+
+
+def _dimension_cache():
+    from crud.dimensions import interner
+    from models.dimension_model import Dimension
+    with engine.connect() as connection:
+        rows = connection.execute(Dimension.__table__.select()).all()
+    interner.remember({(row.kind, row.value): row.id for row in rows})
+
+
+def _stone_index():
+    from config.db import SessionLocal
+    from crud.stone_search import stone_index
+    db = SessionLocal()
+    try:
+        stone_index.ensure_loaded(db)
+    finally:
+        db.close()
+
+
+# name -> step; each runs in order on a background thread after start-up, failed ones again until they succeed
+STEPS = {
+    "imports": _imports,
+    "database_pool": _database_pool,
+    "replicas": _replicas,
+    "dimension_cache": _dimension_cache,
+    "stone_index": _stone_index,
+}
+
+
+class Readiness:
+    """Warms the process up after start-up and reports when it is done (see /health/ready)."""
+
+    def __init__(self, steps: dict = None, retry_seconds: float = WARMUP_RETRY_SECONDS,
+                 retry_max_seconds: float = WARMUP_RETRY_MAX_SECONDS):
+        self.steps = steps or STEPS
+        self.retry_seconds = retry_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.started_at = None
+        self.checks = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    @property
+    def ready(self) -> bool:
+        return len(self.checks) == len(self.steps) and all(check["ok"] for check in self.checks.values())
+
+    def start(self):
+        if self._thread is None:
+            self.started_at = datetime.utcnow()
+            self._thread = threading.Thread(target=self.run, name="warmup", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self):
+        """Run every step, then retry the failed ones with exponential backoff until all succeed."""
+        delay = self.retry_seconds
+        attempts = {}
+        while not self._stop.is_set():
+            for name, step in self.steps.items():
+                if name in self.checks and self.checks[name]["ok"]:
+                    continue
+                attempts[name] = attempts.get(name, 0) + 1
+                started = time.perf_counter()
+                try:
+                    step()
+                    self.checks[name] = {"ok": True}
+                except Exception as e:
+                    logger.exception("Warm-up step %s failed (attempt %d)", name, attempts[name])
+                    self.checks[name] = {"ok": False, "error": str(e)}
+                self.checks[name].update(attempts=attempts[name],
+                                         ms=round((time.perf_counter() - started) * 1000, 1))
+            if self.ready:
+                return
+            self._stop.wait(delay)
+            delay = min(delay * 2, self.retry_max_seconds)
+
+    def report(self):
+        return {
+            "ready": self.ready,
+            "started_at": self.started_at,
+            "checks": self.checks,
+            "pending": [name for name in self.steps if name not in self.checks],
+        }
+
+
+readiness = Readiness()